@@ -0,0 +1,377 @@
+"""
+Performance regression gate for rwa3 and RWA2.
+
+The gate times its own scenarios:
+- rwa3.maze_load: Maze.__init__ on a generated maze
+- rwa3.moves: Player.move back and forth, with the obstacle and item lookups
+- rwa3.render: print_maze of a whole frame
+- rwa2.random_placement: the random goal, obstacles and robot of RWA2
+- rwa2.moves: the RWA2 robot moving back and forth
+- rwa2.render: the RWA2 print_maze
+
+Every scenario runs a fixed amount of work per sample, sized so that an
+accidental O(n^2) path shows up as a clear slowdown. `record` stores the samples
+as the baseline of the machine profile (host, CPU architecture and Python
+version) in benchmarks/baselines/. `check` runs the scenarios again and
+compares every one with its baseline using a one-sided Mann-Whitney U test. A
+scenario regresses when the new samples are significantly slower (p < --alpha)
+and the median grew by more than --threshold. The gate exits with 1 on any
+regression, so it can stop a change before it ships.
+
+Run from the repository root:
+    python benchmarks/regression_gate.py record
+    python benchmarks/regression_gate.py check
+"""
+import argparse
+import contextlib
+import copy
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+# rwa3 is imported as the rpg package, RWA2 as its top-level modules, and the
+# maze generator from the rwa3 benchmarks
+sys.path.insert(0, os.path.join(_ROOT, "rwa3"))
+sys.path.insert(0, os.path.join(_ROOT, "rwa3", "benchmarks"))
+sys.path.insert(0, os.path.join(_ROOT, "RWA2_yasin"))
+
+from rpg.player import Direction, Player  # noqa: E402
+from rpg.maze import Maze  # noqa: E402
+from mazegen import write_maze  # noqa: E402
+import maze as rwa2_maze  # noqa: E402
+import robot as rwa2_robot  # noqa: E402
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+SAMPLES = 15
+# Scenario sizes: big enough for a quadratic path to stand out, small enough for CI
+_RWA3_LOAD_SIZE = 40
+_RWA3_SIZE = 80
+_RWA3_MOVES = 400
+_RWA2_SIZE = 80
+_RWA2_OBSTACLES = 600
+_RWA2_MOVES = 2000
+
+
+class Rwa3Scenarios:
+    """
+    A class representing the rwa3 scenarios, sharing the generated mazes.
+
+    Attributes:
+        _load_path (str): The small generated maze timed by maze_load.
+        _maze (Maze): The large generated maze of the other scenarios.
+        _player (Player): The player of the large maze, copied by moves.
+    """
+
+    def __init__(self, maze_dir):
+        """
+        Generate and load the mazes; nothing here is timed.
+
+        Args:
+            maze_dir (str): The folder the generated mazes are written to.
+        """
+        self._load_path = write_maze(
+            os.path.join(maze_dir, "load.yaml"), _RWA3_LOAD_SIZE, seed=1
+        )
+        path = write_maze(os.path.join(maze_dir, "play.yaml"), _RWA3_SIZE, seed=1)
+        self._maze = Maze(path)
+        self._player = Player.extract_player(path)
+
+    def maze_load(self):
+        Maze(self._load_path)
+
+    def moves(self):
+        maze = self._maze
+        player = copy.deepcopy(self._player)
+        for _ in range(_RWA3_MOVES // 2):
+            # between the start cell and the free cell ahead of it
+            player.move("w", maze)
+            player.move("s", maze)
+        assert maze.player_position == (0, 0) and player.direction == Direction.RIGHT
+
+    def render(self):
+        self._maze.print_maze()
+
+
+class Rwa2Scenarios:
+    """
+    A class representing the RWA2 scenarios. RWA2 keeps its state in module
+    globals, so every scenario starts from a fresh maze.
+    """
+
+    @staticmethod
+    def reset(size):
+        """
+        Replace the RWA2 maze by an empty one with the robot in the middle.
+
+        Args:
+            size (int): The maze size.
+        """
+        rwa2_maze.MAZE_SIZE = size
+        rwa2_maze.maze = [[rwa2_maze.EMPTY] * size for _ in range(size)]
+        rwa2_maze.obstacle_positions = []
+        rwa2_maze.robot_position = [size // 2, size // 2]
+        rwa2_maze.robot_orientation = "up"
+        rwa2_maze.goal_position = [0, 0]
+        rwa2_maze.maze[size // 2][size // 2] = rwa2_robot.ROBOT["up"]
+        rwa2_maze.maze[0][0] = rwa2_maze.GOAL
+
+    def random_placement(self):
+        self.reset(_RWA2_SIZE)
+        random.seed(0)
+        rwa2_robot.randomize_goal_position()
+        rwa2_robot.randomize_obstacles(_RWA2_OBSTACLES)
+        rwa2_robot.randomize_robot_position()
+
+    def moves(self):
+        self.reset(_RWA2_SIZE)
+        for _ in range(_RWA2_MOVES // 2):
+            rwa2_robot.move_forward()
+            rwa2_robot.move_backward()
+
+    def render(self):
+        self.reset(_RWA2_SIZE)
+        rwa2_maze.print_maze()
+
+
+def scenarios(maze_dir):
+    """
+    Get every scenario of the gate.
+
+    Args:
+        maze_dir (str): The folder the generated mazes are written to.
+
+    Returns:
+        dict: name -> function running one sample of the scenario.
+    """
+    rwa3 = Rwa3Scenarios(maze_dir)
+    rwa2 = Rwa2Scenarios()
+    return {
+        "rwa3.maze_load": rwa3.maze_load,
+        "rwa3.moves": rwa3.moves,
+        "rwa3.render": rwa3.render,
+        "rwa2.random_placement": rwa2.random_placement,
+        "rwa2.moves": rwa2.moves,
+        "rwa2.render": rwa2.render,
+    }
+
+
+def run_scenarios(samples, only=None):
+    """
+    Time every scenario.
+
+    The scenarios are run in turns, one sample of each per round, so a slow
+    moment of the machine is spread over all of them.
+
+    Args:
+        samples (int): The samples per scenario.
+        only (list): The names of the scenarios to run, all if None.
+
+    Returns:
+        dict: name -> list of samples in nanoseconds.
+    """
+    with tempfile.TemporaryDirectory(prefix="rwa3-gate-") as maze_dir:
+        with open(os.devnull, "w", encoding="utf-8") as null:
+            # the games print every frame
+            with contextlib.redirect_stdout(null):
+                runs = {
+                    name: run
+                    for name, run in scenarios(maze_dir).items()
+                    if only is None or name in only
+                }
+                for run in runs.values():
+                    # warm up the caches and the imports
+                    run()
+                results = {name: [] for name in runs}
+                for _ in range(samples):
+                    for name, run in runs.items():
+                        start = time.perf_counter_ns()
+                        run()
+                        results[name].append(time.perf_counter_ns() - start)
+    return results
+
+
+def mann_whitney_greater(current, baseline):
+    """
+    One-sided Mann-Whitney U test that the current samples are larger.
+
+    Uses the normal approximation with tie and continuity corrections, which
+    is accurate from about 8 samples per side.
+
+    Args:
+        current (list): The new samples.
+        baseline (list): The baseline samples.
+
+    Returns:
+        float: The p-value.
+    """
+    n1, n2 = len(current), len(baseline)
+    ranked = sorted([(value, 0) for value in current] + [(value, 1) for value in baseline])
+    ranks = [0.0] * len(ranked)
+    ties = 0.0
+    start = 0
+    while start < len(ranked):
+        end = start
+        while end + 1 < len(ranked) and ranked[end + 1][0] == ranked[start][0]:
+            end += 1
+        # tied values share the mean of their ranks
+        for index in range(start, end + 1):
+            ranks[index] = (start + end) / 2 + 1
+        tied = end - start + 1
+        ties += tied**3 - tied
+        start = end + 1
+    rank_sum = sum(rank for rank, (_, side) in zip(ranks, ranked) if side == 0)
+    u = rank_sum - n1 * (n1 + 1) / 2
+    mean = n1 * n2 / 2
+    n = n1 + n2
+    variance = n1 * n2 / 12 * ((n + 1) - ties / (n * (n - 1)))
+    if variance <= 0:
+        return 0.5
+    z = (u - mean - 0.5) / math.sqrt(variance)
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def compare(current, baseline, alpha, threshold):
+    """
+    Compare the samples of every scenario with its baseline.
+
+    Args:
+        current (dict): name -> new samples.
+        baseline (dict): name -> baseline samples.
+        alpha (float): The significance level of the test.
+        threshold (float): The relative growth of the median that counts as a slowdown.
+
+    Returns:
+        list: One verdict per scenario: name, medians, ratio, p-value and status.
+    """
+    verdicts = []
+    for name, samples in current.items():
+        if name not in baseline:
+            verdicts.append({"scenario": name, "status": "new"})
+            continue
+        old = statistics.median(baseline[name])
+        new = statistics.median(samples)
+        p_value = mann_whitney_greater(samples, baseline[name])
+        ratio = new / old
+        if p_value < alpha and ratio > 1 + threshold:
+            status = "regression"
+        elif p_value < alpha and ratio > 1:
+            status = "slower"
+        else:
+            status = "ok"
+        verdicts.append(
+            {
+                "scenario": name,
+                "baseline_median_ns": old,
+                "median_ns": new,
+                "ratio": ratio,
+                "p_value": p_value,
+                "status": status,
+            }
+        )
+    return verdicts
+
+
+def machine_profile():
+    """
+    Get the name of the machine profile the baselines are stored under.
+
+    Returns:
+        str: host, CPU architecture and Python version, e.g. "build1-x86_64-cpython3.11".
+    """
+    python = f"{platform.python_implementation().lower()}{sys.version_info[0]}.{sys.version_info[1]}"
+    name = f"{platform.node() or 'unknown'}-{platform.machine() or 'unknown'}-{python}"
+    return "".join(char if char.isalnum() or char in "-._" else "_" for char in name)
+
+
+def baseline_path(profile):
+    return os.path.join(BASELINE_DIR, f"{profile}.json")
+
+
+def record(profile, samples):
+    """
+    Run the scenarios and store them as the baseline of a profile.
+
+    Returns:
+        str: The baseline file.
+    """
+    results = run_scenarios(samples)
+    os.makedirs(BASELINE_DIR, exist_ok=True)
+    path = baseline_path(profile)
+    with open(path, "w") as file:
+        json.dump(
+            {
+                "profile": profile,
+                "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "samples": results,
+            },
+            file,
+            indent=2,
+        )
+    return path
+
+
+def check(profile, samples, alpha, threshold):
+    """
+    Run the scenarios and compare them with the baseline of a profile.
+
+    Returns:
+        list: The verdicts, see compare().
+
+    Raises:
+        FileNotFoundError: If the profile has no baseline.
+    """
+    with open(baseline_path(profile)) as file:
+        baseline = json.load(file)["samples"]
+    return compare(run_scenarios(samples), baseline, alpha, threshold)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Performance regression gate for rwa3 and RWA2")
+    parser.add_argument("command", choices=("record", "check"))
+    parser.add_argument("--profile", default=machine_profile(), help="machine profile name")
+    parser.add_argument("--samples", type=int, default=SAMPLES, help="samples per scenario")
+    parser.add_argument("--alpha", type=float, default=0.01, help="significance level")
+    parser.add_argument(
+        "--threshold", type=float, default=0.10, help="median growth that counts as a regression"
+    )
+    args = parser.parse_args()
+
+    if args.command == "record":
+        path = record(args.profile, args.samples)
+        print(f"Baseline of {args.profile} written to {path}")
+        return 0
+
+    try:
+        verdicts = check(args.profile, args.samples, args.alpha, args.threshold)
+    except FileNotFoundError:
+        print(f"No baseline for {args.profile}, run: python {sys.argv[0]} record")
+        return 2
+    print(f"{'scenario':<24} {'baseline ms':>12} {'now ms':>10} {'ratio':>7} {'p':>8}  status")
+    for verdict in verdicts:
+        if verdict["status"] == "new":
+            print(f"{verdict['scenario']:<24} {'':>12} {'':>10} {'':>7} {'':>8}  new")
+            continue
+        print(
+            f"{verdict['scenario']:<24} {verdict['baseline_median_ns'] / 1e6:>12.2f} "
+            f"{verdict['median_ns'] / 1e6:>10.2f} {verdict['ratio']:>7.2f} "
+            f"{verdict['p_value']:>8.4f}  {verdict['status']}"
+        )
+    regressions = [verdict for verdict in verdicts if verdict["status"] == "regression"]
+    if regressions:
+        print(f"{len(regressions)} scenario(s) regressed")
+        return 1
+    print("No regression")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
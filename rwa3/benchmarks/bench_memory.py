@@ -0,0 +1,96 @@
+"""
+Memory benchmark of the rwa3 entities.
+
+Creates many skeletons, dragons, players and items under tracemalloc and
+reports the bytes each one costs: the object, its attribute storage and what
+it copies at creation. The positions come from the position lists of Maze and
+the names and stats are shared by all the entities of a kind, as they are when
+read from one YAML file, so they are not counted.
+
+Run from the rwa3 folder:
+    python benchmarks/bench_memory.py --count 100000 --output memory.json
+"""
+import argparse
+import json
+import os
+import sys
+import tracemalloc
+
+# the rpg package is in the parent folder
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from rpg.player import Direction, Player  # noqa: E402
+from rpg.enemy import Dragon, Skeleton  # noqa: E402
+from rpg.item import Category, Item  # noqa: E402
+
+
+def _positions(count):
+    # distinct cells of a square maze, held as tuples by Maze
+    size = int(count**0.5) + 1
+    return [(index // size, index % size) for index in range(count)]
+
+
+def _skeletons(positions):
+    return [Skeleton("Skeleton", 100, position, 10, 20) for position in positions]
+
+
+def _dragons(positions):
+    return [Dragon("Dragon", 100, position, 10, 20) for position in positions]
+
+
+def _players(positions):
+    return [Player("Arthur", 1000, position, Direction.UP, 50) for position in positions]
+
+
+def _items(positions):
+    return [Item(Category.ARROW, position, 150) for position in positions]
+
+
+ENTITIES = {
+    "skeleton": _skeletons,
+    "dragon": _dragons,
+    "player": _players,
+    "item": _items,
+}
+
+
+def measure(count):
+    """
+    Measure the bytes per entity of every kind.
+
+    Args:
+        count (int): The entities created per kind.
+
+    Returns:
+        dict: kind -> bytes per entity.
+    """
+    results = {}
+    for name, create in ENTITIES.items():
+        # the positions come from the parsed YAML file and are not counted
+        positions = _positions(count)
+        tracemalloc.start()
+        before, _ = tracemalloc.get_traced_memory()
+        entities = create(positions)
+        after, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[name] = (after - before) / count
+        del entities
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory benchmark of the rwa3 entities")
+    parser.add_argument("--count", type=int, default=100_000, help="entities per kind")
+    parser.add_argument("--output", help="JSON file to write")
+    args = parser.parse_args()
+
+    results = measure(args.count)
+    for name, size in results.items():
+        print(f"{name:>10} {size:>8.1f} B per entity")
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump({"count": args.count, "bytes_per_entity": results}, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,391 @@
+"""
+Benchmarks of the rwa3 game hot paths.
+
+Every benchmark runs on generated mazes (see mazegen.py) of growing size:
+- maze_init: Maze.__init__, loading the YAML file and spawning the grid
+- print_maze: rendering a whole frame
+- move: Player.move forward and back between two free cells
+- perform_action: the dispatch of a move onto an empty cell
+- use_arrow: shooting the target skeleton two cells ahead
+- combat: a whole fight against the target skeleton
+
+Samples are wall-clock times in nanoseconds per operation. The results are
+written as JSON with the median, the mean and the percentiles of every
+benchmark and size. Between two sizes, the scaling exponent is the slope of
+log(median) over log(cells): about 0 for a constant-time path, 1 for a linear
+one. A jump of the exponent between two commits points to a complexity
+regression.
+
+Each benchmark stops after --budget seconds per size, with at least one sample,
+so the largest mazes only get a few samples. Maze parses its YAML file once per
+section, so loading a 2000x2000 maze takes many minutes; pass --sizes to stop
+the ladder earlier.
+
+Run from the rwa3 folder:
+    python benchmarks/bench_rpg.py --sizes 10 50 100 --output bench.json
+"""
+import argparse
+import contextlib
+import copy
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# the rpg package is in the parent folder
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from rpg.player import Direction, Player  # noqa: E402
+import rpg.enemy  # noqa: E402
+import rpg.item as item  # noqa: E402
+from rpg.maze import Maze  # noqa: E402
+from mazegen import TARGET, write_maze  # noqa: E402
+
+SIZES = (10, 50, 100, 500, 1000, 2000)
+BENCHMARKS = ("maze_init", "print_maze", "move", "perform_action", "use_arrow", "combat")
+_PERCENTILES = (5, 25, 50, 75, 95, 99)
+# Fast operations are timed in batches to get above the clock resolution
+_BATCH = 200
+# A cell the generated mazes keep empty
+_EMPTY = (1, 1)
+
+
+class Scenario:
+    """
+    A class representing the state the benchmarks of one maze size run on.
+
+    Attributes:
+        path (str): The maze YAML file.
+        maze (Maze): The loaded maze.
+        player (Player): The player as read from the file, copied by the benchmarks.
+    """
+
+    def __init__(self, path, maze):
+        """
+        Initialize the scenario of a loaded maze.
+
+        Args:
+            path (str): The maze YAML file.
+            maze (Maze): The maze loaded from it.
+        """
+        self.path = path
+        self.maze = maze
+        self.player = Player.extract_player(path)
+
+    def new_player(self, arrows=0):
+        """
+        Get a fresh player at the start cell, facing the target skeleton.
+
+        Args:
+            arrows (int): The arrows in its inventory.
+
+        Returns:
+            Player: The player.
+        """
+        player = copy.deepcopy(self.player)
+        if arrows:
+            player.inventory[item.Category.ARROW] = arrows
+        self.reset()
+        return player
+
+    def reset(self):
+        """
+        Put the player back on the start cell and the target skeleton back on its cell.
+        """
+        maze = self.maze
+        row, col = maze.player_position
+        if maze.grid[row][col] == maze.player_emoji:
+            maze.grid[row][col] = maze.cls_empty
+        maze.set_player_position((0, 0))
+        maze.set_player_emoji(Player._emoji[Direction.RIGHT.value])
+        maze.spawn_player()
+        if TARGET not in maze.skeleton_positions:
+            maze.skeleton_positions.append(TARGET)
+            maze.grid[TARGET[0]][TARGET[1]] = maze.skeleton_emoji
+
+
+def measure(run, repeat, budget, ops=1, setup=None, warmup=0):
+    """
+    Time repeated runs of a function.
+
+    Args:
+        run (callable): Called with the result of setup, the timed part.
+        repeat (int): The maximum number of samples.
+        budget (float): Seconds after which no new sample is started.
+        ops (int): The operations one run does; samples are per operation.
+        setup (callable): Called before every run, not timed.
+        warmup (int): Untimed runs before the first sample.
+
+    Returns:
+        list: The samples, in nanoseconds per operation.
+    """
+    for _ in range(warmup):
+        run(setup() if setup else None)
+    samples = []
+    deadline = time.perf_counter() + budget
+    while len(samples) < repeat:
+        state = setup() if setup else None
+        start = time.perf_counter_ns()
+        run(state)
+        samples.append((time.perf_counter_ns() - start) / ops)
+        if time.perf_counter() > deadline:
+            break
+    return samples
+
+
+def bench_maze_init(path, repeat, budget):
+    """
+    Time Maze.__init__.
+
+    Returns:
+        tuple: (samples, the last maze loaded)
+    """
+    mazes = []
+
+    def run(_):
+        mazes[:] = [Maze(path)]
+
+    return measure(run, repeat, budget), mazes[0]
+
+
+def bench_print_maze(scenario, repeat, budget):
+    """
+    Time the rendering of a whole frame.
+    """
+    return measure(lambda _: scenario.maze.print_maze(), repeat, budget, warmup=1)
+
+
+def bench_move(scenario, repeat, budget):
+    """
+    Time Player.move, forward and back between the start cell and the next one.
+    """
+    maze = scenario.maze
+
+    def run(player):
+        for _ in range(_BATCH // 2):
+            player.move("w", maze)
+            player.move("s", maze)
+
+    return measure(run, repeat, budget, _BATCH, scenario.new_player, warmup=1)
+
+
+def bench_perform_action(scenario, repeat, budget):
+    """
+    Time the dispatch of perform_action on an empty cell.
+    """
+    maze = scenario.maze
+
+    def run(player):
+        for _ in range(_BATCH):
+            player.perform_action(_EMPTY, maze)
+
+    return measure(run, repeat, budget, _BATCH, scenario.new_player, warmup=1)
+
+
+def bench_use_arrow(scenario, repeat, budget):
+    """
+    Time an arrow shot at the target skeleton.
+    """
+    return measure(
+        lambda player: player.use_arrow(scenario.maze),
+        repeat,
+        budget,
+        setup=lambda: scenario.new_player(arrows=1),
+        warmup=1,
+    )
+
+
+def bench_combat(scenario, repeat, budget):
+    """
+    Time a fight against the target skeleton, with the same draws every run.
+    """
+    maze = scenario.maze
+    rng = random.Random(0)
+
+    def setup():
+        # every fight draws the same attacks
+        random.seed(rng.random())
+        enemy = rpg.enemy.Skeleton.extract_enemy(TARGET, None, scenario.path)
+        return scenario.new_player(), enemy
+
+    def run(state):
+        player, enemy = state
+        player.combat(player, enemy, maze)
+
+    return measure(run, repeat, budget, setup=setup, warmup=1)
+
+
+def summarize(samples):
+    """
+    Get the statistics of the samples of one benchmark.
+
+    Args:
+        samples (list): The samples, in nanoseconds.
+
+    Returns:
+        dict: The count, the median, the mean, the extremes and the percentiles.
+    """
+    if len(samples) > 1:
+        cuts = statistics.quantiles(samples, n=100, method="inclusive")
+        percentiles = {f"p{p}": cuts[p - 1] for p in _PERCENTILES}
+    else:
+        percentiles = {f"p{p}": samples[0] for p in _PERCENTILES}
+    return {
+        "samples": len(samples),
+        "median": statistics.median(samples),
+        "mean": statistics.fmean(samples),
+        "stdev": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        "min": min(samples),
+        "max": max(samples),
+        **percentiles,
+    }
+
+
+def scaling(results):
+    """
+    Get the scaling exponent of every benchmark between consecutive sizes.
+
+    Args:
+        results (list): The results of run_suite.
+
+    Returns:
+        dict: benchmark -> list of {from, to, exponent}.
+    """
+    exponents = {}
+    by_name = {}
+    for result in results:
+        by_name.setdefault(result["benchmark"], []).append(result)
+    for name, runs in by_name.items():
+        runs = sorted(runs, key=lambda result: result["cells"])
+        exponents[name] = [
+            {
+                "from": small["size"],
+                "to": large["size"],
+                "exponent": math.log(large["median"] / small["median"])
+                / math.log(large["cells"] / small["cells"]),
+            }
+            for small, large in zip(runs, runs[1:])
+            if small["median"] > 0 and large["median"] > 0
+        ]
+    return exponents
+
+
+def run_suite(sizes, benchmarks, repeat, budget, maze_dir, seed=0, log=print):
+    """
+    Run the benchmarks on a generated maze of every size.
+
+    Args:
+        sizes (list): The grid sizes.
+        benchmarks (list): The names of the benchmarks to run.
+        repeat (int): The maximum number of samples per benchmark and size.
+        budget (float): Seconds after which a benchmark stops sampling.
+        maze_dir (str): The folder of the generated mazes, reused between runs.
+        seed (int): The seed of the generated mazes.
+        log (callable): Called with a line of progress.
+
+    Returns:
+        list: One result per benchmark and size.
+    """
+    results = []
+    for size in sizes:
+        path = os.path.join(maze_dir, f"maze-{size}-{seed}.yaml")
+        if not os.path.exists(path):
+            log(f"generating {size}x{size} maze")
+            write_maze(path, size, seed)
+        with open(os.devnull, "w", encoding="utf-8") as null:
+            # the game prints every action
+            with contextlib.redirect_stdout(null):
+                samples, maze = bench_maze_init(path, repeat, budget)
+                runs = {"maze_init": samples}
+                scenario = Scenario(path, maze)
+                for name in benchmarks:
+                    if name != "maze_init":
+                        runs[name] = globals()[f"bench_{name}"](scenario, repeat, budget)
+        for name in benchmarks:
+            result = {
+                "benchmark": name,
+                "size": size,
+                "cells": size * size,
+                "unit": "ns",
+                **summarize(runs[name]),
+            }
+            results.append(result)
+            log(
+                f"{name:>15} {size:>5}x{size:<5} median {result['median'] / 1e3:>12.1f} us"
+                f"  p95 {result['p95'] / 1e3:>12.1f} us  ({result['samples']} samples)"
+            )
+    return results
+
+
+def environment():
+    """
+    Describe the machine and the commit the benchmarks ran on.
+
+    Returns:
+        dict: The Python version, the platform, the CPU and the git commit.
+    """
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "commit": commit,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the rwa3 game hot paths")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES))
+    parser.add_argument(
+        "--benchmarks", nargs="+", choices=BENCHMARKS, default=list(BENCHMARKS)
+    )
+    parser.add_argument("--repeat", type=int, default=30, help="maximum samples per benchmark")
+    parser.add_argument("--budget", type=float, default=10.0, help="seconds per benchmark")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the generated mazes")
+    parser.add_argument("--maze-dir", help="folder of the generated mazes")
+    parser.add_argument("--output", default="bench_rpg.json", help="JSON file to write")
+    args = parser.parse_args()
+
+    maze_dir = args.maze_dir or os.path.join(tempfile.gettempdir(), "rwa3-bench")
+    os.makedirs(maze_dir, exist_ok=True)
+    results = run_suite(
+        args.sizes, args.benchmarks, args.repeat, args.budget, maze_dir, args.seed
+    )
+    report = {
+        "suite": "rwa3-rpg",
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "environment": environment(),
+        "settings": {
+            "sizes": args.sizes,
+            "repeat": args.repeat,
+            "budget": args.budget,
+            "seed": args.seed,
+        },
+        "results": results,
+        "scaling": scaling(results),
+    }
+    with open(args.output, "w") as file:
+        json.dump(report, file, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
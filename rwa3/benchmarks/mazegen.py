@@ -0,0 +1,182 @@
+"""
+Random maze config files of any size.
+
+The generated files use the layout and the emojis of a maze config file, so
+Maze, Player and the enemies read them like a hand-written maze. The player
+starts in the top left corner facing right, with two free cells ahead of it
+and a skeleton named "Target" on the third, so benchmarks can move, shoot
+and fight at a known place. The other cells are filled at random from the seed.
+
+Run from the rwa3 folder to write one:
+    python benchmarks/mazegen.py SIZE OUTPUT
+"""
+import argparse
+import json
+import os
+import random
+import sys
+
+import yaml
+
+# the rpg package is in the parent folder
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from rpg.maze import file_path  # noqa: E402
+
+# Probability of each content in a generated cell, the rest is empty
+_DENSITY = (
+    ("obstacles", 0.2),
+    ("gems", 0.002),
+    ("keys", 0.008),
+    ("padlocks", 0.004),
+    ("arrows", 0.008),
+    ("hearts", 0.008),
+    ("skeletons", 0.008),
+    ("dragons", 0.004),
+)
+# Cells kept for the player and the target skeleton
+_RESERVED = {(0, 0), (0, 1), (0, 2), (0, 3), (1, 0), (1, 1), (1, 2), (1, 3)}
+TARGET = (0, 2)
+
+
+def generate(size, seed=0, config=file_path):
+    """
+    Draw the contents of a random maze.
+
+    Args:
+        size (int): The grid size, at least 4.
+        seed (int): The seed of the random contents.
+        config (str): The maze YAML file the emojis and stats are taken from.
+
+    Returns:
+        dict: The maze section of a config file.
+    """
+    if size < 4:
+        raise ValueError("a generated maze is at least 4 cells wide")
+    with open(config, "r") as file:
+        data = yaml.safe_load(file)["maze"]
+    rng = random.Random(seed)
+    positions = {name: [] for name, _ in _DENSITY}
+    for row in range(size):
+        for col in range(size):
+            if (row, col) in _RESERVED:
+                continue
+            draw = rng.random()
+            for name, density in _DENSITY:
+                if draw < density:
+                    positions[name].append([row, col])
+                    break
+                draw -= density
+    positions["skeletons"].insert(0, list(TARGET))
+
+    enemies = data["enemies"]
+    skeleton = enemies["skeletons"][0]["skeleton"]
+    dragon = enemies["dragons"][0]["dragon"]
+    items = {}
+    for name in ("gems", "keys", "padlocks", "arrows", "hearts"):
+        items[name] = dict(data["items"][name], position=positions[name])
+        # nothing is timed in a generated maze
+        items[name].pop("respawn", None)
+        items[name].pop("relock", None)
+    return {
+        "grid_size": size,
+        "obstacles": {"emoji": data["obstacles"]["emoji"], "position": positions["obstacles"]},
+        "enemies": {
+            "skeleton_emoji": enemies["skeleton_emoji"],
+            "dragon_emoji": enemies["dragon_emoji"],
+            "attack_power": enemies["attack_power"],
+            "chase": False,
+            "move_every": 1,
+            "skeletons": [
+                {
+                    "skeleton": dict(
+                        skeleton,
+                        name="Target" if index == 0 else f"Skeleton {index}",
+                        position=position,
+                    )
+                }
+                for index, position in enumerate(positions["skeletons"])
+            ],
+            "dragons": [
+                {"dragon": dict(dragon, name=f"Dragon {index}", position=position)}
+                for index, position in enumerate(positions["dragons"])
+            ],
+        },
+        "items": items,
+        "player": dict(data["player"], position=[0, 0], direction="right"),
+    }
+
+
+def write_maze(path, size, seed=0, config=file_path):
+    """
+    Write a random maze config file.
+
+    Positions are written one per line in flow style, as in the hand-written
+    files; this is much faster than yaml.safe_dump on large mazes.
+
+    Args:
+        path (str): The file to write.
+        size (int): The grid size, at least 4.
+        seed (int): The seed of the random contents.
+        config (str): The maze YAML file the emojis and stats are taken from.
+
+    Returns:
+        str: The path written.
+    """
+    maze = generate(size, seed, config)
+    with open(path, "w", encoding="utf-8") as file:
+        file.write("maze:\n")
+        _write(file, maze, 1)
+    return path
+
+
+def _write(file, data, depth):
+    """
+    Write a mapping as block YAML, with the [row, col] lists in flow style.
+    """
+    indent = "  " * depth
+    for key, value in data.items():
+        if isinstance(value, dict):
+            file.write(f"{indent}{key}:\n")
+            _write(file, value, depth + 1)
+        elif isinstance(value, list) and (not value or isinstance(value[0], int)):
+            file.write(f"{indent}{key}: {_flow(value)}\n")
+        elif isinstance(value, list) and isinstance(value[0], list):
+            file.write(f"{indent}{key}:\n")
+            file.writelines(f"{indent}  - {_flow(position)}\n" for position in value)
+        elif isinstance(value, list):
+            file.write(f"{indent}{key}:\n")
+            for entry in value:
+                # an enemy: one key holding its stats
+                (name, stats), = entry.items()
+                file.write(f"{indent}  - {name}:\n")
+                _write(file, stats, depth + 3)
+        else:
+            file.write(f"{indent}{key}: {_scalar(value)}\n")
+
+
+def _flow(values):
+    return "[" + ", ".join(str(value) for value in values) + "]"
+
+
+def _scalar(value):
+    if isinstance(value, str):
+        # a JSON string is a double-quoted YAML string
+        return json.dumps(value, ensure_ascii=False)
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a random rwa3 maze config file")
+    parser.add_argument("size", type=int, help="grid size")
+    parser.add_argument("output", help="YAML file to write")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    write_maze(args.output, args.size, args.seed)
+    print(f"{args.size}x{args.size} maze written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+"""
+Memory report of a maze load.
+
+Loads a maze config file under tracemalloc and reports where the memory goes:
+- the bytes of every subsystem: the grid rows, every position list, the emoji
+  strings, the item registry, the timed systems (scheduler, flow field, field
+  of view), the enemy objects of every skeleton and dragon, and the cached YAML
+  of the enemies
+- the bytes per grid cell
+- the peak reached while parsing the YAML file
+- the top allocation sites of the load
+
+Subsystem sizes are measured by walking the objects they hold; an object
+shared by several subsystems (e.g. an emoji string in every cell) is counted
+once, in the first one. The top sites come from tracemalloc.
+
+Run from the rwa3 folder, with --sweep to load generated mazes of growing size
+and see how the memory grows:
+    python benchmarks/memreport.py [CONFIG]
+    python benchmarks/memreport.py --sweep 10 50 100
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import tracemalloc
+
+# the rpg package is in the parent folder
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+# player imports enemy, which needs player to be imported first
+import rpg.player  # noqa: F401, E402
+import rpg.enemy  # noqa: E402
+from rpg.maze import Maze, file_path  # noqa: E402
+from mazegen import write_maze  # noqa: E402
+
+# The position lists of a maze, by attribute name
+_POSITIONS = (
+    "_obstacle_positions",
+    "_gem_positions",
+    "_key_positions",
+    "_arrow_positions",
+    "_heart_positions",
+    "_padlock_positions",
+    "_skeleton_positions",
+    "_dragon_positions",
+    "_bomb_positions",
+    "_spell_positions",
+)
+# Objects the walk never enters: they are shared by the whole program
+_SHARED_TYPES = (type, type(sys), type(len), type(lambda: None))
+# Frames kept per allocation for the top sites, enough to get from the YAML
+# parser back to the line of the game that called it; tracing slows down with it
+_FRAMES = 10
+_PACKAGE = os.path.dirname(os.path.abspath(__file__))
+
+
+def deep_size(obj, seen):
+    """
+    Get the bytes of an object and of everything it holds, skipping the objects
+    already seen.
+
+    Args:
+        obj (object): The object.
+        seen (set): The ids of the objects already counted; updated.
+
+    Returns:
+        int: The bytes.
+    """
+    size = 0
+    stack = [obj]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, _SHARED_TYPES):
+            continue
+        # the small ints and the empty tuple are shared by the interpreter
+        if (isinstance(obj, int) and -5 <= obj <= 256) or obj == ():
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        elif hasattr(obj, "__self__") and hasattr(obj, "__func__"):
+            # a bound method keeps its object alive
+            stack.append(obj.__self__)
+        else:
+            if hasattr(obj, "__dict__"):
+                stack.append(vars(obj))
+            for name in getattr(type(obj), "__slots__", ()):
+                if hasattr(obj, name):
+                    stack.append(getattr(obj, name))
+    return size
+
+
+def measure(path, top=10, frames=_FRAMES):
+    """
+    Load a maze and measure its memory.
+
+    Args:
+        path (str): The maze YAML file.
+        top (int): The number of allocation sites reported.
+        frames (int): The frames kept per allocation; 1 is much faster but
+            reports the sites inside the YAML parser.
+
+    Returns:
+        dict: The grid size, the totals, the bytes of every subsystem and the
+        top allocation sites.
+    """
+    rpg.enemy.load_enemies.cache_clear()
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start(frames if top else 1)
+    try:
+        tracemalloc.reset_peak()
+        before = tracemalloc.take_snapshot()
+        base, _ = tracemalloc.get_traced_memory()
+        maze = Maze(path)
+        loaded, load_peak = tracemalloc.get_traced_memory()
+        enemies = [
+            rpg.enemy.Skeleton.extract_enemy(position, None, path)
+            for position in maze.skeleton_positions
+        ] + [
+            rpg.enemy.Dragon.extract_enemy(position, None, path)
+            for position in maze.dragon_positions
+        ]
+        after = tracemalloc.take_snapshot()
+        total, _ = tracemalloc.get_traced_memory()
+    finally:
+        if started:
+            tracemalloc.stop()
+
+    # the maze object is counted in "other", its attributes in their subsystem
+    seen = {id(maze), id(vars(maze))}
+    subsystems = {}
+    emojis = {
+        cell for row in maze.grid for cell in row
+    } | {value for name, value in vars(maze).items() if name.endswith("_emoji")}
+    subsystems["emoji strings"] = sum(deep_size(emoji, seen) for emoji in emojis)
+    subsystems["grid"] = deep_size(maze.grid, seen)
+    for name in _POSITIONS:
+        subsystems[name.strip("_").replace("_", " ")] = deep_size(getattr(maze, name), seen)
+    subsystems["item registry"] = deep_size(maze.items, seen)
+    subsystems["systems"] = deep_size(
+        [maze.scheduler, maze.fov, maze._obstacle_listeners], seen
+    )
+    subsystems["other"] = sys.getsizeof(maze) + deep_size(vars(maze), seen) + sys.getsizeof(
+        vars(maze)
+    )
+    subsystems["enemy objects"] = deep_size(enemies, seen)
+    subsystems["enemy YAML cache"] = deep_size(rpg.enemy.load_enemies(path), seen)
+    rpg.enemy.load_enemies.cache_clear()
+
+    cells = maze.grid_size * maze.grid_size
+    sites = {}
+    for stat in after.compare_to(before, "traceback"):
+        site = _site(stat.traceback)
+        size, blocks = sites.get(site, (0, 0))
+        sites[site] = (size + stat.size_diff, blocks + stat.count_diff)
+    sites = sorted(sites.items(), key=lambda entry: -entry[1][0])
+    return {
+        "config": path,
+        "grid_size": maze.grid_size,
+        "cells": cells,
+        "maze_bytes": loaded - base,
+        "traced_bytes": total - base,
+        "load_peak_bytes": load_peak - base,
+        "bytes_per_cell": (loaded - base) / cells,
+        "subsystems": subsystems,
+        "top_sites": [
+            {"site": site, "bytes": size, "blocks": blocks}
+            for site, (size, blocks) in sites[:top]
+        ],
+    }
+
+
+def _site(traceback):
+    """
+    Get the line of the game an allocation comes from: the most recent frame in
+    the rpg package, with the line that allocated when it is elsewhere.
+
+    Args:
+        traceback (tracemalloc.Traceback): The frames of the allocation.
+
+    Returns:
+        str: file:line, followed by "via file:line" for an allocation in a library.
+    """
+    frames = list(traceback)
+    # the frames go from the oldest to the most recent
+    newest = frames[-1]
+    for frame in reversed(frames):
+        if frame.filename.startswith(_PACKAGE):
+            site = f"{os.path.relpath(frame.filename, os.path.dirname(_PACKAGE))}:{frame.lineno}"
+            if frame is newest:
+                return site
+            return f"{site} via {os.path.basename(newest.filename)}:{newest.lineno}"
+    return f"{newest.filename}:{newest.lineno}"
+
+
+def sweep(sizes, seed=0, maze_dir=None):
+    """
+    Measure generated mazes of growing size.
+
+    Args:
+        sizes (list): The grid sizes.
+        seed (int): The seed of the generated mazes.
+        maze_dir (str): The folder of the generated mazes, a temporary one if None.
+
+    Returns:
+        list: The report of every size, without the allocation sites.
+    """
+    maze_dir = maze_dir or tempfile.mkdtemp(prefix="rwa3-memreport-")
+    reports = []
+    for size in sizes:
+        path = os.path.join(maze_dir, f"maze-{size}-{seed}.yaml")
+        if not os.path.exists(path):
+            write_maze(path, size, seed)
+        report = measure(path, top=0)
+        del report["top_sites"]
+        reports.append(report)
+    return reports
+
+
+def print_report(report):
+    """
+    Print the report of one maze.
+    """
+    print(f"{report['config']}: {report['grid_size']}x{report['grid_size']}")
+    print(f"  maze after load   {_kib(report['maze_bytes'])}")
+    print(f"  peak during load  {_kib(report['load_peak_bytes'])}")
+    print(f"  per cell          {report['bytes_per_cell']:>10.1f} B")
+    print("  subsystems:")
+    for name, size in sorted(report["subsystems"].items(), key=lambda entry: -entry[1]):
+        print(f"    {name:<20} {_kib(size)}")
+    print("  top allocation sites:")
+    for site in report["top_sites"]:
+        print(f"    {_kib(site['bytes'])} {site['blocks']:>8} blocks  {site['site']}")
+
+
+def print_sweep(reports):
+    """
+    Print how the memory grows with the grid size.
+    """
+    names = list(reports[0]["subsystems"])
+    print(f"{'size':>6} {'maze KiB':>10} {'peak KiB':>10} {'B/cell':>8}  largest subsystems")
+    for report in reports:
+        largest = sorted(names, key=lambda name: -report["subsystems"][name])[:3]
+        print(
+            f"{report['grid_size']:>6} {report['maze_bytes'] / 1024:>10.1f} "
+            f"{report['load_peak_bytes'] / 1024:>10.1f} {report['bytes_per_cell']:>8.1f}  "
+            + ", ".join(f"{name} {report['subsystems'][name] / 1024:.1f}" for name in largest)
+        )
+
+
+def _kib(size):
+    return f"{size / 1024:>10.1f} KiB"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory report of an rwa3 maze load")
+    parser.add_argument("config", nargs="?", default=file_path, help="maze YAML file")
+    parser.add_argument(
+        "--sweep", type=int, nargs="+", metavar="SIZE", help="measure generated mazes of these sizes"
+    )
+    parser.add_argument("--top", type=int, default=10, help="allocation sites reported")
+    parser.add_argument(
+        "--frames", type=int, default=_FRAMES, help="frames kept per allocation (slower when higher)"
+    )
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    if args.sweep:
+        reports = sweep(args.sweep)
+        if args.json:
+            print(json.dumps(reports, indent=2))
+        else:
+            print_sweep(reports)
+    else:
+        report = measure(args.config, args.top, args.frames)
+        if args.json:
+            print(json.dumps(report, indent=2))
+        else:
+            print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,14 +3,70 @@ RWA3 - Group 4
 
 main file to initiate the maze game
 """
+import argparse
+import sys
+
 from rpg.player import Player
 from rpg.maze import Maze  # noqa: E402
 from rpg.maze import file_path
+from rpg.dungeon import Dungeon
+from rpg.world import World, explore
+from rpg import stats, tracing
 
 
 if __name__ == "__main__":
-    maze = Maze(file_path)
+    parser = argparse.ArgumentParser(description="Maze game")
+    parser.add_argument(
+        "--dungeon", help="YAML file of a multi-floor dungeon (e.g. rpg/dungeon.yaml)"
+    )
+    parser.add_argument(
+        "--world", type=int, metavar="SEED", help="explore an unbounded generated world"
+    )
+    parser.add_argument(
+        "--raw", action="store_true", help="play with single keypresses, no Enter needed"
+    )
+    parser.add_argument(
+        "--trace",
+        nargs="?",
+        const="",
+        metavar="FILE",
+        help="time every phase of every turn, dumped on quit or SIGUSR1 (and to FILE as JSON)",
+    )
+    parser.add_argument(
+        "--stats", metavar="FILE", help="aggregate the statistics of the games into FILE as JSON"
+    )
+    args = parser.parse_args()
+
+    if args.trace is not None:
+        tracing.enable(output=args.trace or None)
+    if args.stats:
+        stats.enable(output=args.stats)
+
+    if args.world is not None:
+        world = World.from_config(file_path, args.world)
+        try:
+            explore(world, Player.extract_player(file_path), file_path)
+        finally:
+            world.close()
+        raise SystemExit
+
+    dungeon = None
+    if args.dungeon:
+        try:
+            dungeon = Dungeon.from_file(args.dungeon)
+        except ValueError as e:
+            parser.error(str(e))
+        maze = dungeon.floor(0)
+    else:
+        maze = Maze(file_path)
+    # the raw mode uses termios, which Windows does not have
+    if args.raw and sys.stdin.isatty() and sys.platform != "win32":
+        from rpg import terminal
+
+        terminal.play(Player.extract_player(), maze, dungeon)
+        raise SystemExit
+    if args.raw:
+        print("--raw needs a Unix terminal, falling back to line input.")
     maze.print_maze()
     # Starting the game loop using the start method of the Player class
-    Player.start(Player.extract_player(), maze)
-    
\ No newline at end of file
+    Player.start(Player.extract_player(), maze, dungeon)
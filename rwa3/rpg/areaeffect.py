@@ -0,0 +1,154 @@
+"""
+Area weapons: bombs and fire spells.
+
+A bomb damages every enemy within its radius around the player, a fire spell
+every enemy in a 90 degree cone ahead of the player, up to its range. Only the
+enemies in the line of sight of the player are reached: obstacles and padlocks
+shelter the ones behind them, as told by the BlockMap of the maze.
+
+The targets are chosen with array operations over the positions of all the
+enemies. The enemies reached get their stats in one EnemyTable, are damaged and
+checked for death at once, and the dead are removed from the maze in one pass.
+As with the arrows, damage that does not kill is not kept: an enemy gets its
+stats from the YAML file of the maze at every encounter.
+"""
+import numpy as np
+
+from rpg.enemytable import DRAGON, EnemyTable
+
+
+def enemy_positions(maze):
+    """
+    Get the positions of all the enemies of a maze as one array.
+
+    Args:
+        maze (Maze): The maze.
+
+    Returns:
+        tuple: ((n, 2) array of the skeletons then the dragons, the number of skeletons).
+    """
+    skeletons = np.array(list(maze.skeleton_positions), dtype=np.int64).reshape(-1, 2)
+    dragons = np.array(list(maze.dragon_positions), dtype=np.int64).reshape(-1, 2)
+    return np.concatenate((skeletons, dragons)), len(skeletons)
+
+
+def blast_mask(positions, center, radius):
+    """
+    Get the positions within a radius of a cell.
+
+    Args:
+        positions (ndarray): (n, 2) positions.
+        center (tuple): The cell.
+        radius (int): The radius, in cells.
+
+    Returns:
+        ndarray: The boolean mask of the positions reached.
+    """
+    offsets = positions - np.asarray(center)
+    return (offsets * offsets).sum(axis=1) <= radius * radius
+
+
+def cone_mask(positions, origin, direction, reach):
+    """
+    Get the positions in the 90 degree cone ahead of a cell.
+
+    Args:
+        positions (ndarray): (n, 2) positions.
+        origin (tuple): The cell the cone starts from, not in it.
+        direction (tuple): The (row, col) step the cone points to.
+        reach (int): The number of rows or columns the cone spans.
+
+    Returns:
+        ndarray: The boolean mask of the positions reached.
+    """
+    offsets = positions - np.asarray(origin)
+    forward = offsets @ np.asarray(direction)
+    side = np.abs(offsets[:, 0] * direction[1] - offsets[:, 1] * direction[0])
+    return (forward > 0) & (forward <= reach) & (side <= forward)
+
+
+def strike(maze, origin, area, damage):
+    """
+    Damage the visible enemies of an area and remove the ones it kills.
+
+    Args:
+        maze (Maze): The maze.
+        origin (tuple): The cell of the player.
+        area (callable): Takes the (n, 2) enemy positions, returns the mask of the area.
+        damage (int): The damage to every enemy reached.
+
+    Returns:
+        tuple: (EnemyTable of the enemies reached, with their health left, dict
+        of the ones killed as returned by EnemyTable.compact).
+    """
+    positions, skeletons = enemy_positions(maze)
+    candidates = np.flatnonzero(area(positions))
+    candidates = candidates[maze.block_map().in_sight(origin, positions[candidates])]
+    reached = positions[candidates].tolist()
+    split = int(np.searchsorted(candidates, skeletons))
+    table = EnemyTable.from_positions(
+        maze,
+        [tuple(position) for position in reached[:split]],
+        [tuple(position) for position in reached[split:]],
+    )
+    table.damage(np.ones(len(table), dtype=bool), damage)
+    killed = table.compact(table.dead())
+    maze.remove_enemies(zip(killed["row"].tolist(), killed["col"].tolist()))
+    return table, killed
+
+
+def bomb(maze, center):
+    """
+    Blow a bomb up around the player.
+
+    Args:
+        maze (Maze): The maze.
+        center (tuple): The cell of the player.
+
+    Returns:
+        tuple: See strike().
+    """
+    radius = maze.bomb_radius
+    return strike(maze, center, lambda positions: blast_mask(positions, center, radius), maze.bomb_damage)
+
+
+def fire_spell(maze, origin, direction):
+    """
+    Cast a fire spell ahead of the player.
+
+    Args:
+        maze (Maze): The maze.
+        origin (tuple): The cell of the player.
+        direction (tuple): The (row, col) step the player faces.
+
+    Returns:
+        tuple: See strike().
+    """
+    reach = maze.spell_range
+    return strike(
+        maze,
+        origin,
+        lambda positions: cone_mask(positions, origin, direction, reach),
+        maze.spell_damage,
+    )
+
+
+def describe(table, killed):
+    """
+    Get the message telling what an area weapon did.
+
+    Args:
+        table (EnemyTable): The enemies reached and still alive.
+        killed (dict): The enemies killed.
+
+    Returns:
+        str: The message.
+    """
+    hit = len(table) + len(killed["names"])
+    if not hit:
+        return "No enemy was reached."
+    dragons = int((killed["kind"] == DRAGON).sum())
+    return (
+        f"{hit} enemies hit, {len(killed['names'])} defeated "
+        f"({len(killed['names']) - dragons} skeletons, {dragons} dragons)."
+    )
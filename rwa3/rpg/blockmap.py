@@ -0,0 +1,79 @@
+"""
+The cells blocking movement and sight, as a NumPy grid.
+
+A BlockMap marks the obstacles and the closed padlocks of a maze in a boolean
+array and follows their changes through the obstacle listener of the maze, so
+bulk queries (line of sight of many targets, collisions of many moving things)
+index one array instead of looking every cell up in the position lists.
+"""
+import numpy as np
+
+
+class BlockMap:
+    """
+    A class representing the blocked cells of a maze.
+
+    Attributes:
+        _blocked (ndarray): (size, size) booleans, True where a cell blocks.
+    """
+
+    def __init__(self, maze):
+        """
+        Mark the obstacles and padlocks of a maze and follow their changes.
+
+        Args:
+            maze (Maze): The maze.
+        """
+        size = maze.grid_size
+        self._blocked = np.zeros((size, size), dtype=bool)
+        for positions in (maze.obstacle_positions, maze.padlock_positions):
+            cells = np.array(list(positions), dtype=np.int64).reshape(-1, 2)
+            self._blocked[cells[:, 0], cells[:, 1]] = True
+        maze.add_obstacle_listener(self.on_obstacle_change)
+
+    @property
+    def blocked(self):
+        """
+        The (size, size) boolean grid, True where a cell blocks.
+        """
+        return self._blocked
+
+    def on_obstacle_change(self, position, blocked):
+        """
+        Update a cell that changed.
+
+        Args:
+            position (tuple): The cell.
+            blocked (bool): Whether the cell now blocks.
+        """
+        self._blocked[position[0], position[1]] = blocked
+
+    def in_sight(self, origin, targets):
+        """
+        Check which targets can be seen from a cell.
+
+        A target is seen when no blocked cell lies on the straight line between
+        the centers of the two cells; the cells at both ends do not count.
+
+        Args:
+            origin (tuple): The cell of the viewer.
+            targets (ndarray): (n, 2) target cells.
+
+        Returns:
+            ndarray: The boolean mask of the targets seen.
+        """
+        offsets = targets - np.asarray(origin)
+        steps = np.abs(offsets).max(axis=1)
+        longest = int(steps.max()) if len(targets) else 0
+        if longest < 2:
+            return np.ones(len(targets), dtype=bool)
+        # the cells in between, one per step along the longest axis
+        between = np.arange(1, longest)
+        fractions = between / np.maximum(steps, 1)[:, None]
+        rows = np.rint(origin[0] + offsets[:, :1] * fractions).astype(np.int64)
+        cols = np.rint(origin[1] + offsets[:, 1:] * fractions).astype(np.int64)
+        on_line = between < steps[:, None]
+        size = len(self._blocked)
+        np.clip(rows, 0, size - 1, out=rows)
+        np.clip(cols, 0, size - 1, out=cols)
+        return ~(self._blocked[rows, cols] & on_line).any(axis=1)
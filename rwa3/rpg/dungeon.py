@@ -0,0 +1,193 @@
+"""
+Multi-floor dungeon made of stacked mazes connected by stairs.
+
+Floors are loaded on first entry. Only the most recently visited floors are kept
+in memory; the others are written to disk with their current state (removed
+items, dead enemies, moved enemies) and restored from there on return.
+"""
+import os.path
+import pickle
+import tempfile
+from collections import OrderedDict
+
+import yaml
+
+from rpg.maze import Maze
+
+
+class Dungeon:
+    """
+    A class representing a dungeon of several maze floors.
+
+    Attributes:
+        _floor_paths (list): The YAML file of every floor.
+        _stairs (dict): (floor, position) -> (target floor, arrival position).
+        _stairs_emoji (str): The emoji drawn on the stairs cells.
+        _hot_floors (int): The number of floors kept in memory.
+        _cache_dir (str): The folder the evicted floors are written to.
+        _temporary (TemporaryDirectory): The folder made for them if none was
+            given, removed with the dungeon or at exit.
+        _loaded (OrderedDict): The floors in memory, least recently visited first.
+        _current (int): The floor the player is on.
+    """
+
+    def __init__(self, floor_paths, stairs, stairs_emoji, hot_floors=2, cache_dir=None):
+        """
+        Initialize the dungeon. No floor is loaded until it is entered.
+
+        Args:
+            floor_paths (list): The YAML file of every floor.
+            stairs (dict): (floor, position) -> (target floor, arrival position).
+            stairs_emoji (str): The emoji drawn on the stairs cells.
+            hot_floors (int): The number of floors kept in memory, at least 1.
+            cache_dir (str): The folder for the evicted floors, a temporary one if None.
+        """
+        self._floor_paths = list(floor_paths)
+        self._stairs = stairs
+        self._stairs_emoji = stairs_emoji
+        self._hot_floors = max(hot_floors, 1)
+        self._temporary = None
+        if cache_dir is None:
+            self._temporary = tempfile.TemporaryDirectory(prefix="rwa3-dungeon-")
+            cache_dir = self._temporary.name
+        self._cache_dir = cache_dir
+        self._loaded = OrderedDict()
+        self._current = 0
+
+    @classmethod
+    def from_file(cls, path):
+        """
+        Build a dungeon from its YAML file.
+
+        Floor paths are relative to the folder of the dungeon file.
+
+        Args:
+            path (str): The dungeon YAML file.
+
+        Returns:
+            Dungeon: The dungeon described by the file.
+
+        Raises:
+            ValueError: If the file is not a dungeon file.
+        """
+        with open(path, "r") as file:
+            try:
+                data = yaml.safe_load(file)["dungeon"]
+            except yaml.YAMLError as e:
+                raise ValueError(f"{path} could not be parsed: {e}") from e
+            except (KeyError, TypeError) as e:
+                raise ValueError(f"{path} has no dungeon section") from e
+        folder = os.path.dirname(os.path.abspath(path))
+        stairs = {}
+        for stairs_data in data["stairs"]:
+            stairs[(stairs_data["floor"], tuple(stairs_data["position"]))] = (
+                stairs_data["to_floor"],
+                tuple(stairs_data["arrival"]),
+            )
+        return cls(
+            [os.path.join(folder, floor) for floor in data["floors"]],
+            stairs,
+            data["stairs_emoji"],
+            data.get("hot_floors", 2),
+        )
+
+    def close(self):
+        """
+        Remove the evicted floors written to a temporary folder.
+        """
+        if self._temporary is not None:
+            self._temporary.cleanup()
+            self._temporary = None
+
+    @property
+    def current_floor(self):
+        """
+        The index of the floor the player is on.
+        """
+        return self._current
+
+    @property
+    def loaded_floors(self):
+        """
+        The indices of the floors in memory, least recently visited first.
+        """
+        return list(self._loaded)
+
+    def floor(self, index):
+        """
+        Get a floor, loading or restoring it if needed.
+
+        Args:
+            index (int): The index of the floor.
+
+        Returns:
+            Maze: The floor.
+        """
+        if index in self._loaded:
+            self._loaded.move_to_end(index)
+            return self._loaded[index]
+
+        saved = self._saved_path(index)
+        if os.path.exists(saved):
+            with open(saved, "rb") as file:
+                maze = pickle.load(file)
+        else:
+            maze = Maze(self._floor_paths[index])
+            for floor, position in self._stairs:
+                if floor == index:
+                    maze.grid[position[0]][position[1]] = self._stairs_emoji
+
+        self._loaded[index] = maze
+        while len(self._loaded) > self._hot_floors:
+            self._evict()
+        return maze
+
+    def use_stairs(self, maze):
+        """
+        Move the player to another floor if they stand on stairs.
+
+        Args:
+            maze (Maze): The floor the player is on.
+
+        Returns:
+            Maze: The floor the player is on after the move.
+        """
+        key = (self._current, tuple(maze.player_position))
+        if key not in self._stairs:
+            return maze
+        target, arrival = self._stairs[key]
+
+        # the player leaves the stairs on the old floor
+        position = maze.player_position
+        maze.grid[position[0]][position[1]] = self._stairs_emoji
+
+        self._current = target
+        new_maze = self.floor(target)
+        position = new_maze.player_position
+        if new_maze.grid[position[0]][position[1]] == new_maze.player_emoji:
+            new_maze.grid[position[0]][position[1]] = new_maze.cls_empty
+        new_maze.set_player_position(arrival)
+        new_maze.set_player_emoji(maze.player_emoji)
+        new_maze.spawn_player()
+        print(f"{self._stairs_emoji} Arthur takes the stairs to floor {target}.")
+        return new_maze
+
+    def _evict(self):
+        """
+        Write the least recently visited floor to disk and drop it from memory.
+        """
+        index, maze = self._loaded.popitem(last=False)
+        with open(self._saved_path(index), "wb") as file:
+            pickle.dump(maze, file, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def _saved_path(self, index):
+        """
+        Get the file an evicted floor is written to.
+
+        Args:
+            index (int): The index of the floor.
+
+        Returns:
+            str: The path of the file.
+        """
+        return os.path.join(self._cache_dir, f"floor_{index}.pickle")
@@ -2,7 +2,29 @@ import yaml
 
 from rpg.maze import file_path
 from abc import ABC, abstractmethod
+from functools import lru_cache
 import rpg.player
+from rpg import hooks
+
+
+@lru_cache(maxsize=None)
+def load_enemies(path=file_path):
+    """
+    Extract the enemies section of a YAML file. The file is read once and the
+    result is shared by every enemy and session, so it must not be modified.
+
+    Args:
+        path (str): The YAML file of the maze.
+
+    Returns:
+        dict: The enemies section, None if the file could not be parsed.
+    """
+    with open(path, "r") as file:
+        try:
+            return yaml.safe_load(file)["maze"]["enemies"]
+        except yaml.YAMLError as e:
+            print(f"Error parsing YAML file: {e}")
+    return None
 
 
 class Enemy(ABC):
@@ -14,6 +36,9 @@ class Enemy(ABC):
         health (int): The health of the enemy.
     """
 
+    # many enemies are created, slots keep them small
+    __slots__ = ("_position", "_name", "_health", "_attack_power")
+
     def __init__(
         self, position, name, health, attack_power
     ):
@@ -26,7 +51,8 @@ class Enemy(ABC):
             health (int): The health points of the enemy.
             attack_power (int): The attack power of the enemy. 
         """
-        self._position = position
+        # a tuple is not copied, the position lists of Maze hold tuples
+        self._position = tuple(position)
         self._name = name
         self._health = health
         self._attack_power = attack_power
@@ -69,12 +95,14 @@ class Enemy(ABC):
         pass
 
     @abstractmethod
-    def extract_enemy(cls, position):
+    def extract_enemy(cls, position, spawn=None, path=file_path):
         """
         Extract enemy data from the YAML file.
 
         Args:
             position (list): positional index of enemy
+            spawn (list): position of the enemy in the YAML file, if it has moved
+            path (str): the YAML file of the maze the enemy is in
         """
 
         pass
@@ -88,6 +116,8 @@ class Skeleton(Enemy):
         shield_power (int): The power of the skeleton's shield.
     """
 
+    __slots__ = ("_shield_power",)
+
     def __init__(self, name, health, position, shield_power, attack_power):
         """
         Initialize the skeleton enemy.
@@ -147,34 +177,32 @@ class Skeleton(Enemy):
             print(f"🧟💜 {self._name} has {self._health} health left.")
 
     @classmethod
-    def extract_enemy(cls, position):
+    @hooks.phase("extract_enemy")
+    def extract_enemy(cls, position, spawn=None, path=file_path):
         """
         Extract enemy data from the YAML file.
 
         Args:
             position (list): Positional index of the skeleton.
+            spawn (list): Position of the skeleton in the YAML file, if it has moved.
+            path (str): The YAML file of the maze the skeleton is in.
 
         Returns:
             Skeleton: A new instance of Skeleton extracted from the YAML file.
         """
 
-        with open(file_path, "r") as file:
-            try:
-                data = yaml.safe_load(file)
-                # Retrieve the enemies: dragons
-                for enemy_data in data["maze"]["enemies"]["skeletons"]:
-                    if list(position) == enemy_data["skeleton"]["position"]:
-                        return Skeleton(
-                            enemy_data["skeleton"]["name"],
-                            enemy_data["skeleton"]["health"],
-                            enemy_data["skeleton"]["position"],
-                            enemy_data["skeleton"]["shield_power"],
-                            data["maze"]["enemies"]["attack_power"]
-                        )
-
-            except yaml.YAMLError as e:
-                print(f"Error parsing YAML file: {e}")
-        pass
+        enemies = load_enemies(path)
+        if enemies is None:
+            return None
+        for enemy_data in enemies["skeletons"]:
+            if list(spawn or position) == enemy_data["skeleton"]["position"]:
+                return Skeleton(
+                    enemy_data["skeleton"]["name"],
+                    enemy_data["skeleton"]["health"],
+                    position,
+                    enemy_data["skeleton"]["shield_power"],
+                    enemies["attack_power"]
+                )
 
 
 class Dragon(Enemy):
@@ -185,6 +213,8 @@ class Dragon(Enemy):
         fire_breath_power (int): The power of the dragon's fire breath.
     """
 
+    __slots__ = ("_fire_breath_power",)
+
     def __init__(self, name, health, position, fire_breath_power, attack_power):
         """
         Initialize the dragon enemy.
@@ -239,31 +269,29 @@ class Dragon(Enemy):
             print(f"🧟💜 {self._name} has {self._health} health left.")
 
     @classmethod
-    def extract_enemy(cls, position):
+    @hooks.phase("extract_enemy")
+    def extract_enemy(cls, position, spawn=None, path=file_path):
         """
         Extract enemy data from the YAML file.
 
         Args:
             position (list): Positional index of the dragon.
+            spawn (list): Position of the dragon in the YAML file, if it has moved.
+            path (str): The YAML file of the maze the dragon is in.
 
         Returns:
             Dragon: A new instance of Dragon extracted from the YAML file.
         """
 
-        with open(file_path, "r") as file:
-            try:
-                data = yaml.safe_load(file)
-                # Retrieve the enemies: dragons
-                for enemy_data in data["maze"]["enemies"]["dragons"]:
-                    if list(position) == enemy_data["dragon"]["position"]:
-                        return Dragon(
-                            enemy_data["dragon"]["name"],
-                            enemy_data["dragon"]["health"],
-                            enemy_data["dragon"]["position"],
-                            enemy_data["dragon"]["fire_power"],
-                            data["maze"]["enemies"]["attack_power"]
-                        )
-
-            except yaml.YAMLError as e:
-                print(f"Error parsing YAML file: {e}")
-        pass
+        enemies = load_enemies(path)
+        if enemies is None:
+            return None
+        for enemy_data in enemies["dragons"]:
+            if list(spawn or position) == enemy_data["dragon"]["position"]:
+                return Dragon(
+                    enemy_data["dragon"]["name"],
+                    enemy_data["dragon"]["health"],
+                    position,
+                    enemy_data["dragon"]["fire_power"],
+                    enemies["attack_power"]
+                )
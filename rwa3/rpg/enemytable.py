@@ -0,0 +1,387 @@
+"""
+Struct-of-arrays store of the enemies of a maze.
+
+Every enemy is one row of parallel NumPy arrays: position, health, attack power,
+shield power, fire power and kind. Bulk updates such as "damage every enemy
+within radius r" are single array operations instead of a loop of take_damage
+calls, and the dead rows are dropped in one compaction.
+
+For a single encounter, view() returns a SkeletonView or DragonView: a Skeleton
+or Dragon whose attributes are read from and written to the row, so attack,
+take_damage and Player.combat work unchanged.
+"""
+from functools import lru_cache
+
+import numpy as np
+
+# player imports enemy, which needs player to be imported first
+import rpg.player  # noqa: F401
+from rpg.enemy import Dragon, Skeleton, load_enemies
+from rpg.maze import file_path
+
+# Kind codes
+SKELETON = 0
+DRAGON = 1
+
+_DTYPES = (
+    ("row", np.int32),
+    ("col", np.int32),
+    ("health", np.int64),
+    ("attack", np.int64),
+    ("shield", np.int64),
+    ("fire", np.int64),
+    ("kind", np.int8),
+)
+
+
+class EnemyTable:
+    """
+    A class representing the enemies of a maze as parallel arrays.
+
+    Rows keep their order; compact() drops the dead ones, which changes the
+    row of the enemies after them.
+
+    Attributes:
+        row (ndarray): The row of every enemy.
+        col (ndarray): The column of every enemy.
+        health (ndarray): The health of every enemy.
+        attack (ndarray): The attack power of every enemy.
+        shield (ndarray): The shield power of every enemy, 0 for dragons.
+        fire (ndarray): The fire breath power of every enemy, 0 for skeletons.
+        kind (ndarray): SKELETON or DRAGON.
+        names (ndarray): The name of every enemy, as objects.
+        _rows (dict): position -> row, for the lookups of single encounters.
+    """
+
+    def __init__(self, capacity=0):
+        """
+        Initialize an empty table.
+
+        Args:
+            capacity (int): The number of rows allocated ahead.
+        """
+        self._count = 0
+        self._capacity = max(capacity, 8)
+        self._arrays = {name: np.zeros(self._capacity, dtype=dtype) for name, dtype in _DTYPES}
+        self._names = np.empty(self._capacity, dtype=object)
+        self._rows = {}
+
+    @classmethod
+    def from_maze(cls, maze):
+        """
+        Build the table of the enemies of a maze, with their stats from its YAML file.
+
+        Args:
+            maze (Maze): The maze.
+
+        Returns:
+            EnemyTable: The table, skeletons first.
+        """
+        return cls.from_positions(maze, maze.skeleton_positions, maze.dragon_positions)
+
+    @classmethod
+    def from_positions(cls, maze, skeleton_positions, dragon_positions):
+        """
+        Build the table of some enemies of a maze, with their stats from its YAML file.
+
+        Args:
+            maze (Maze): The maze.
+            skeleton_positions (list): The positions of the skeletons.
+            dragon_positions (list): The positions of the dragons.
+
+        Returns:
+            EnemyTable: The table, skeletons first.
+        """
+        attack_power, skeletons, dragons = _stats(maze.file_path or file_path)
+        table = cls(len(skeleton_positions) + len(dragon_positions))
+        for position in skeleton_positions:
+            stats = skeletons[maze.enemy_spawn(position)]
+            table.add(
+                SKELETON,
+                stats["name"],
+                position,
+                stats["health"],
+                attack_power,
+                shield=stats["shield_power"],
+            )
+        for position in dragon_positions:
+            stats = dragons[maze.enemy_spawn(position)]
+            table.add(
+                DRAGON, stats["name"], position, stats["health"], attack_power, fire=stats["fire_power"]
+            )
+        return table
+
+    def __len__(self):
+        return self._count
+
+    def __getattr__(self, name):
+        # the arrays, cut to the live rows
+        arrays = self.__dict__.get("_arrays")
+        if arrays is None or name not in arrays:
+            raise AttributeError(name)
+        return arrays[name][:self._count]
+
+    @property
+    def names(self):
+        """
+        The name of every enemy.
+        """
+        return self._names[:self._count]
+
+    def positions(self):
+        """
+        Get the positions of all the enemies.
+
+        Returns:
+            ndarray: (n, 2) rows and columns.
+        """
+        return np.stack((self.row, self.col), axis=1)
+
+    def add(self, kind, name, position, health, attack, shield=0, fire=0):
+        """
+        Add an enemy at the end of the table.
+
+        Args:
+            kind (int): SKELETON or DRAGON.
+            name (str): The name of the enemy.
+            position (tuple): The position of the enemy.
+            health (int): The health of the enemy.
+            attack (int): The attack power of the enemy.
+            shield (int): The shield power of a skeleton.
+            fire (int): The fire breath power of a dragon.
+
+        Returns:
+            int: The row of the enemy.
+        """
+        if self._count == self._capacity:
+            self._grow()
+        index = self._count
+        values = {
+            "row": position[0],
+            "col": position[1],
+            "health": health,
+            "attack": attack,
+            "shield": shield,
+            "fire": fire,
+            "kind": kind,
+        }
+        for array_name, value in values.items():
+            self._arrays[array_name][index] = value
+        self._names[index] = name
+        self._rows[tuple(position)] = index
+        self._count += 1
+        return index
+
+    def find(self, position):
+        """
+        Get the row of the enemy on a cell.
+
+        Args:
+            position (tuple): The cell.
+
+        Returns:
+            int: The row, None if no enemy is there.
+        """
+        return self._rows.get(tuple(position))
+
+    def move(self, index, position):
+        """
+        Move an enemy.
+
+        Args:
+            index (int): The row of the enemy.
+            position (tuple): Its new position.
+        """
+        old = (int(self.row[index]), int(self.col[index]))
+        if self._rows.get(old) == index:
+            del self._rows[old]
+        self._arrays["row"][index], self._arrays["col"][index] = position
+        self._rows[tuple(position)] = index
+
+    def within(self, center, radius):
+        """
+        Get the enemies within a radius of a cell.
+
+        Args:
+            center (tuple): The cell.
+            radius (float): The radius, in cells.
+
+        Returns:
+            ndarray: The boolean mask of the enemies whose distance is at most radius.
+        """
+        d_row = self.row - center[0]
+        d_col = self.col - center[1]
+        return d_row * d_row + d_col * d_col <= radius * radius
+
+    def damage(self, selection, amount):
+        """
+        Damage several enemies at once. The shield of a skeleton reduces the
+        damage, as in Skeleton.take_damage.
+
+        Args:
+            selection (ndarray): A boolean mask or the rows to damage.
+            amount (int or ndarray): The damage, one for all or one per selected enemy.
+
+        Returns:
+            ndarray: The damage every selected enemy took.
+        """
+        taken = amount - self.shield[selection]
+        self.health[selection] -= taken
+        return taken
+
+    def dead(self):
+        """
+        Get the enemies with no health left.
+
+        Returns:
+            ndarray: The boolean mask of the dead enemies.
+        """
+        return self.health <= 0
+
+    def compact(self, remove=None):
+        """
+        Drop enemies, keeping the order of the others.
+
+        Args:
+            remove (ndarray): The boolean mask of the enemies to drop, the dead
+                ones if None.
+
+        Returns:
+            dict: The dropped rows: "row", "col", "kind" and "names" arrays.
+        """
+        if remove is None:
+            remove = self.dead()
+        removed = {name: self.__getattr__(name)[remove].copy() for name in ("row", "col", "kind")}
+        removed["names"] = self.names[remove].copy()
+        keep = ~remove
+        count = int(keep.sum())
+        for array_name, array in self._arrays.items():
+            array[:count] = array[:self._count][keep]
+        self._names[:count] = self._names[:self._count][keep]
+        self._names[count:self._count] = None
+        self._count = count
+        self._rows = {
+            (int(row), int(col)): index for index, (row, col) in enumerate(zip(self.row, self.col))
+        }
+        return removed
+
+    def view(self, index):
+        """
+        Get an enemy object backed by a row, for a single encounter. The view
+        is valid until the next compaction.
+
+        Args:
+            index (int): The row.
+
+        Returns:
+            Skeleton or Dragon: A SkeletonView or a DragonView.
+        """
+        if self.kind[index] == DRAGON:
+            return DragonView(self, index)
+        return SkeletonView(self, index)
+
+    def _grow(self):
+        """
+        Double the allocated rows.
+        """
+        self._capacity *= 2
+        for array_name, array in self._arrays.items():
+            grown = np.zeros(self._capacity, dtype=array.dtype)
+            grown[:self._count] = array[:self._count]
+            self._arrays[array_name] = grown
+        names = np.empty(self._capacity, dtype=object)
+        names[:self._count] = self._names[:self._count]
+        self._names = names
+
+
+@lru_cache(maxsize=None)
+def _stats(path):
+    """
+    Index the stats of the enemies of a YAML file by spawn position, once per file.
+
+    Args:
+        path (str): The YAML file of the maze.
+
+    Returns:
+        tuple: (attack power, skeleton stats by position, dragon stats by position).
+    """
+    enemies = load_enemies(path)
+    skeletons = {
+        tuple(data["skeleton"]["position"]): data["skeleton"] for data in enemies["skeletons"]
+    }
+    dragons = {tuple(data["dragon"]["position"]): data["dragon"] for data in enemies["dragons"]}
+    return enemies["attack_power"], skeletons, dragons
+
+
+def _column(name, cast=int):
+    """
+    Get a property reading and writing one array of the table at the row of a view.
+    """
+
+    def get(self):
+        return cast(self._table._arrays[name][self._index])
+
+    def set(self, value):
+        self._table._arrays[name][self._index] = value
+
+    return property(get, set)
+
+
+def _position(self):
+    return (int(self._table.row[self._index]), int(self._table.col[self._index]))
+
+
+class SkeletonView(Skeleton):
+    """
+    A skeleton whose attributes live in a row of an EnemyTable.
+
+    The private attributes Skeleton and Enemy use are properties of the row, so
+    every inherited method reads and updates the table.
+    """
+
+    __slots__ = ("_table", "_index")
+
+    _name = property(lambda self: self._table._names[self._index])
+    _health = _column("health")
+    _attack_power = _column("attack")
+    _shield_power = _column("shield")
+    _position = property(_position)
+
+    def __init__(self, table, index):
+        """
+        Initialize the view of a row.
+
+        Args:
+            table (EnemyTable): The table.
+            index (int): The row.
+        """
+        self._table = table
+        self._index = index
+
+
+class DragonView(Dragon):
+    """
+    A dragon whose attributes live in a row of an EnemyTable.
+
+    The private attributes Dragon and Enemy use are properties of the row, so
+    every inherited method reads and updates the table.
+    """
+
+    __slots__ = ("_table", "_index")
+
+    _name = property(lambda self: self._table._names[self._index])
+    _health = _column("health")
+    _attack_power = _column("attack")
+    _fire_breath_power = _column("fire")
+    _position = property(_position)
+
+    def __init__(self, table, index):
+        """
+        Initialize the view of a row.
+
+        Args:
+            table (EnemyTable): The table.
+            index (int): The row.
+        """
+        self._table = table
+        self._index = index
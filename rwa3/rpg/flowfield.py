@@ -0,0 +1,245 @@
+"""
+Shared BFS distance field used by the enemies to chase the player.
+
+The field is computed once per turn from the player position and every enemy
+steps downhill on it, so the cost of a turn does not grow with one search per
+enemy.
+"""
+from array import array
+from collections import deque
+
+# Distance of the cells that cannot reach any source
+UNREACHED = -1
+
+
+class FlowField:
+    """
+    A class representing a distance field over the passable cells of a maze.
+
+    Obstacles and padlocks are impassable. When the only source moves to an
+    adjacent cell the field is repaired incrementally instead of recomputed.
+
+    Attributes:
+        _maze (Maze): The maze the field is computed on.
+        _size (int): The grid size of the maze.
+        _blocked (bytearray): 1 for every impassable cell, indexed by row * size + col.
+        _distance (array): BFS distance of every cell to the closest source.
+        _sources (tuple): The cells the field was computed from.
+        _dirty (bool): Whether an obstacle changed since the last computation.
+    """
+
+    def __init__(self, maze):
+        """
+        Initialize the field from the player position.
+
+        Args:
+            maze (Maze): The maze the field is computed on.
+        """
+        self._maze = maze
+        self._size = maze.grid_size
+        self._blocked = bytearray(self._size * self._size)
+        for row, col in maze.obstacle_positions:
+            self._blocked[row * self._size + col] = 1
+        for row, col in maze.padlock_positions:
+            self._blocked[row * self._size + col] = 1
+        self._distance = array("i", [UNREACHED]) * (self._size * self._size)
+        self._sources = ()
+        self._dirty = False
+        maze.add_obstacle_listener(self.on_obstacle_change)
+        self.compute([maze.player_position])
+
+    def distance(self, position):
+        """
+        Get the distance of a cell to the closest source.
+
+        Args:
+            position (tuple): The cell position.
+
+        Returns:
+            int: The distance, or UNREACHED.
+        """
+        return self._distance[position[0] * self._size + position[1]]
+
+    def compute(self, sources):
+        """
+        Compute the field from scratch with a multi-source BFS.
+
+        Args:
+            sources (list): The cells at distance 0.
+        """
+        size = self._size
+        distance = self._distance
+        blocked = self._blocked
+        for index in range(size * size):
+            distance[index] = UNREACHED
+        queue = deque()
+        for row, col in sources:
+            distance[row * size + col] = 0
+            queue.append(row * size + col)
+        while queue:
+            index = queue.popleft()
+            next_distance = distance[index] + 1
+            for neighbour in self._neighbours(index):
+                if distance[neighbour] == UNREACHED and not blocked[neighbour]:
+                    distance[neighbour] = next_distance
+                    queue.append(neighbour)
+        self._sources = tuple(tuple(source) for source in sources)
+        self._dirty = False
+
+    def update(self, position):
+        """
+        Bring the field up to date with the player position.
+
+        Args:
+            position (tuple): The current player position.
+        """
+        position = tuple(position)
+        if not self._dirty and self._sources == (position,):
+            return
+        if not self._dirty and len(self._sources) == 1:
+            old = self._sources[0]
+            if abs(old[0] - position[0]) + abs(old[1] - position[1]) == 1:
+                self._move_source(old, position)
+                return
+        self.compute([position])
+
+    def _move_source(self, old, new):
+        """
+        Repair the field after its single source moved to an adjacent cell.
+
+        Every distance changes by at most one. First the new source is added and
+        the decrease is propagated from it. Then the old source is removed: the
+        cells whose every shortest path leads to the old source are exactly one
+        step further away from the new one.
+
+        Args:
+            old (tuple): The previous source.
+            new (tuple): The new source.
+        """
+        size = self._size
+        distance = self._distance
+        blocked = self._blocked
+
+        # Add the new source
+        start = new[0] * size + new[1]
+        distance[start] = 0
+        queue = deque([start])
+        while queue:
+            index = queue.popleft()
+            next_distance = distance[index] + 1
+            for neighbour in self._neighbours(index):
+                if blocked[neighbour]:
+                    continue
+                if distance[neighbour] == UNREACHED or distance[neighbour] > next_distance:
+                    distance[neighbour] = next_distance
+                    queue.append(neighbour)
+
+        # Remove the old source, layer by layer
+        start = old[0] * size + old[1]
+        affected = {start}
+        checked = {start}
+        queue = deque([start])
+        while queue:
+            index = queue.popleft()
+            layer = distance[index]
+            for neighbour in self._neighbours(index):
+                if neighbour in checked or distance[neighbour] != layer + 1:
+                    continue
+                checked.add(neighbour)
+                # the layers are visited in order, so every parent is decided
+                supported = any(
+                    distance[parent] == layer and parent not in affected
+                    for parent in self._neighbours(neighbour)
+                )
+                if not supported:
+                    affected.add(neighbour)
+                    queue.append(neighbour)
+        for index in affected:
+            distance[index] += 1
+        self._sources = (new,)
+
+    def _neighbours(self, index):
+        """
+        Get the in-bounds neighbours of a cell.
+
+        Args:
+            index (int): The flat index of the cell.
+
+        Returns:
+            list: The flat indices of the neighbours.
+        """
+        size = self._size
+        row, col = divmod(index, size)
+        neighbours = []
+        if row > 0:
+            neighbours.append(index - size)
+        if row < size - 1:
+            neighbours.append(index + size)
+        if col > 0:
+            neighbours.append(index - 1)
+        if col < size - 1:
+            neighbours.append(index + 1)
+        return neighbours
+
+    def on_obstacle_change(self, position, blocked):
+        """
+        Record an obstacle change; the field is recomputed on the next update.
+
+        Args:
+            position (tuple): The cell that changed.
+            blocked (bool): Whether the cell is now impassable.
+        """
+        self._blocked[position[0] * self._size + position[1]] = 1 if blocked else 0
+        self._dirty = True
+
+    def next_step(self, position):
+        """
+        Get the neighbour an enemy should step to.
+
+        Args:
+            position (tuple): The current position of the enemy.
+
+        Returns:
+            tuple: The empty neighbour closest to the player, or None if the enemy
+            cannot get closer.
+        """
+        row, col = position
+        best = self.distance(position)
+        if best == UNREACHED:
+            return None
+        step = None
+        grid = self._maze.grid
+        empty = self._maze.cls_empty
+        for neighbour in ((row - 1, col), (row + 1, col), (row, col - 1), (row, col + 1)):
+            if not (0 <= neighbour[0] < self._size and 0 <= neighbour[1] < self._size):
+                continue
+            value = self.distance(neighbour)
+            if (
+                value != UNREACHED
+                and value < best
+                and grid[neighbour[0]][neighbour[1]] == empty
+            ):
+                best = value
+                step = neighbour
+        return step
+
+    def chase(self):
+        """
+        Update the field to the chased positions and move the enemies toward them.
+        """
+        targets = self._maze.chase_targets()
+        if len(targets) == 1:
+            self.update(targets[0])
+        elif self._dirty or self._sources != tuple(tuple(target) for target in targets):
+            self.compute(targets)
+        self.move_enemies()
+
+    def move_enemies(self):
+        """
+        Move every skeleton and dragon one cell toward the player.
+        """
+        for positions in (self._maze.skeleton_positions, self._maze.dragon_positions):
+            for index, position in enumerate(positions):
+                step = self.next_step(position)
+                if step is not None:
+                    self._maze.move_enemy(position, step, index)
@@ -0,0 +1,234 @@
+"""
+Field of view for the fog-of-war mode.
+
+Visibility is computed with recursive shadowcasting. Results are cached per
+(position, radius) because the player often walks back and forth over the same
+corridor; a cached entry is only dropped when an obstacle changes within its
+radius.
+"""
+
+# Octant transforms (xx, xy, yx, yy) for the eight octants around the viewer
+_OCTANTS = (
+    (1, 0, 0, 1),
+    (0, 1, 1, 0),
+    (0, -1, 1, 0),
+    (-1, 0, 0, 1),
+    (-1, 0, 0, -1),
+    (0, -1, -1, 0),
+    (0, 1, -1, 0),
+    (1, 0, 0, -1),
+)
+
+
+class FieldOfView:
+    """
+    A class representing what the player can see in a maze.
+
+    Obstacles and padlocks block the sight. The cells seen so far are remembered
+    with the content they had when they were last visible.
+
+    Attributes:
+        _maze (Maze): The maze to look at.
+        _radius (int): The default sight radius.
+        _blocked (set): The cells blocking the sight.
+        _cache (dict): Visible cells keyed by (position, radius).
+        _buckets (dict): Cache keys grouped by coarse cell, to find the entries
+            near a changed obstacle.
+        _remembered (dict): Last seen content of every cell seen so far.
+    """
+
+    def __init__(self, maze, radius):
+        """
+        Initialize the field of view.
+
+        Args:
+            maze (Maze): The maze to look at.
+            radius (int): The default sight radius.
+        """
+        self._maze = maze
+        self._radius = radius
+        self._size = maze.grid_size
+        self._blocked = set(maze.obstacle_positions) | set(maze.padlock_positions)
+        self._cache = {}
+        self._buckets = {}
+        self._remembered = {}
+        maze.add_obstacle_listener(self.on_obstacle_change)
+
+    @property
+    def radius(self):
+        """
+        The default sight radius.
+        """
+        return self._radius
+
+    @property
+    def remembered(self):
+        """
+        The last seen content of every cell seen so far.
+        """
+        return self._remembered
+
+    def visible(self, position, radius=None):
+        """
+        Get the cells visible from a position.
+
+        Args:
+            position (tuple): The position of the viewer.
+            radius (int): The sight radius, the default one if None.
+
+        Returns:
+            frozenset: The visible cells, the viewer's cell included.
+        """
+        radius = self._radius if radius is None else radius
+        key = (tuple(position), radius)
+        cells = self._cache.get(key)
+        if cells is None:
+            cells = self._compute(key[0], radius)
+            self._cache[key] = cells
+            self._buckets.setdefault(self._bucket(key[0]), set()).add(key)
+        return cells
+
+    def update(self, position):
+        """
+        Look around from a position and remember what is seen.
+
+        Args:
+            position (tuple): The position of the viewer.
+
+        Returns:
+            frozenset: The visible cells.
+        """
+        cells = self.visible(position)
+        grid = self._maze.grid
+        for row, col in cells:
+            self._remembered[(row, col)] = grid[row][col]
+        return cells
+
+    def on_obstacle_change(self, position, blocked):
+        """
+        Drop the cached entries whose radius covers a changed obstacle.
+
+        Args:
+            position (tuple): The cell that changed.
+            blocked (bool): Whether the cell now blocks the sight.
+        """
+        if blocked:
+            self._blocked.add(position)
+        else:
+            self._blocked.discard(position)
+
+        row, col = self._bucket(position)
+        for bucket in [(row + d_row, col + d_col) for d_row in (-1, 0, 1) for d_col in (-1, 0, 1)]:
+            keys = self._buckets.get(bucket)
+            if not keys:
+                continue
+            for key in list(keys):
+                (view_row, view_col), radius = key
+                if max(abs(view_row - position[0]), abs(view_col - position[1])) <= radius:
+                    keys.discard(key)
+                    del self._cache[key]
+
+        # entries wider than a bucket can be affected from further away
+        for key in [key for key in self._cache if key[1] > self._radius]:
+            (view_row, view_col), radius = key
+            if max(abs(view_row - position[0]), abs(view_col - position[1])) <= radius:
+                self._buckets[self._bucket(key[0])].discard(key)
+                del self._cache[key]
+
+    def _bucket(self, position):
+        """
+        Get the coarse cell used to index the cache.
+
+        Args:
+            position (tuple): A cell position.
+
+        Returns:
+            tuple: The bucket, one radius wide.
+        """
+        width = max(self._radius, 1)
+        return (position[0] // width, position[1] // width)
+
+    def _is_blocked(self, row, col):
+        """
+        Check whether a cell blocks the sight; cells outside the grid do.
+
+        Args:
+            row (int): The row of the cell.
+            col (int): The column of the cell.
+
+        Returns:
+            bool: True if the cell blocks the sight.
+        """
+        return (
+            not (0 <= row < self._size and 0 <= col < self._size)
+            or (row, col) in self._blocked
+        )
+
+    def _compute(self, position, radius):
+        """
+        Compute the visible cells with recursive shadowcasting.
+
+        Args:
+            position (tuple): The position of the viewer.
+            radius (int): The sight radius.
+
+        Returns:
+            frozenset: The visible cells.
+        """
+        visible = {position}
+        for transform in _OCTANTS:
+            self._cast_light(position, 1, 1.0, 0.0, radius, transform, visible)
+        return frozenset(visible)
+
+    def _cast_light(self, origin, start_row, start, end, radius, transform, visible):
+        """
+        Scan one octant row by row, recursing around every obstacle.
+
+        Args:
+            origin (tuple): The position of the viewer.
+            start_row (int): The first row of the octant to scan.
+            start (float): The slope where the lit area starts.
+            end (float): The slope where the lit area ends.
+            radius (int): The sight radius.
+            transform (tuple): The octant transform (xx, xy, yx, yy).
+            visible (set): The visible cells, filled in place.
+        """
+        if start < end:
+            return
+        xx, xy, yx, yy = transform
+        radius_squared = radius * radius
+        new_start = start
+        for distance in range(start_row, radius + 1):
+            d_x = -distance - 1
+            d_y = -distance
+            blocked = False
+            while d_x <= 0:
+                d_x += 1
+                row = origin[0] + d_x * xx + d_y * xy
+                col = origin[1] + d_x * yx + d_y * yy
+                left_slope = (d_x - 0.5) / (d_y + 0.5)
+                right_slope = (d_x + 0.5) / (d_y - 0.5)
+                if start < right_slope:
+                    continue
+                if end > left_slope:
+                    break
+
+                if d_x * d_x + d_y * d_y <= radius_squared and (
+                    0 <= row < self._size and 0 <= col < self._size
+                ):
+                    visible.add((row, col))
+
+                if blocked:
+                    if self._is_blocked(row, col):
+                        new_start = right_slope
+                    else:
+                        blocked = False
+                        start = new_start
+                elif self._is_blocked(row, col) and distance < radius:
+                    blocked = True
+                    self._cast_light(
+                        origin, distance + 1, start, left_slope, radius, transform, visible
+                    )
+                    new_start = right_slope
+            if blocked:
+                break
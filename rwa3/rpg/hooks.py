@@ -0,0 +1,185 @@
+"""
+Hook points of the game for the optional observers: tracing and statistics.
+
+The game calls this module at fixed points. Every loop playing a game (the
+command loop of Player.start, the raw terminal, the server sessions and the
+shared game) runs each command in turn(game), where game is the session the
+command belongs to. The timed functions of a turn are decorated with phase(),
+and Player reports its events with emit(): moves, pickups, combats, damage
+and the end of the game.
+
+An observer is an object with methods named after the events; it is called
+with the session being played first. While no observer is installed `enabled`
+is False, and every hook point returns after testing it.
+"""
+import functools
+import time
+
+# The outcomes reported with the game_over event
+WIN = "win"
+LOSS = "loss"
+QUIT = "quit"
+UNFINISHED = "unfinished"
+
+# True while an observer is installed
+enabled = False
+
+_observers = []
+# The session of the command being played, None outside of any
+_game = None
+
+
+def install(observer):
+    """
+    Start calling an observer.
+
+    Args:
+        observer (object): The observer.
+    """
+    global enabled
+    _observers.append(observer)
+    enabled = True
+
+
+def uninstall(observer):
+    """
+    Stop calling an observer; unknown observers are ignored.
+
+    Args:
+        observer (object): The observer.
+    """
+    global enabled
+    if observer in _observers:
+        _observers.remove(observer)
+    enabled = bool(_observers)
+
+
+def emit(event, *args):
+    """
+    Call the method of every observer handling an event.
+
+    Args:
+        event (str): The name of the event, and of the observer methods.
+        *args: The arguments of the event, after the session.
+    """
+    if not enabled:
+        return
+    for observer in _observers:
+        method = getattr(observer, event, None)
+        if method is not None:
+            method(_game, *args)
+
+
+def end_game(game, outcome=UNFINISHED):
+    """
+    Report the end of a game that stopped without quitting, winning or losing,
+    e.g. a client that disconnected. Observers ignore the games already over.
+
+    Args:
+        game (object): The session of the game.
+        outcome (str): The outcome to report.
+    """
+    with playing(game):
+        emit("game_over", outcome)
+
+
+class _Playing:
+    """
+    The context of the commands of one session, timed as a turn if asked.
+    """
+
+    __slots__ = ("_game", "_turn", "_previous", "_start")
+
+    def __init__(self, game, turn):
+        self._game = game
+        self._turn = turn
+        self._previous = None
+        self._start = 0
+
+    def __enter__(self):
+        global _game
+        self._previous = _game
+        _game = self._game
+        if self._turn:
+            emit("turn_start")
+            self._start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info):
+        global _game
+        if self._turn:
+            emit("turn_end", time.perf_counter_ns() - self._start)
+        _game = self._previous
+        return False
+
+
+class _Off:
+    """
+    The context used while no observer is installed.
+    """
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_OFF = _Off()
+
+
+def turn(game):
+    """
+    Get the context of one turn of a session: one command line, one key in
+    raw mode or one command of a shared game.
+
+    Args:
+        game (object): The session.
+
+    Returns:
+        object: The context manager.
+    """
+    return _Playing(game, True) if enabled else _OFF
+
+
+def playing(game):
+    """
+    Get the context of events of a session outside of its turns, e.g. the fire
+    a shared game deals after the commands of a tick.
+
+    Args:
+        game (object): The session.
+
+    Returns:
+        object: The context manager.
+    """
+    return _Playing(game, False) if enabled else _OFF
+
+
+def phase(name):
+    """
+    Decorate a function whose calls are timed as a phase of the turns.
+
+    Args:
+        name (str): The name of the phase.
+
+    Returns:
+        callable: The decorator.
+    """
+
+    def decorate(function):
+        @functools.wraps(function)
+        def timed(*args, **kwargs):
+            if not enabled:
+                return function(*args, **kwargs)
+            start = time.perf_counter_ns()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                emit("phase", name, time.perf_counter_ns() - start)
+
+        return timed
+
+    return decorate
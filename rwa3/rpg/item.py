@@ -1,6 +1,3 @@
-import yaml
-
-from rpg.maze import file_path
 from dataclasses import dataclass
 from enum import Enum, auto
 
@@ -11,7 +8,7 @@ class Category(Enum):
     The auto() method assigns numerical values automatically to the class attributes (items) defined below.
     
     In the game, an item is defined by its category, position, and value. 
-    There are five distinct categories of items scattered throughout the maze.
+    There are seven distinct categories of items scattered throughout the maze.
 
     """
     HEART = auto()      #1
@@ -19,43 +16,136 @@ class Category(Enum):
     KEY = auto()        #3
     ARROW = auto()      #4
     GEM = auto()        #5
+    BOMB = auto()       #6
+    FIRE_SPELL = auto() #7
 
-@dataclass(frozen=True) # none of the attributes can be modified after instantiation
+# none of the attributes can be modified after instantiation, and slots keep it small
+@dataclass(frozen=True, slots=True)
 class Item:
     """
     Data class for items in the game
     
     Class Attributes:
     item_type: Category - type of the item
-    item_position: list of all positions (As tuples) of the item type in the current maze
-    item_value: value associated with that item if applicable (hearts = health amount, arrow = damage amount, other = None)
+    item_position: tuple of the (row, col) positions of the item type in the current maze
+    item_value: value associated with that item if applicable (hearts = health amount, arrow/bomb/fire spell = damage amount, other = None)
     """
     item_type: Category
-    item_position: list 
+    item_position: tuple
     item_value: int
-  
-def health_boost():
-    """
-    Extract health boost data from the YAML file.
-    """
 
-    with open(file_path, "r") as file:
-        try:
-            data = yaml.safe_load(file)
-            return data["maze"]["items"]["hearts"]["health"]
-        except yaml.YAMLError as e:
-            print(f"Error parsing YAML file: {e}")
-    pass
 
-def arrow_damage():
+class ItemRegistry:
     """
-    Extract arrow damage from the YAML file.
+    A class representing the items lying in a maze, by position.
+
+    Lookups, removals and additions are O(1). The items a maze starts with can
+    be shared by several mazes (the sessions of a template): removals and
+    additions are kept apart and never change them.
+
+    Attributes:
+        _base (dict): The initial items, position -> Item; never modified.
+        _removed (set): The positions of the initial items taken since.
+        _added (dict): The items put back or added since, position -> Item.
     """
 
-    with open(file_path, "r") as file:
-        try:
-            data = yaml.safe_load(file)
-            return data["maze"]["items"]["arrows"]["damage"]
-        except yaml.YAMLError as e:
-            print(f"Error parsing YAML file: {e}")
-    pass
\ No newline at end of file
+    __slots__ = ("_base", "_removed", "_added")
+
+    def __init__(self, items):
+        """
+        Initialize a registry with no change.
+
+        Args:
+            items (dict): The initial items, position -> Item.
+        """
+        self._base = items
+        self._removed = set()
+        self._added = {}
+
+    @classmethod
+    def from_items(cls, items):
+        """
+        Build a registry from a list of items.
+
+        Args:
+            items (iterable): The items.
+
+        Returns:
+            ItemRegistry: The registry.
+        """
+        return cls({item.item_position: item for item in items})
+
+    def fork(self):
+        """
+        Get a registry starting from the same initial items, without the changes.
+
+        Returns:
+            ItemRegistry: The new registry, sharing the initial items.
+        """
+        return ItemRegistry(self._base)
+
+    def get(self, position):
+        """
+        Get the item lying on a cell.
+
+        Args:
+            position (tuple): The cell.
+
+        Returns:
+            Item: The item, None if there is none.
+        """
+        item = self._added.get(position)
+        if item is not None or position in self._removed:
+            return item
+        return self._base.get(position)
+
+    def __contains__(self, position):
+        return self.get(position) is not None
+
+    def __len__(self):
+        return len(self._base) - len(self._removed) + sum(
+            1 for position in self._added if position not in self._base or position in self._removed
+        )
+
+    def __iter__(self):
+        for position, item in self._base.items():
+            if position not in self._removed and position not in self._added:
+                yield item
+        yield from self._added.values()
+
+    def added(self):
+        """
+        Get the cells of the items put back or added since the start, e.g. the
+        respawned hearts.
+
+        Returns:
+            list: The positions.
+        """
+        return list(self._added)
+
+    def take(self, position):
+        """
+        Remove the item lying on a cell.
+
+        Args:
+            position (tuple): The cell.
+
+        Returns:
+            Item: The item removed, None if there was none.
+        """
+        item = self._added.pop(position, None)
+        if position in self._base:
+            if position in self._removed:
+                return item
+            self._removed.add(position)
+            return item or self._base[position]
+        return item
+
+    def put(self, item):
+        """
+        Add an item, replacing the one on its cell if any.
+
+        Args:
+            item (Item): The item.
+        """
+        self._added[item.item_position] = item
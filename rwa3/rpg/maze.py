@@ -6,6 +6,18 @@ import os.path
 folder = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 sys.path.append(folder)
 file_path = os.path.join(folder, "rpg", "config.yaml")
+# Emojis of the optional items, for the mazes that have none
+_BOMB_EMOJI = "💣"
+_SPELL_EMOJI = "🔥"
+# Emojis of the projectiles in flight, drawn on the empty cells
+_PLAYER_SHOT_EMOJI = "🔹"
+_ENEMY_SHOT_EMOJI = "🔸"
+
+from rpg import hooks  # noqa: E402
+from rpg.scheduler import Scheduler  # noqa: E402
+from rpg.fov import FieldOfView  # noqa: E402
+from rpg.flowfield import FlowField  # noqa: E402
+from rpg.item import Category, Item, ItemRegistry  # noqa: E402
 
 class Maze:
     """
@@ -16,6 +28,11 @@ class Maze:
     _cls_horizontal_wall = "──"
     _cls_vertical_wall = "│"
     _cls_corner = "┼"
+    _cls_fog = "░░"
+    # frames are not printed when the maze is shown by a remote client
+    _quiet = False
+    # the saved game file is shared by every game of a YAML file
+    _savable = True
 
     def __init__(self, file_path):
         self._file_path = file_path
@@ -33,26 +50,62 @@ class Maze:
         self._arrow_positions = None
         self._arrow_emoji = None
         self._arrow_damage = None
+        # arrows fly one cell per tick instead of hitting at once
+        self._arrow_flight = False
         # hearts
         self._heart_positions = None
         self._heart_emoji = None
         self._heart_boost = None
+        self._heart_respawn = None
+        # bombs, damaging the enemies in a radius around the player
+        self._bomb_positions = []
+        self._bomb_emoji = _BOMB_EMOJI
+        self._bomb_damage = None
+        self._bomb_radius = None
+        # fire spells, damaging the enemies in a cone ahead of the player
+        self._spell_positions = []
+        self._spell_emoji = _SPELL_EMOJI
+        self._spell_damage = None
+        self._spell_range = None
         # padlocks
         self._padlock_positions = None
         self._padlock_emoji = None
+        self._padlock_relock = None
+        # items lying in the maze, by position
+        self._items = None
         # skeletons
         self._skeleton_positions = []
         self._skeleton_emoji = None
         # dragons
         self._dragon_positions = []
         self._dragon_emoji = None
+        # spawn position of every enemy that has moved, keyed by current position
+        self._enemy_spawns = {}
+        self._enemy_chase = False
+        self._enemy_move_every = 1
+        # dragons shooting fire at the players in line with them
+        self._ranged_every = None
+        self._ranged_range = None
+        self._ranged_damage = None
         # player
         self._player_position = None
         self._player_emoji = None
+        # callbacks notified when an obstacle-like cell changes
+        self._obstacle_listeners = []
+        # clock for the timed events (enemy moves, respawns, relocks)
+        self._scheduler = Scheduler()
+        # fog of war
+        self._fog_radius = None
+        self._fov = None
+        # blocked cells as a NumPy grid, created on first use
+        self._block_map = None
+        # projectiles in flight, created on first shot
+        self._projectiles = None
 
         self.extract_player()
         self.extract_obstacles()
         self.extract_grid_size()
+        self.extract_fog_of_war()
         self.extract_enemies()
         self.extract_items()
 
@@ -62,6 +115,29 @@ class Maze:
         ]
 
         self.spawn_components()
+        self._items = ItemRegistry.from_items(self.collect_items())
+        self.start_systems()
+
+    def start_systems(self):
+        """
+        Attach the field of view and schedule the enemy moves, once the grid is set.
+        """
+        if self._fog_radius is not None:
+            self._fov = FieldOfView(self, self._fog_radius)
+        if self._enemy_chase == "path":
+            # one hierarchical search per enemy
+            from rpg.pathfinding import HierarchicalPathfinder
+
+            self._scheduler.schedule_every(
+                self._enemy_move_every, HierarchicalPathfinder(self).chase
+            )
+        # enemies chasing the player share one distance field
+        elif self._enemy_chase:
+            self._scheduler.schedule_every(
+                self._enemy_move_every, FlowField(self).chase
+            )
+        if self._ranged_every is not None:
+            self._scheduler.schedule_every(self._ranged_every, self.ranged_volley)
 
     def spawn_components(self):
         """
@@ -74,8 +150,33 @@ class Maze:
         self.spawn_keys()
         self.spawn_arrows()
         self.spawn_hearts()
+        self.spawn_weapons()
         self.spawn_player()
 
+    def collect_items(self):
+        """
+        Get the items showing on the grid; an item hidden by another component
+        or already picked up is left out.
+
+        Returns:
+            list: The items, with the value of their category: the health of
+            the hearts, the damage of the arrows, None for the others.
+        """
+        kinds = (
+            (Category.GEM, self._gem_positions, self._gem_emoji, None),
+            (Category.KEY, self._key_positions, self._key_emoji, None),
+            (Category.ARROW, self._arrow_positions, self._arrow_emoji, self._arrow_damage),
+            (Category.HEART, self._heart_positions, self._heart_emoji, self._heart_boost),
+            (Category.BOMB, self._bomb_positions, self._bomb_emoji, self._bomb_damage),
+            (Category.FIRE_SPELL, self._spell_positions, self._spell_emoji, self._spell_damage),
+        )
+        return [
+            Item(category, tuple(position), value)
+            for category, positions, emoji, value in kinds
+            for position in positions
+            if self._grid[position[0]][position[1]] == emoji
+        ]
+
     def extract_grid_size(self):
         """
         Extract the grid size from the YAML file.
@@ -88,6 +189,19 @@ class Maze:
             except yaml.YAMLError as e:
                 print(f"Error parsing YAML file: {e}")
 
+    def extract_fog_of_war(self):
+        """
+        Extract the fog of war settings from the YAML file.
+        """
+        with open(self._file_path, "r") as file:
+            try:
+                data = yaml.safe_load(file)
+                fog_data = data["maze"].get("fog_of_war")
+                if fog_data:
+                    self._fog_radius = fog_data["radius"]
+            except yaml.YAMLError as e:
+                print(f"Error parsing YAML file: {e}")
+
     def extract_player(self):
         """
         Extract the player from the YAML file.
@@ -143,18 +257,35 @@ class Maze:
                 padlock_positions = data["maze"]["items"]["padlocks"]["position"]
                 self._padlock_positions = [tuple(item) for item in padlock_positions]
                 self._padlock_emoji = data["maze"]["items"]["padlocks"]["emoji"]
+                self._padlock_relock = data["maze"]["items"]["padlocks"].get("relock")
 
                 # Retrieve the arrows
                 arrow_positions = data["maze"]["items"]["arrows"]["position"]
                 self._arrow_positions = [tuple(item) for item in arrow_positions]
                 self._arrow_emoji = data["maze"]["items"]["arrows"]["emoji"]
                 self._arrow_damage = data["maze"]["items"]["arrows"]["damage"]
+                self._arrow_flight = data["maze"]["items"]["arrows"].get("fly", False)
 
                 # Retrieve the hearts
                 heart_positions = data["maze"]["items"]["hearts"]["position"]
                 self._heart_positions = [tuple(item) for item in heart_positions]
                 self._heart_emoji = data["maze"]["items"]["hearts"]["emoji"]
                 self._heart_boost = data["maze"]["items"]["hearts"]["health"]
+                self._heart_respawn = data["maze"]["items"]["hearts"].get("respawn")
+
+                # Retrieve the bombs and the fire spells, if the maze has any
+                bombs = data["maze"]["items"].get("bombs")
+                if bombs is not None:
+                    self._bomb_positions = [tuple(item) for item in bombs["position"]]
+                    self._bomb_emoji = bombs.get("emoji", _BOMB_EMOJI)
+                    self._bomb_damage = bombs["damage"]
+                    self._bomb_radius = bombs["radius"]
+                spells = data["maze"]["items"].get("fire_spells")
+                if spells is not None:
+                    self._spell_positions = [tuple(item) for item in spells["position"]]
+                    self._spell_emoji = spells.get("emoji", _SPELL_EMOJI)
+                    self._spell_damage = spells["damage"]
+                    self._spell_range = spells["range"]
             except yaml.YAMLError as e:
                 print(f"Error parsing YAML file: {e}")
 
@@ -177,6 +308,13 @@ class Maze:
                     position = tuple(skeleton_data["skeleton"]["position"])
                     self._skeleton_positions.append(position)
                 self._skeleton_emoji = data["maze"]["enemies"]["skeleton_emoji"]
+                self._enemy_chase = data["maze"]["enemies"].get("chase", False)
+                self._enemy_move_every = data["maze"]["enemies"].get("move_every", 1)
+                ranged = data["maze"]["enemies"].get("ranged")
+                if ranged is not None:
+                    self._ranged_every = ranged.get("every", 1)
+                    self._ranged_range = ranged["range"]
+                    self._ranged_damage = ranged["damage"]
             except yaml.YAMLError as e:
                 print(f"Error parsing YAML file: {e}")
 
@@ -184,6 +322,13 @@ class Maze:
     def cls_empty(self):
         return self._cls_empty
 
+    @property
+    def file_path(self):
+        """
+        The YAML file the maze was loaded from.
+        """
+        return self._file_path
+
     @property
     def obstacle_positions(self):
         """
@@ -191,6 +336,38 @@ class Maze:
         """
         return self._obstacle_positions
 
+    def remove_obstacle_position(self, position):
+        """
+        Remove an obstacle's position
+
+        Args:
+            position (tuple): The position of the obstacle to be removed.
+        """
+        self._grid[position[0]][position[1]] = self._cls_empty
+        self._obstacle_positions.remove(tuple(position))
+        self.notify_obstacle_change(tuple(position), False)
+
+    def add_obstacle_listener(self, callback):
+        """
+        Register a callback for changes to obstacle-like cells (obstacles and padlocks)
+
+        Args:
+            callback (callable): Called as callback(position, blocked) where blocked
+            tells whether the cell is now impassable.
+        """
+        self._obstacle_listeners.append(callback)
+
+    def notify_obstacle_change(self, position, blocked):
+        """
+        Notify the registered listeners that an obstacle-like cell changed
+
+        Args:
+            position (tuple): The position of the cell that changed.
+            blocked (bool): Whether the cell is now impassable.
+        """
+        for callback in self._obstacle_listeners:
+            callback(position, blocked)
+
     @property
     def skeleton_positions(self):
         """
@@ -214,7 +391,38 @@ class Maze:
         """
         self._grid[position[0]][position[1]] = self._cls_empty
         self._skeleton_positions.remove(tuple(position))
-        
+        self._enemy_spawns.pop(tuple(position), None)
+
+    def remove_enemies(self, positions):
+        """
+        Remove many enemies at once, in one pass over the enemy positions.
+
+        Args:
+            positions (iterable): The positions of the enemies to be removed.
+        """
+        dead = {tuple(position) for position in positions}
+        if not dead:
+            return
+        for row, col in dead:
+            self._grid[row][col] = self._cls_empty
+            self._enemy_spawns.pop((row, col), None)
+        self._skeleton_positions = self._without(self._skeleton_positions, dead)
+        self._dragon_positions = self._without(self._dragon_positions, dead)
+
+    @staticmethod
+    def _without(positions, removed):
+        """
+        Get a position list without some positions.
+
+        Args:
+            positions (list): The positions.
+            removed (set): The positions to leave out.
+
+        Returns:
+            list: The positions kept, in their order.
+        """
+        return [position for position in positions if position not in removed]
+
     @property
     def dragon_positions(self):
         """
@@ -231,6 +439,7 @@ class Maze:
         """
         self._grid[position[0]][position[1]] = self._cls_empty
         self._dragon_positions.remove(tuple(position))
+        self._enemy_spawns.pop(tuple(position), None)
 
     @property
     def dragon_emoji(self):
@@ -239,6 +448,61 @@ class Maze:
         """
         return self._dragon_emoji
 
+    @property
+    def enemy_chase(self):
+        """
+        Whether the enemies move toward the player each turn: True with a shared
+        distance field, "path" with one path search per enemy.
+        """
+        return self._enemy_chase
+
+    @property
+    def enemy_move_every(self):
+        """
+        The number of ticks between two enemy moves.
+        """
+        return self._enemy_move_every
+
+    @property
+    def enemy_spawns(self):
+        """
+        The spawn position of every enemy that moved, keyed by its current position.
+        """
+        return self._enemy_spawns
+
+    def enemy_spawn(self, position):
+        """
+        Get the position an enemy had in the YAML file
+
+        Args:
+            position (tuple): The current position of the enemy.
+
+        Returns:
+            tuple: The spawn position of the enemy.
+        """
+        return self._enemy_spawns.get(tuple(position), tuple(position))
+
+    def move_enemy(self, position, new_position, index=None):
+        """
+        Move an enemy to an adjacent empty cell
+
+        Args:
+            position (tuple): The current position of the enemy.
+            new_position (tuple): The position to move the enemy to.
+            index (int): Index of the enemy in its position list, if already known.
+        """
+        emoji = self._grid[position[0]][position[1]]
+        if emoji == self._skeleton_emoji:
+            positions = self._skeleton_positions
+        else:
+            positions = self._dragon_positions
+        if index is None:
+            index = positions.index(position)
+        positions[index] = new_position
+        self._enemy_spawns[new_position] = self._enemy_spawns.pop(position, position)
+        self._grid[position[0]][position[1]] = self._cls_empty
+        self._grid[new_position[0]][new_position[1]] = emoji
+
     @property
     def grid(self):
         """
@@ -253,6 +517,107 @@ class Maze:
         """
         return self._grid_size
 
+    @property
+    def items(self):
+        """
+        The items lying in the maze, an ItemRegistry.
+        """
+        return self._items
+
+    def item_at(self, position):
+        """
+        Get the item lying on a cell.
+
+        Args:
+            position (tuple): The cell.
+
+        Returns:
+            Item: The item, None if there is none.
+        """
+        return self._items.get(position)
+
+    def block_map(self):
+        """
+        Get the blocked cells as a NumPy grid, for the bulk queries of the area weapons.
+
+        Returns:
+            BlockMap: The blocked cells, kept up to date.
+        """
+        if self._block_map is None:
+            # only the area weapons need NumPy
+            from rpg.blockmap import BlockMap
+
+            self._block_map = BlockMap(self)
+        return self._block_map
+
+    @property
+    def projectile_system(self):
+        """
+        The projectiles in flight, None before the first shot.
+        """
+        return self._projectiles
+
+    def projectiles(self):
+        """
+        Get the projectiles in flight, starting to move them every tick on first use.
+
+        Returns:
+            ProjectileSystem: The projectiles.
+        """
+        if self._projectiles is None:
+            # only the projectiles need NumPy
+            from rpg.projectiles import ProjectileSystem
+
+            self._projectiles = ProjectileSystem(self)
+            self._scheduler.schedule_every(1, self._projectiles.advance)
+        return self._projectiles
+
+    def take_fire_damage(self):
+        """
+        Take the damage the projectiles dealt to the player since the last call.
+
+        Returns:
+            int: The damage, 0 if none.
+        """
+        if self._projectiles is None:
+            return 0
+        # the player is the only target of chase_targets()
+        return self._projectiles.take_player_hits().get(None, 0)
+
+    @property
+    def ranged(self):
+        """
+        The ranged attacks of the dragons.
+
+        Returns:
+            tuple: (every, range, damage), each None when the dragons do not shoot.
+        """
+        return self._ranged_every, self._ranged_range, self._ranged_damage
+
+    def ranged_volley(self):
+        """
+        Make the dragons in line with a player, within range, shoot fire at them.
+        """
+        if self._dragon_positions:
+            self.projectiles().volley(
+                list(self._dragon_positions),
+                self.chase_targets(),
+                self._ranged_range,
+                self._ranged_damage,
+            )
+
+    def take_item(self, position):
+        """
+        Remove the item lying on a cell from the maze.
+
+        Args:
+            position (tuple): The cell.
+
+        Returns:
+            Item: The item taken, None if there was none.
+        """
+        return self._items.take(position)
+
     @property
     def gem_positions(self):
         """
@@ -322,6 +687,20 @@ class Maze:
         """
         return self._arrow_emoji
 
+    @property
+    def arrow_damage(self):
+        """
+        The damage of an arrow.
+        """
+        return self._arrow_damage
+
+    @property
+    def arrow_flight(self):
+        """
+        Whether arrows fly one cell per tick instead of hitting at once.
+        """
+        return self._arrow_flight
+
     @property
     def heart_positions(self):
         """
@@ -345,6 +724,89 @@ class Maze:
         """
         return self._heart_emoji
 
+    @property
+    def heart_boost(self):
+        """
+        The health a heart gives.
+        """
+        return self._heart_boost
+
+    @property
+    def bomb_positions(self):
+        """
+        The bomb items.
+        """
+        return self._bomb_positions
+
+    @property
+    def bomb_emoji(self):
+        """
+        The bomb emoji.
+        """
+        return self._bomb_emoji
+
+    @property
+    def bomb_damage(self):
+        """
+        The damage of a bomb to every enemy it reaches.
+        """
+        return self._bomb_damage
+
+    @property
+    def bomb_radius(self):
+        """
+        The radius of a bomb blast around the player, in cells.
+        """
+        return self._bomb_radius
+
+    @property
+    def spell_positions(self):
+        """
+        The fire spell items.
+        """
+        return self._spell_positions
+
+    @property
+    def spell_emoji(self):
+        """
+        The fire spell emoji.
+        """
+        return self._spell_emoji
+
+    @property
+    def spell_damage(self):
+        """
+        The damage of a fire spell to every enemy it reaches.
+        """
+        return self._spell_damage
+
+    @property
+    def spell_range(self):
+        """
+        The range of a fire spell ahead of the player, in cells.
+        """
+        return self._spell_range
+
+    @property
+    def heart_respawn(self):
+        """
+        The number of ticks before a consumed heart respawns, None if it never does.
+        """
+        return self._heart_respawn
+
+    def respawn_heart(self, position):
+        """
+        Put a consumed heart back on the grid, or retry next tick if its cell is taken
+
+        Args:
+            position (tuple): The position of the heart.
+        """
+        if self._grid[position[0]][position[1]] != self._cls_empty:
+            self._scheduler.schedule(1, self.respawn_heart, position)
+            return
+        self._grid[position[0]][position[1]] = self._heart_emoji
+        self._items.put(Item(Category.HEART, tuple(position), self._heart_boost))
+
     @property
     def padlock_positions(self):
         """
@@ -360,6 +822,7 @@ class Maze:
             position (tuple): The position of the padlock to be removed.
         """
         self._padlock_positions.remove(position)
+        self.notify_obstacle_change(tuple(position), False)
 
     @property
     def padlock_emoji(self):
@@ -368,6 +831,51 @@ class Maze:
         """
         return self._padlock_emoji
 
+    @property
+    def padlock_relock(self):
+        """
+        The number of ticks before an opened padlock locks again, None if it never does.
+        """
+        return self._padlock_relock
+
+    def relock_padlock(self, position):
+        """
+        Lock an opened padlock again, or retry next tick if its cell is taken
+
+        Args:
+            position (tuple): The position of the padlock.
+        """
+        if self._grid[position[0]][position[1]] not in (
+            self._cls_empty,
+            self._padlock_emoji,
+        ):
+            self._scheduler.schedule(1, self.relock_padlock, position)
+            return
+        self._padlock_positions.append(position)
+        self._grid[position[0]][position[1]] = self._padlock_emoji
+        self.notify_obstacle_change(tuple(position), True)
+
+    @property
+    def fov(self):
+        """
+        The field of view of the player, None when the fog of war is off.
+        """
+        return self._fov
+
+    @property
+    def fog_radius(self):
+        """
+        The view radius of the player, None when the fog of war is off.
+        """
+        return self._fog_radius
+
+    @property
+    def scheduler(self):
+        """
+        The tick scheduler of the maze.
+        """
+        return self._scheduler
+
     @property
     def player_emoji(self):
         """
@@ -391,6 +899,24 @@ class Maze:
         """
         return self._player_position
 
+    def chase_targets(self):
+        """
+        The positions the enemies move toward.
+
+        Returns:
+            list: The player position.
+        """
+        return [self._player_position]
+
+    def chase_names(self):
+        """
+        The names of the players of chase_targets(), in the same order.
+
+        Returns:
+            list: None, the only player of the maze has no name.
+        """
+        return [None]
+
     def set_player_position(self, position):
         """
         Set a player's position
@@ -462,10 +988,55 @@ class Maze:
         for position in self._heart_positions:
             self._grid[position[0]][position[1]] = self._heart_emoji
 
+    def spawn_weapons(self):
+        """
+        Spawn the bombs and the fire spells on the grid.
+        """
+        for position in self._bomb_positions:
+            self._grid[position[0]][position[1]] = self._bomb_emoji
+        for position in self._spell_positions:
+            self._grid[position[0]][position[1]] = self._spell_emoji
+
+    @property
+    def quiet(self):
+        """
+        Whether the printing of the frames is off.
+        """
+        return self._quiet
+
+    @property
+    def savable(self):
+        """
+        Whether the game can be saved to and loaded from the saved game file.
+        """
+        return self._savable
+
+    def set_quiet(self, quiet):
+        """
+        Turn the printing of the frames off or on
+
+        Args:
+            quiet (bool): True when the maze is drawn elsewhere, e.g. by a remote client.
+        """
+        self._quiet = quiet
+
+    @hooks.phase("print_maze")
     def print_maze(self):
         """
         Print the maze.
         """
+        if self._quiet:
+            return
+
+        if self._fov is not None:
+            # only the visible and remembered cells are drawn
+            visible = self._fov.update(self._player_position)
+            remembered = self._fov.remembered
+        flying = {}
+        if self._projectiles is not None:
+            player_shots, enemy_shots = self._projectiles.cells()
+            flying = dict.fromkeys(enemy_shots, _ENEMY_SHOT_EMOJI)
+            flying.update(dict.fromkeys(player_shots, _PLAYER_SHOT_EMOJI))
 
         print("┌" + "─" * (self._grid_size * 3 - 1) + "┐")
 
@@ -475,6 +1046,10 @@ class Maze:
 
             # Print cell contents
             for j, cell in enumerate(row):
+                if self._fov is not None and (i, j) not in visible:
+                    cell = remembered.get((i, j), self._cls_fog)
+                elif flying and cell == self._cls_empty:
+                    cell = flying.get((i, j), cell)
                 print(cell, end="")
                 # Print vertical wall if not in the last column
                 if j < self._grid_size - 1:
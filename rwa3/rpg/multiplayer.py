@@ -0,0 +1,522 @@
+"""
+Several players sharing one maze.
+
+Every player plays through a PlayerMaze, a proxy of the shared maze holding its
+own position and emoji, so the rules of Player run unchanged. Every seat has an
+emoji of its own, which does not turn with the player: the facing is reported
+in the player state. Cells taken by other players block the way like obstacles. Enemies and items are shared: the
+first player to step on an item takes it.
+
+Commands are queued per player and applied in ticks: one command per player
+per tick, in round-robin order with the first player rotating every tick, so
+sending faster does not get a client ahead. The maze clock advances once per
+tick. After a tick only the changed cells and player states are reported.
+"""
+import contextlib
+import copy
+import io
+from collections import deque
+
+from rpg import hooks
+from rpg.session import SessionMaze
+
+# Commands a player can queue ahead of the tick loop
+_MAX_PENDING = 32
+# Emojis of the seats, the first one not taken goes to a joining player
+_SEAT_EMOJIS = ("🤴", "👸", "🧙", "🧝", "🧛", "🧜", "🥷", "🦸")
+
+
+class _Blocked:
+    """
+    The obstacle positions seen by one player: the obstacles and the other players.
+    """
+
+    __slots__ = ("_maze", "_view")
+
+    def __init__(self, maze, view):
+        self._maze = maze
+        self._view = view
+
+    def __contains__(self, position):
+        if position in self._maze.occupied:
+            return position != self._view.player_position
+        return position in self._maze.obstacle_positions
+
+    def __iter__(self):
+        yield from self._maze.obstacle_positions
+        own = self._view.player_position
+        yield from (position for position in self._maze.occupied if position != own)
+
+
+class _TickClock:
+    """
+    The scheduler seen by one player. Events are scheduled on the shared clock,
+    but only the game advances it, once per tick.
+    """
+
+    __slots__ = ("_scheduler",)
+
+    def __init__(self, scheduler):
+        self._scheduler = scheduler
+
+    def __getattr__(self, name):
+        return getattr(self._scheduler, name)
+
+    def advance(self):
+        return 0
+
+
+class SharedMaze(SessionMaze):
+    """
+    A maze played by several players at once.
+
+    Attributes:
+        _players (dict): name -> PlayerMaze of every player in the maze.
+        _occupied (set): The positions of all the players.
+    """
+
+    def __init__(self, template):
+        """
+        Initialize the shared maze; the player of the YAML file is left out.
+
+        Args:
+            template (MazeTemplate): The shared template.
+        """
+        super().__init__(template)
+        start = self._player_position
+        self._grid[start[0]][start[1]] = self._cls_empty
+        self.track_dirty()
+        self._players = {}
+        self._occupied = set()
+
+    @property
+    def players(self):
+        """
+        name -> PlayerMaze of every player in the maze.
+        """
+        return self._players
+
+    def chase_targets(self):
+        """
+        The positions the enemies move toward.
+
+        Returns:
+            list: The position of every player.
+        """
+        return [view.player_position for view in self._players.values()]
+
+    def chase_names(self):
+        """
+        The names of the players of chase_targets(), in the same order.
+
+        Returns:
+            list: The name of every player.
+        """
+        return list(self._players)
+
+    @property
+    def occupied(self):
+        """
+        The positions of all the players, kept up to date as they move.
+        """
+        return self._occupied
+
+    def move_player(self, position, new_position):
+        """
+        Move a player in the occupied cells.
+
+        Args:
+            position (tuple): The cell the player leaves.
+            new_position (tuple): The cell the player moves to.
+        """
+        self._occupied.discard(position)
+        self._occupied.add(new_position)
+
+    def join(self, name, emoji):
+        """
+        Add a player on the free cell closest to the start of the YAML file.
+
+        Args:
+            name (str): The name of the player.
+            emoji (str): The emoji of the player.
+
+        Returns:
+            PlayerMaze: The maze as seen by the new player, None if the maze is full.
+        """
+        position = self._free_cell()
+        if position is None:
+            return None
+        view = PlayerMaze(self, position, emoji)
+        self._players[name] = view
+        self._occupied.add(position)
+        view.spawn_player()
+        return view
+
+    def leave(self, name):
+        """
+        Remove a player from the maze.
+
+        Args:
+            name (str): The name of the player.
+        """
+        view = self._players.pop(name, None)
+        if view is not None:
+            row, col = view.player_position
+            self._occupied.discard((row, col))
+            if self._grid[row][col] == view.player_emoji:
+                self._grid[row][col] = self._cls_empty
+
+    def _free_cell(self):
+        """
+        Find the empty cell closest to the start, walking around the obstacles.
+
+        Returns:
+            tuple: The cell, None if every reachable cell is taken.
+        """
+        start = self._player_position
+        seen = {start}
+        queue = deque([start])
+        while queue:
+            row, col = queue.popleft()
+            if self._grid[row][col] == self._cls_empty:
+                return (row, col)
+            for position in ((row - 1, col), (row + 1, col), (row, col - 1), (row, col + 1)):
+                if (
+                    0 <= position[0] < self._grid_size
+                    and 0 <= position[1] < self._grid_size
+                    and position not in seen
+                    and position not in self._obstacle_positions
+                ):
+                    seen.add(position)
+                    queue.append(position)
+        return None
+
+
+class PlayerMaze:
+    """
+    A class representing the shared maze as seen by one player.
+
+    Everything but the player position, the player emoji, the obstacles and the
+    clock is read from and written to the shared maze.
+
+    Attributes:
+        _maze (SharedMaze): The shared maze.
+        _player_position (tuple): The position of this player.
+        _player_emoji (str): The emoji of the seat of this player.
+        _blocked (_Blocked): The obstacles and the cells of the other players.
+        _clock (_TickClock): The shared clock, advanced by the game only.
+    """
+
+    def __init__(self, maze, position, emoji):
+        """
+        Initialize the view of one player.
+
+        Args:
+            maze (SharedMaze): The shared maze.
+            position (tuple): The position of the player.
+            emoji (str): The emoji of the player.
+        """
+        self._maze = maze
+        self._player_position = position
+        self._player_emoji = emoji
+        self._blocked = _Blocked(maze, self)
+        self._clock = _TickClock(maze.scheduler)
+
+    def __getattr__(self, name):
+        return getattr(self._maze, name)
+
+    @property
+    def obstacle_positions(self):
+        """
+        The obstacles, the cells of the other players included.
+        """
+        return self._blocked
+
+    @property
+    def scheduler(self):
+        """
+        The shared clock; the game advances it once per tick.
+        """
+        return self._clock
+
+    @property
+    def player_position(self):
+        """
+        The player position
+        """
+        return self._player_position
+
+    def set_player_position(self, position):
+        """
+        Set the player's position
+
+        Args:
+            position (tuple): player's new position
+        """
+        self._maze.move_player(self._player_position, tuple(position))
+        self._player_position = tuple(position)
+
+    @property
+    def player_emoji(self):
+        """
+        The player emoji
+        """
+        return self._player_emoji
+
+    def set_player_emoji(self, emoji):
+        """
+        Keep the emoji of the seat: the players turning would all take the
+        emojis of the YAML file. The facing is reported in the player state.
+
+        Args:
+            emoji (str): The emoji of the facing of the player.
+        """
+
+    def spawn_player(self):
+        """
+        Draw the player on the shared grid.
+        """
+        self._maze.grid[self._player_position[0]][self._player_position[1]] = (
+            self._player_emoji
+        )
+
+    def take_fire_damage(self):
+        """
+        The hits of the shared clock are dealt by SharedGame.step() to every player.
+
+        Returns:
+            int: 0.
+        """
+        return 0
+
+    def print_maze(self):
+        """
+        Frames are not printed in a shared maze, the clients draw the deltas.
+        """
+
+
+class SharedGame:
+    """
+    A class representing a game played by several players in one maze.
+
+    Attributes:
+        _maze (SharedMaze): The shared maze.
+        _player (Player): The player every joining player is copied from.
+        _seats (dict): name -> (Player, PlayerMaze, pending commands), in join order.
+        _reported (dict): name -> player state last reported.
+        _tick (int): The number of ticks played.
+        _joined (int): The number of players that ever joined, to name them.
+    """
+
+    def __init__(self, template, player):
+        """
+        Initialize a game with no player.
+
+        Args:
+            template (MazeTemplate): The maze to play.
+            player (Player): The player every joining player is copied from.
+        """
+        self._maze = SharedMaze(template)
+        self._player = player
+        self._seats = {}
+        self._reported = {}
+        self._tick = 0
+        self._joined = 0
+
+    @property
+    def maze(self):
+        """
+        The shared maze.
+        """
+        return self._maze
+
+    @property
+    def tick(self):
+        """
+        The number of ticks played.
+        """
+        return self._tick
+
+    def join(self):
+        """
+        Add a player to the game.
+
+        Returns:
+            str: The name of the new player, None if the maze is full.
+        """
+        self._joined += 1
+        name = f"player{self._joined}"
+        player = copy.deepcopy(self._player)
+        taken = {seat[1].player_emoji for seat in self._seats.values()}
+        emoji = next(
+            (emoji for emoji in _SEAT_EMOJIS if emoji not in taken),
+            _SEAT_EMOJIS[self._joined % len(_SEAT_EMOJIS)],
+        )
+        view = self._maze.join(name, emoji)
+        if view is None:
+            return None
+        self._seats[name] = (player, view, deque())
+        return name
+
+    def leave(self, name):
+        """
+        Remove a player from the game; unknown names are ignored.
+
+        Args:
+            name (str): The name of the player.
+        """
+        seat = self._seats.pop(name, None)
+        if seat is not None:
+            self._maze.leave(name)
+            # a game that ended on quit, win or loss is already counted
+            hooks.end_game(seat[1])
+
+    def submit(self, name, action):
+        """
+        Queue a command for the next ticks.
+
+        Args:
+            name (str): The name of the player.
+            action (str): The command.
+
+        Returns:
+            bool: False if the player left or has too many commands queued.
+        """
+        seat = self._seats.get(name)
+        if seat is None or len(seat[2]) >= _MAX_PENDING:
+            return False
+        seat[2].append(action)
+        return True
+
+    def pending(self):
+        """
+        Whether a player has a command queued.
+        """
+        return any(seat[2] for seat in self._seats.values())
+
+    def snapshot(self):
+        """
+        Get the full state of the game, sent to a client when it joins.
+
+        Returns:
+            dict: The tick, the grid rows and the state of every player.
+        """
+        return {
+            "type": "snapshot",
+            "tick": self._tick,
+            "size": self._maze.grid_size,
+            "rows": [list(row) for row in self._maze.grid],
+            "players": {name: self._state(name) for name in self._seats},
+        }
+
+    def step(self):
+        """
+        Play one tick: one queued command per player, then the maze clock.
+
+        Returns:
+            tuple: (delta, outputs, finished). delta holds the changed cells and
+            player states, outputs maps every player that played to the text
+            its command printed, finished lists the players whose game ended.
+        """
+        self._tick += 1
+        names = list(self._seats)
+        if names:
+            # the first player rotates every tick
+            start = self._tick % len(names)
+            names = names[start:] + names[:start]
+
+        outputs = {}
+        finished = []
+        for name in names:
+            seat = self._seats.get(name)
+            if seat is None or not seat[2]:
+                continue
+            player, view, queue = seat
+            with contextlib.redirect_stdout(io.StringIO()) as output:
+                try:
+                    with hooks.turn(view):
+                        player.handle_command(queue.popleft(), view)
+                except SystemExit:
+                    # quit, win and loss end the game of this player only
+                    finished.append(name)
+                    self.leave(name)
+            outputs[name] = output.getvalue()
+        self._maze.scheduler.advance()
+        self._take_fire(outputs, finished)
+        return self._delta(finished), outputs, finished
+
+    def _take_fire(self, outputs, finished):
+        """
+        Deal the damage of the projectiles that hit players during the tick.
+
+        Args:
+            outputs (dict): name -> printed text, extended with the hits.
+            finished (list): The players whose game ended, extended with the
+                players killed.
+        """
+        projectiles = self._maze.projectile_system
+        if projectiles is None:
+            return
+        for name, damage in projectiles.take_player_hits().items():
+            seat = self._seats.get(name)
+            if seat is None:
+                # the player left during the tick
+                continue
+            player, view, _ = seat
+            with contextlib.redirect_stdout(io.StringIO()) as output:
+                try:
+                    with hooks.playing(view):
+                        player.take_fire(damage)
+                except SystemExit:
+                    finished.append(name)
+                    self.leave(name)
+            outputs[name] = outputs.get(name, "") + output.getvalue()
+
+    def _state(self, name):
+        """
+        Get the state of a player reported to the clients.
+
+        Args:
+            name (str): The name of the player.
+
+        Returns:
+            dict: The position, emoji, facing and health of the player.
+        """
+        player, view, _ = self._seats[name]
+        return {
+            "position": list(view.player_position),
+            "emoji": view.player_emoji,
+            "direction": player.direction.value,
+            "health": player.health,
+        }
+
+    def _delta(self, left):
+        """
+        Get what changed since the last delta.
+
+        Args:
+            left (list): The players that left during the tick.
+
+        Returns:
+            dict: The tick, the changed cells, the changed player states and the
+            players that left.
+        """
+        grid = self._maze.grid
+        cells = [[row, col, grid[row][col]] for row, col in sorted(self._maze.take_dirty())]
+        players = {}
+        for name in self._seats:
+            state = self._state(name)
+            if self._reported.get(name) != state:
+                self._reported[name] = state
+                players[name] = state
+        for name in [name for name in self._reported if name not in self._seats]:
+            del self._reported[name]
+            if name not in left:
+                left = left + [name]
+        return {
+            "type": "delta",
+            "tick": self._tick,
+            "cells": cells,
+            "players": players,
+            "left": left,
+        }
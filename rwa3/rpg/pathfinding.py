@@ -0,0 +1,495 @@
+"""
+Hierarchical pathfinding (HPA*) over the maze grid.
+
+The grid is split into square clusters. Entrances are placed on the borders
+between neighbouring clusters and the distances between the entrances of each
+cluster are precomputed, so long-range queries run on the small abstract graph
+and are only refined into grid cells at the end.
+
+The enemies use it to chase the players when the maze sets `chase: path`: one
+search per enemy instead of the distance field of the whole grid, which pays
+off on large mazes with few enemies.
+"""
+import heapq
+from collections import deque
+
+# Borders with a run of free cells at least this long get two entrances
+_MAX_SINGLE_ENTRANCE = 6
+_MOVES = ((-1, 0), (1, 0), (0, -1), (0, 1))
+
+
+class HierarchicalPathfinder:
+    """
+    A class representing an HPA* pathfinder for a maze.
+
+    Obstacles and padlocks are impassable. The pathfinder registers itself as an
+    obstacle listener of the maze so that only the cluster around a changed cell
+    is rebuilt.
+
+    Attributes:
+        _maze (Maze): The maze to search.
+        _size (int): The grid size of the maze.
+        _cluster_size (int): The side length of a cluster.
+        _blocked (set): The impassable cells.
+        _borders (dict): Entrance pairs keyed by (cluster, neighbouring cluster).
+        _inter (dict): Abstract edges across borders, entrance -> set of entrances.
+        _intra (dict): Abstract edges inside a cluster, cluster -> {entrance: {entrance: cost}}.
+    """
+
+    def __init__(self, maze, cluster_size=10):
+        """
+        Initialize the pathfinder and build the abstract graph.
+
+        Args:
+            maze (Maze): The maze to search.
+            cluster_size (int): The side length of a cluster.
+        """
+        self._maze = maze
+        self._size = maze.grid_size
+        self._cluster_size = cluster_size
+        self._clusters_per_side = -(-self._size // cluster_size)
+        self._blocked = set(maze.obstacle_positions) | set(maze.padlock_positions)
+        self._borders = {}
+        self._inter = {}
+        self._intra = {}
+
+        for cluster in self.clusters():
+            for neighbour in self._forward_neighbours(cluster):
+                self._build_border(cluster, neighbour)
+        for cluster in self.clusters():
+            self._build_cluster(cluster)
+
+        maze.add_obstacle_listener(self.on_obstacle_change)
+
+    @property
+    def cluster_size(self):
+        """
+        The side length of a cluster.
+        """
+        return self._cluster_size
+
+    def clusters(self):
+        """
+        Iterate over all clusters of the grid.
+
+        Returns:
+            generator: (row, col) index of each cluster.
+        """
+        for row in range(self._clusters_per_side):
+            for col in range(self._clusters_per_side):
+                yield (row, col)
+
+    def cluster_of(self, position):
+        """
+        Get the cluster a cell belongs to.
+
+        Args:
+            position (tuple): The cell position.
+
+        Returns:
+            tuple: (row, col) index of the cluster.
+        """
+        return (position[0] // self._cluster_size, position[1] // self._cluster_size)
+
+    def is_passable(self, position):
+        """
+        Check whether a cell is inside the grid and not blocked.
+
+        Args:
+            position (tuple): The cell position.
+
+        Returns:
+            bool: True if the cell can be walked on.
+        """
+        row, col = position
+        return (
+            0 <= row < self._size
+            and 0 <= col < self._size
+            and (row, col) not in self._blocked
+        )
+
+    def entrances(self, cluster):
+        """
+        Get the entrance cells of a cluster.
+
+        Args:
+            cluster (tuple): (row, col) index of the cluster.
+
+        Returns:
+            list: The entrance cells lying inside the cluster.
+        """
+        return list(self._intra.get(cluster, {}))
+
+    def on_obstacle_change(self, position, blocked):
+        """
+        Update the abstract graph after an obstacle-like cell changed.
+
+        Only the borders of the affected cluster are rebuilt, together with the
+        intra-cluster edges of the clusters whose entrances moved.
+
+        Args:
+            position (tuple): The cell that changed.
+            blocked (bool): Whether the cell is now impassable.
+        """
+        if blocked:
+            self._blocked.add(position)
+        else:
+            self._blocked.discard(position)
+
+        cluster = self.cluster_of(position)
+        changed = {cluster}
+        for neighbour in self._neighbour_clusters(cluster):
+            key = self._border_key(cluster, neighbour)
+            before = self._borders.get(key)
+            self._build_border(*key)
+            if self._borders.get(key) != before:
+                changed.add(neighbour)
+        for each in changed:
+            self._build_cluster(each)
+
+    def find_path(self, start, goal):
+        """
+        Find a path between two cells.
+
+        Args:
+            start (tuple): The start cell.
+            goal (tuple): The goal cell.
+
+        Returns:
+            list: The cells from start to goal (both included), or None if the goal
+            cannot be reached.
+        """
+        start, goal = tuple(start), tuple(goal)
+        if not self.is_passable(start) or not self.is_passable(goal):
+            return None
+        if start == goal:
+            return [start]
+
+        start_cluster = self.cluster_of(start)
+        goal_cluster = self.cluster_of(goal)
+        if start_cluster == goal_cluster:
+            path = self._local_path(start, goal, start_cluster)
+            if path is not None:
+                return path
+
+        # Connect start and goal to the entrances of their own cluster
+        start_edges = self._entrance_distances(start, start_cluster)
+        goal_edges = self._entrance_distances(goal, goal_cluster)
+        abstract = self._abstract_search(start, goal, start_edges, goal_edges)
+        if abstract is None:
+            return None
+        return self._refine(abstract)
+
+    def next_step(self, position):
+        """
+        Get the neighbour an enemy should step to.
+
+        Args:
+            position (tuple): The current position of the enemy.
+
+        Returns:
+            tuple: The first cell of the shortest path found to a chased position,
+            or None if there is none or the cell is not empty.
+        """
+        best = None
+        for target in self._maze.chase_targets():
+            path = self.find_path(position, target)
+            if path is not None and len(path) > 1 and (best is None or len(path) < len(best)):
+                best = path
+        if best is None:
+            return None
+        row, col = best[1]
+        if self._maze.grid[row][col] != self._maze.cls_empty:
+            return None
+        return (row, col)
+
+    def chase(self):
+        """
+        Move every skeleton and dragon one cell toward the chased positions.
+        """
+        for positions in (self._maze.skeleton_positions, self._maze.dragon_positions):
+            for index, position in enumerate(positions):
+                step = self.next_step(position)
+                if step is not None:
+                    self._maze.move_enemy(position, step, index)
+
+    def _abstract_search(self, start, goal, start_edges, goal_edges):
+        """
+        Run A* on the abstract graph.
+
+        Args:
+            start (tuple): The start cell.
+            goal (tuple): The goal cell.
+            start_edges (dict): Distance from start to the entrances of its cluster.
+            goal_edges (dict): Distance from the entrances of the goal cluster to goal.
+
+        Returns:
+            list: The abstract path from start to goal, or None.
+        """
+        def heuristic(cell):
+            return abs(cell[0] - goal[0]) + abs(cell[1] - goal[1])
+
+        best = {start: 0}
+        parent = {start: None}
+        frontier = [(heuristic(start), 0, start)]
+        while frontier:
+            _, cost, node = heapq.heappop(frontier)
+            if node == goal:
+                path = []
+                while node is not None:
+                    path.append(node)
+                    node = parent[node]
+                return path[::-1]
+            if cost > best[node]:
+                continue
+            edges = self._abstract_edges(node) if node in self._inter else []
+            if node == start:
+                edges.extend(start_edges.items())
+            if node in goal_edges:
+                edges.append((goal, goal_edges[node]))
+            for neighbour, step in edges:
+                new_cost = cost + step
+                if new_cost < best.get(neighbour, float("inf")):
+                    best[neighbour] = new_cost
+                    parent[neighbour] = node
+                    heapq.heappush(
+                        frontier, (new_cost + heuristic(neighbour), new_cost, neighbour)
+                    )
+        return None
+
+    def _abstract_edges(self, node):
+        """
+        Get the abstract edges leaving an entrance.
+
+        Args:
+            node (tuple): The entrance cell.
+
+        Returns:
+            list: (entrance, cost) pairs.
+        """
+        edges = list(self._intra[self.cluster_of(node)].get(node, {}).items())
+        edges.extend((other, 1) for other in self._inter.get(node, ()))
+        return edges
+
+    def _refine(self, abstract):
+        """
+        Turn an abstract path into grid cells.
+
+        Args:
+            abstract (list): Consecutive abstract nodes.
+
+        Returns:
+            list: The cells of the full path.
+        """
+        path = [abstract[0]]
+        for source, target in zip(abstract, abstract[1:]):
+            if abs(source[0] - target[0]) + abs(source[1] - target[1]) == 1:
+                path.append(target)
+            else:
+                segment = self._local_path(source, target, self.cluster_of(source))
+                path.extend(segment[1:])
+        return path
+
+    def _bounds(self, cluster):
+        """
+        Get the cell bounds of a cluster.
+
+        Args:
+            cluster (tuple): (row, col) index of the cluster.
+
+        Returns:
+            tuple: (row_min, row_max, col_min, col_max), max values excluded.
+        """
+        row_min = cluster[0] * self._cluster_size
+        col_min = cluster[1] * self._cluster_size
+        return (
+            row_min,
+            min(row_min + self._cluster_size, self._size),
+            col_min,
+            min(col_min + self._cluster_size, self._size),
+        )
+
+    def _bfs(self, start, cluster):
+        """
+        Breadth-first search restricted to one cluster.
+
+        Args:
+            start (tuple): The start cell.
+            cluster (tuple): The cluster to stay in.
+
+        Returns:
+            tuple: Parent of every reached cell (start maps to None) and the
+            distance of every reached cell.
+        """
+        row_min, row_max, col_min, col_max = self._bounds(cluster)
+        parent = {start: None}
+        distance = {start: 0}
+        queue = deque([start])
+        while queue:
+            row, col = queue.popleft()
+            for d_row, d_col in _MOVES:
+                cell = (row + d_row, col + d_col)
+                if (
+                    row_min <= cell[0] < row_max
+                    and col_min <= cell[1] < col_max
+                    and cell not in parent
+                    and cell not in self._blocked
+                ):
+                    parent[cell] = (row, col)
+                    distance[cell] = distance[(row, col)] + 1
+                    queue.append(cell)
+        return parent, distance
+
+    def _local_path(self, start, goal, cluster):
+        """
+        Find a path that stays inside one cluster.
+
+        Args:
+            start (tuple): The start cell.
+            goal (tuple): The goal cell.
+            cluster (tuple): The cluster to stay in.
+
+        Returns:
+            list: The cells from start to goal, or None.
+        """
+        parent, _ = self._bfs(start, cluster)
+        if goal not in parent:
+            return None
+        path = []
+        cell = goal
+        while cell is not None:
+            path.append(cell)
+            cell = parent[cell]
+        return path[::-1]
+
+    def _entrance_distances(self, start, cluster):
+        """
+        Compute the distances from a cell to the entrances of its cluster.
+
+        Args:
+            start (tuple): The start cell.
+            cluster (tuple): The cluster of the cell.
+
+        Returns:
+            dict: entrance -> distance, for the reachable entrances.
+        """
+        _, distance = self._bfs(start, cluster)
+        return {
+            entrance: distance[entrance]
+            for entrance in self._intra.get(cluster, {})
+            if entrance in distance
+        }
+
+    def _build_cluster(self, cluster):
+        """
+        Precompute the distances between the entrances of a cluster.
+
+        Args:
+            cluster (tuple): (row, col) index of the cluster.
+        """
+        entrances = set()
+        for neighbour in self._neighbour_clusters(cluster):
+            key = self._border_key(cluster, neighbour)
+            side = 0 if key[0] == cluster else 1
+            entrances.update(pair[side] for pair in self._borders.get(key, ()))
+
+        # the entrance set must be known before the distances are measured
+        edges = dict.fromkeys(entrances)
+        self._intra[cluster] = edges
+        for entrance in entrances:
+            distances = self._entrance_distances(entrance, cluster)
+            distances.pop(entrance, None)
+            edges[entrance] = distances
+
+    def _build_border(self, first, second):
+        """
+        Place the entrances on the border between two neighbouring clusters.
+
+        Args:
+            first (tuple): The upper or left cluster.
+            second (tuple): The lower or right cluster.
+        """
+        key = (first, second)
+        for cell_a, cell_b in self._borders.get(key, ()):
+            self._inter[cell_a].discard(cell_b)
+            self._inter[cell_b].discard(cell_a)
+
+        row_min, row_max, col_min, col_max = self._bounds(first)
+        if first[0] == second[0]:
+            # vertical border: first is on the left
+            pairs = [
+                ((row, col_max - 1), (row, col_max)) for row in range(row_min, row_max)
+            ]
+        else:
+            # horizontal border: first is on top
+            pairs = [
+                ((row_max - 1, col), (row_max, col)) for col in range(col_min, col_max)
+            ]
+
+        entrances = []
+        run = []
+        for pair in pairs + [None]:
+            if pair is not None and self.is_passable(pair[0]) and self.is_passable(pair[1]):
+                run.append(pair)
+                continue
+            if run:
+                if len(run) < _MAX_SINGLE_ENTRANCE:
+                    entrances.append(run[len(run) // 2])
+                else:
+                    entrances.extend((run[0], run[-1]))
+                run = []
+
+        for cell_a, cell_b in entrances:
+            self._inter.setdefault(cell_a, set()).add(cell_b)
+            self._inter.setdefault(cell_b, set()).add(cell_a)
+        self._borders[key] = entrances
+
+    def _forward_neighbours(self, cluster):
+        """
+        Get the clusters right of and below a cluster.
+
+        Args:
+            cluster (tuple): (row, col) index of the cluster.
+
+        Returns:
+            list: The neighbouring clusters that exist.
+        """
+        row, col = cluster
+        neighbours = []
+        if col + 1 < self._clusters_per_side:
+            neighbours.append((row, col + 1))
+        if row + 1 < self._clusters_per_side:
+            neighbours.append((row + 1, col))
+        return neighbours
+
+    def _neighbour_clusters(self, cluster):
+        """
+        Get the four neighbouring clusters of a cluster.
+
+        Args:
+            cluster (tuple): (row, col) index of the cluster.
+
+        Returns:
+            list: The neighbouring clusters that exist.
+        """
+        row, col = cluster
+        return [
+            (row + d_row, col + d_col)
+            for d_row, d_col in _MOVES
+            if 0 <= row + d_row < self._clusters_per_side
+            and 0 <= col + d_col < self._clusters_per_side
+        ]
+
+    @staticmethod
+    def _border_key(cluster, neighbour):
+        """
+        Order two neighbouring clusters as (upper or left, lower or right).
+
+        Args:
+            cluster (tuple): A cluster.
+            neighbour (tuple): A neighbouring cluster.
+
+        Returns:
+            tuple: The border key.
+        """
+        return (cluster, neighbour) if cluster < neighbour else (neighbour, cluster)
@@ -1,4 +1,7 @@
+import os.path
 import random
+import re
+import struct
 import sys
 
 # Importing required modules
@@ -6,8 +9,47 @@ from enum import Enum
 import yaml
 import rpg.enemy
 import rpg.item as item
+from rpg import hooks, stats, tracing
 from rpg.maze import file_path  # noqa: E402
 
+# Most commands run from one input line
+MAX_BATCH = 1000
+# Every command of the game and what it does; the menus of all the modes show it
+COMMANDS = (
+    ("w", "move forward"),
+    ("s", "move backward"),
+    ("d", "rotate right"),
+    ("a", "rotate left"),
+    ("i", "print inventory"),
+    ("k", "use arrow"),
+    ("b", "throw a bomb"),
+    ("f", "cast a fire spell"),
+    ("p", "print health status of the player"),
+    ("h", "hint from the solver"),
+    ("o", "save the game"),
+    ("l", "load the saved game"),
+    ("q", "quit"),
+)
+# How to send several commands on one line, see Player.parse_commands
+BATCH_HELP = "several at once: wwdk, 5w"
+
+
+def command_menu(separator="\n", batch=True):
+    """
+    Get the menu of the commands of COMMANDS.
+
+    Args:
+        separator (str): The text between two commands.
+        batch (bool): Whether the menu tells how to send several commands at once.
+
+    Returns:
+        str: The menu.
+    """
+    entries = [f"{key} - {text}" for key, text in COMMANDS]
+    if batch:
+        entries.append(BATCH_HELP)
+    return separator.join(entries)
+
 
 class Direction(Enum):
     """
@@ -40,16 +82,27 @@ class Player:
     """
 
     _emoji = {}
+    # solver policies, loaded on the first hint and keyed by maze YAML file
+    _policies = {}
+    __slots__ = (
+        "_name",
+        "_health",
+        "_inventory",
+        "_position",
+        "_direction",
+        "_attack_power",
+    )
 
     def __init__(
-        self, name, health, position, direction: Direction, attack_power, inventory={}
+        self, name, health, position, direction: Direction, attack_power, inventory=None
     ):
         """
         Initialize a Player object.
         """
         self._name = name
         self._health = health
-        self._inventory = inventory
+        # every player gets its own inventory
+        self._inventory = {} if inventory is None else inventory
         self._position = position
         self._direction = direction
         self._attack_power = attack_power
@@ -69,6 +122,20 @@ class Player:
         """
         return self._health
 
+    @property
+    def attack_power(self):
+        """
+        The attack power of the player.
+        """
+        return self._attack_power
+
+    @property
+    def direction(self):
+        """
+        The direction the player is facing.
+        """
+        return self._direction
+
     @property
     def inventory(self):
         """
@@ -78,11 +145,14 @@ class Player:
         return self._inventory
 
     @classmethod
-    def extract_player(cls):
+    def extract_player(cls, path=file_path):
         """
         to load the default values from yaml file to class attributes
+
+        Args:
+            path (str): the YAML file of the maze
         """
-        with open(file_path, "r") as file:
+        with open(path, "r") as file:
             try:
                 data = yaml.safe_load(file)
                 player = data["maze"]["player"]
@@ -101,7 +171,7 @@ class Player:
                 print(f"Error parsing YAML file: {e}")
 
     @classmethod
-    def start(cls, player, maze):
+    def start(cls, player, maze, dungeon=None):
         """
         Start the command input loop for the user to enter commands to -
         navigate through the maze game
@@ -109,40 +179,262 @@ class Player:
         Args:
             player (Player class): initialize the Arthur player object
             maze (_type_): _description_
+            dungeon (Dungeon class): the dungeon the maze is a floor of, if any
         """
 
+        # the key of this game for the observers of rpg.hooks
+        game = object()
         print("*" * 34 + "\n*** Welcome to the Maze Game! ***")
-        while True:
-            print(
-                "*" * 34
-                + "\nw - move forward \
-                            \ns - move backward \
-                            \nd - rotate right \
-                            \na - rotate left \
-                            \ni - print inventory \
-                            \nk - use arrow \
-                            \np - print health status of the player \
-                            \nq - quit"
-            )
-            action = input("*" * 34 + "\nEnter a command: ")
+        try:
+            while True:
+                print("*" * 34 + "\n" + command_menu())
+                action = input("*" * 34 + "\nEnter a command: ")
+                with hooks.turn(game):
+                    maze = player.handle_commands(action, maze, dungeon)
+        finally:
+            # quitting, winning and losing all end here
+            tracing.dump()
+            hooks.end_game(game)
+            stats.write()
+
+    @staticmethod
+    @hooks.phase("input")
+    def parse_commands(line):
+        """
+        Split a line of commands into single commands
 
-            # Determine user input
-            if action == "p":
-                print(f"🤴 Arthur has {player.health} health.")
-            elif action == "i":
-                Player.print_inventory(Player, maze, player)
-                maze.print_maze()
-            elif action in ("w", "s", "d", "a"):
-                player.move(action, maze)
-                maze.print_maze()
-            elif action == "k":
-                player.use_arrow(maze)
+        Args:
+            line (str): commands, each one optionally preceded by a repeat count,
+            e.g. "wwdk" or "5w2d"
+
+        Returns:
+            list: the single commands, None if the line is not a command sequence
+        """
+        line = line.replace(" ", "")
+        if not re.fullmatch(r"(\d*[a-z])+", line):
+            return None
+        actions = []
+        for count, action in re.findall(r"(\d*)([a-z])", line):
+            actions.extend(action * int(count or 1))
+            if len(actions) > MAX_BATCH:
+                return None
+        return actions
+
+    def handle_commands(self, line, maze, dungeon=None):
+        """
+        Run a line of commands and print the maze once at the end. The sequence
+        stops early on a combat, an arrow hitting an enemy, a blocked move or the
+        end of the game.
+
+        Args:
+            line (str): one command, or several as accepted by parse_commands
+            maze (Maze class): current maze
+            dungeon (Dungeon class): the dungeon the maze is a floor of, if any
+
+        Returns:
+            Maze class: the maze the player is on after the commands
+        """
+        actions = Player.parse_commands(line)
+        if not actions:
+            # not a command sequence, reported as an invalid command
+            return self.handle_command(line, maze, dungeon)
+        if len(actions) == 1:
+            # "1w" is just "w"
+            return self.handle_command(actions[0], maze, dungeon)
+
+        quiet = maze.quiet
+        maze.set_quiet(True)
+        try:
+            for action in actions:
+                position = maze.player_position
+                health = self._health
+                enemies = len(maze.skeleton_positions) + len(maze.dragon_positions)
+                new_maze = self.handle_command(action, maze, dungeon)
+                if new_maze is not maze:
+                    # the player took the stairs
+                    maze.set_quiet(quiet)
+                    quiet = new_maze.quiet
+                    new_maze.set_quiet(True)
+                    maze = new_maze
+                    continue
+                if (
+                    self._health < health
+                    or len(maze.skeleton_positions) + len(maze.dragon_positions) != enemies
+                    or (action in ("w", "s") and maze.player_position == position)
+                ):
+                    break
+        except SystemExit:
+            maze.set_quiet(quiet)
+            if action != "q":
+                # show how the game ended
                 maze.print_maze()
-            elif action == "q":
-                print("Player chose to exit game...")
-                sys.exit()
+            raise
+        maze.set_quiet(quiet)
+        maze.print_maze()
+        return maze
+
+    def handle_command(self, action, maze, dungeon=None):
+        """
+        Run one command of the game. Quitting, winning and losing raise SystemExit.
+
+        Args:
+            action (str): the command entered by the user
+            maze (Maze class): current maze
+            dungeon (Dungeon class): the dungeon the maze is a floor of, if any
+
+        Returns:
+            Maze class: the maze the player is on after the command
+        """
+        hooks.emit("command", action)
+        # Determine user input
+        if action == "p":
+            print(f"🤴 Arthur has {self.health} health.")
+        elif action == "i":
+            Player.print_inventory(Player, maze, self)
+            maze.print_maze()
+        elif action in ("w", "s", "d", "a"):
+            self.move(action, maze)
+            self.advance(maze)
+            if dungeon is not None:
+                maze = dungeon.use_stairs(maze)
+            maze.print_maze()
+        elif action == "k":
+            self.use_arrow(maze)
+            self.advance(maze)
+            maze.print_maze()
+        elif action == "b":
+            self.use_bomb(maze)
+            self.advance(maze)
+            maze.print_maze()
+        elif action == "f":
+            self.cast_fire_spell(maze)
+            self.advance(maze)
+            maze.print_maze()
+        elif action == "h":
+            policy = Player.load_policy(maze)
+            if policy is not None:
+                self.print_hint(policy, maze)
+        elif action in ("o", "l") and (dungeon is not None or not maze.savable):
+            # the saved game holds one maze, not the other floors of a dungeon
+            print("Saving is not available in this game.")
+        elif action == "o":
+            # savegame imports this module
+            from rpg.savegame import save_game, save_path
+
+            save_game(save_path(maze.file_path), self, maze)
+            print("Game saved!")
+        elif action == "l":
+            from rpg.savegame import load_game, save_path
+
+            path = save_path(maze.file_path)
+            if os.path.exists(path):
+                try:
+                    player, loaded = load_game(path)
+                except (ValueError, struct.error, OSError) as e:
+                    # a damaged or outdated file leaves the current game as it is
+                    print(f"The saved game could not be loaded: {e}")
+                else:
+                    maze = loaded
+                    self.restore(player)
+                    print("Game loaded!")
+                    maze.print_maze()
             else:
-                print(f"Invalid command entered ({action}), please try again.")
+                print("No saved game found.")
+        elif action == "q":
+            print("Player chose to exit game...")
+            hooks.emit("game_over", hooks.QUIT)
+            sys.exit()
+        else:
+            print(f"Invalid command entered ({action}), please try again.")
+        return maze
+
+    def advance(self, maze):
+        """
+        Move the clock of the maze one tick forward, then report what the
+        projectiles did and take the damage of the ones that hit the player
+
+        Args:
+            maze (Maze class): current maze
+        """
+        maze.scheduler.advance()
+        projectiles = maze.projectile_system
+        if projectiles is None:
+            return
+        hit, killed = projectiles.take_report()
+        if hit:
+            print(f"🏹 Arrows hit {hit} enemies, {len(killed)} defeated.")
+        self.take_fire(maze.take_fire_damage())
+
+    def take_fire(self, damage):
+        """
+        Take the damage of the projectiles that hit the player
+
+        Args:
+            damage (int): the damage, 0 if none hit
+        """
+        if damage:
+            print(f"🐉🔥 {self._name} is hit by fire!")
+            self.take_damage(damage)
+            if self._health <= 0:
+                print("Player was defeated. Game Over!")
+                hooks.emit("game_over", hooks.LOSS)
+                sys.exit()
+
+    def restore(self, other):
+        """
+        Take over the state of another player, e.g. one read from a saved game
+
+        Args:
+            other (Player class): the player to copy
+        """
+        self._name = other.name
+        self._health = other.health
+        self._inventory = dict(other.inventory)
+        self._position = other._position
+        self._direction = other.direction
+        self._attack_power = other.attack_power
+
+    @classmethod
+    def load_policy(cls, maze):
+        """
+        Load the solver policy that goes with the maze YAML file
+
+        Args:
+            maze (Maze class): current maze
+
+        Returns:
+            PolicyTable: the policy, or None if the maze was not solved
+        """
+        if maze.file_path in cls._policies:
+            return cls._policies[maze.file_path]
+        # the solver needs NumPy, only import it when a hint is asked
+        from rpg.solver import PolicyTable
+
+        path = PolicyTable.policy_path(maze.file_path)
+        if not os.path.exists(path):
+            print(f"No policy found, run: python -m rpg.solver {maze.file_path}")
+            return None
+        cls._policies[maze.file_path] = PolicyTable(path)
+        return cls._policies[maze.file_path]
+
+    def print_hint(self, policy, maze):
+        """
+        Print the command the solver would play
+
+        Args:
+            policy (PolicyTable): the solver policy of the maze
+            maze (Maze class): current maze
+        """
+        hint = policy.hint(
+            maze,
+            self._direction.value,
+            self.inventory.get(item.Category.ARROW, 0),
+            self._health,
+        )
+        if hint is None:
+            print("No hint for this position.")
+        else:
+            print(f"💡 Hint: {hint}")
 
     def print_inventory(self, maze, player):
         """
@@ -154,7 +446,7 @@ class Player:
         """
         print(
             "*" * 45
-            + f"\nArthur's inventory: {maze.key_emoji} x {player.inventory.get(item.Category.KEY, 0)}, {maze.arrow_emoji} x {player.inventory.get(item.Category.ARROW, 0)}, {maze.gem_emoji} x {player.inventory.get(item.Category.GEM, 0)}\n"
+            + f"\nArthur's inventory: {maze.key_emoji} x {player.inventory.get(item.Category.KEY, 0)}, {maze.arrow_emoji} x {player.inventory.get(item.Category.ARROW, 0)}, {maze.gem_emoji} x {player.inventory.get(item.Category.GEM, 0)}, {maze.bomb_emoji} x {player.inventory.get(item.Category.BOMB, 0)}, {maze.spell_emoji} x {player.inventory.get(item.Category.FIRE_SPELL, 0)}\n"
             + "*" * 45
         )
 
@@ -167,6 +459,7 @@ class Player:
             right 
             maze (Maze class): current maze
         """
+        position = maze.player_position
         if action == "w":
             self.move_forward(maze)
         elif action == "s":
@@ -177,6 +470,8 @@ class Player:
             self.rotate("right", maze)
 
         maze.spawn_player()
+        if maze.player_position != position:
+            hooks.emit("move")
 
     def rotate(self, direction, maze):
         """
@@ -310,6 +605,9 @@ class Player:
         Returns:
             True/False: whether or not the player is IN BOUNDS or OUT OF BOUNDS.
         """
+        # the world has no bounds
+        if maze.grid_size is None:
+            return True
         row, col = position
         return 0 <= row < maze.grid_size and 0 <= col < maze.grid_size
 
@@ -341,7 +639,9 @@ class Player:
             damage (int): The amount of damage to deal.
         """
         print(f"🤴🗡️ {self._name} attacks {enemy.name}!")
+        health = enemy.health
         enemy.take_damage(damage)
+        hooks.emit("damage_dealt", health - enemy.health)
 
     def defend(self):
         """
@@ -359,12 +659,14 @@ class Player:
         Args:
             damage (int): The amount of damage to take.
         """        
+        hooks.emit("damage_taken", damage)
         self._health -= damage
         if self._health <= 0:
             print(f"🤴💀 {self.name} has been defeated!")
         else:
             print(f"🤴💚 {self.name} has {self._health} health left.")
 
+    @hooks.phase("perform_action")
     def perform_action(self, position, maze):
         """
         Perform an action for next moving block
@@ -376,15 +678,14 @@ class Player:
         if position in maze.obstacle_positions:
             pass
         elif position in maze.dragon_positions:
-            self.combat(self, rpg.enemy.Dragon.extract_enemy(position), maze)
+            self.combat(self, rpg.enemy.Dragon.extract_enemy(
+                position, maze.enemy_spawn(position), maze.file_path
+            ), maze)
         elif position in maze.skeleton_positions:
-            self.combat(self, rpg.enemy.Skeleton.extract_enemy(position), maze)
-        elif (
-            position in maze.gem_positions
-            or position in maze.key_positions
-            or position in maze.arrow_positions
-            or position in maze.heart_positions
-        ):
+            self.combat(self, rpg.enemy.Skeleton.extract_enemy(
+                position, maze.enemy_spawn(position), maze.file_path
+            ), maze)
+        elif maze.item_at(position) is not None:
             self.pick_up_item(position, maze)
         elif position in maze.padlock_positions:
             # must have atleast 1 key to open a padlock
@@ -410,10 +711,13 @@ class Player:
             position (list): player's current position in the maze
             maze (Maze class): current maze
         """
-        # emoji of the item to be picked up
-        item_emoji = maze.grid[position[0]][position[1]]
+        picked = maze.take_item(position)
+        if picked is None:
+            return
+        category = picked.item_type
+        hooks.emit("pickup", category)
         # gems are collected to inventory
-        if item_emoji == maze.gem_emoji:
+        if category == item.Category.GEM:
             self.inventory[item.Category.GEM] = (
                 self.inventory.get(item.Category.GEM, 0) + 1
             )
@@ -425,23 +729,37 @@ class Player:
                 maze.print_maze()
                 print(f"You collected all {maze.gem_emoji}")
                 print("Goodbye!")
+                hooks.emit("game_over", hooks.WIN)
                 exit()
         # key's are collected to iventory
-        elif item_emoji == maze.key_emoji:
+        elif category == item.Category.KEY:
             self.inventory[item.Category.KEY] = (
                 self.inventory.get(item.Category.KEY, 0) + 1
             )
             print("Key added to inventory!")
         # arrows are collected to inventory
-        elif item_emoji == maze.arrow_emoji:
+        elif category == item.Category.ARROW:
             self.inventory[item.Category.ARROW] = (
                 self.inventory.get(item.Category.ARROW, 0) + 1
             )
             print("Arrow added to inventory!")
+        # bombs and fire spells are collected to inventory
+        elif category == item.Category.BOMB:
+            self.inventory[item.Category.BOMB] = (
+                self.inventory.get(item.Category.BOMB, 0) + 1
+            )
+            print("Bomb added to inventory!")
+        elif category == item.Category.FIRE_SPELL:
+            self.inventory[item.Category.FIRE_SPELL] = (
+                self.inventory.get(item.Category.FIRE_SPELL, 0) + 1
+            )
+            print("Fire spell added to inventory!")
         # hearts are consumed to increase player health
-        elif item_emoji == maze.heart_emoji:
-            self._health += item.health_boost()
+        elif category == item.Category.HEART:
+            self._health += picked.item_value
             print("Health boosted!")
+            if maze.heart_respawn is not None:
+                maze.scheduler.schedule(maze.heart_respawn, maze.respawn_heart, position)
 
     def open_padlock(self, position, maze):
         """
@@ -452,17 +770,33 @@ class Player:
             maze (Maze class): current maze
         """
         maze.remove_padlock_position(position)
+        if maze.padlock_relock is not None:
+            maze.scheduler.schedule(maze.padlock_relock, maze.relock_padlock, position)
 
+    @hooks.phase("use_arrow")
     def use_arrow(self, maze):
         """
         Use 1 arrow from inventory to shoot up to 3 spaces away at a potential enemy in one of those spaces
         If no enemy is present, arrow is still removed from inventory
+        When the arrows of the maze fly, the arrow is a projectile moving one space per tick
 
         Args:
             maze (Maze class): current maze
         """
         # can only proceed if have atleast 1 arrow in inventory
-        if self.inventory.get(item.Category.ARROW, 0) > 0:
+        if self.inventory.get(item.Category.ARROW, 0) > 0 and maze.arrow_flight:
+            # projectiles need NumPy, only imported when used
+            from rpg.projectiles import PLAYER
+
+            # the arrow flies 3 spaces, one per tick
+            row, col = maze.player_position
+            ahead = self.calculate_new_position(self._direction, maze)
+            maze.projectiles().fire(
+                (row, col), (ahead[0] - row, ahead[1] - col), 3, maze.arrow_damage, PLAYER
+            )
+            print("Arrow has been shot!")
+            self.inventory[item.Category.ARROW] -= 1
+        elif self.inventory.get(item.Category.ARROW, 0) > 0:
             # Assign coeffs for identifying 3 positions arrow will reach
             if self._direction == Direction.UP:
                 col = 0
@@ -488,13 +822,15 @@ class Player:
                 )
             for space in arrow_three_blocks:
                 # confirm space is in bounds
-                if 0 <= space[0] < maze.grid_size and 0 <= space[1] < maze.grid_size:
+                if self.is_within_bounds(space, maze):
                     # check if dragon enemy found
                     if maze.grid[space[0]][space[1]] == maze.dragon_emoji:
                         # apply damage if found
-                        enemy = rpg.enemy.Dragon.extract_enemy(space)
+                        enemy = rpg.enemy.Dragon.extract_enemy(
+                            space, maze.enemy_spawn(space), maze.file_path
+                        )
                         self.attack(
-                            enemy, item.arrow_damage()
+                            enemy, maze.arrow_damage
                         )
                         # remove dragon if defeated
                         if enemy.health <= 0:
@@ -502,9 +838,11 @@ class Player:
                         break
                     elif maze.grid[space[0]][space[1]] == maze.skeleton_emoji:
                         # apply damage if found
-                        enemy = rpg.enemy.Skeleton.extract_enemy(space)
+                        enemy = rpg.enemy.Skeleton.extract_enemy(
+                            space, maze.enemy_spawn(space), maze.file_path
+                        )
                         self.attack(
-                            enemy, item.arrow_damage()
+                            enemy, maze.arrow_damage
                         )
                         # remove skeleton if defeated
                         if enemy.health <= 0:
@@ -521,6 +859,48 @@ class Player:
                 f"Must have atleast 1 {maze.arrow_emoji}  in inventory to use_arrow! Try another command..."
             )
 
+    def use_bomb(self, maze):
+        """
+        Use 1 bomb from inventory to damage every enemy the player can see within the bomb radius
+
+        Args:
+            maze (Maze class): current maze
+        """
+        if self.inventory.get(item.Category.BOMB, 0) > 0:
+            # area weapons need NumPy, only imported when used
+            from rpg import areaeffect
+
+            table, killed = areaeffect.bomb(maze, maze.player_position)
+            print(f"💣 {self._name} throws a bomb! " + areaeffect.describe(table, killed))
+            self.inventory[item.Category.BOMB] -= 1
+        else:
+            print(
+                f"Must have atleast 1 {maze.bomb_emoji} in inventory to use_bomb! Try another command..."
+            )
+
+    def cast_fire_spell(self, maze):
+        """
+        Use 1 fire spell from inventory to damage every enemy the player can see in the cone ahead of them
+
+        Args:
+            maze (Maze class): current maze
+        """
+        if self.inventory.get(item.Category.FIRE_SPELL, 0) > 0:
+            from rpg import areaeffect
+
+            row, col = maze.player_position
+            ahead = self.calculate_new_position(self._direction, maze)
+            table, killed = areaeffect.fire_spell(
+                maze, (row, col), (ahead[0] - row, ahead[1] - col)
+            )
+            print(f"🔥 {self._name} casts a fire spell! " + areaeffect.describe(table, killed))
+            self.inventory[item.Category.FIRE_SPELL] -= 1
+        else:
+            print(
+                f"Must have atleast 1 {maze.spell_emoji} in inventory to cast_fire_spell! Try another command..."
+            )
+
+    @hooks.phase("combat")
     def combat(self, player, enemy, maze):
         """
         Engage in combat with enemy when encountered in the maze.
@@ -547,12 +927,15 @@ class Player:
                     elif isinstance(enemy, rpg.enemy.Skeleton):
                         maze.remove_skeleton_position(enemy.position)
                     print("Enemy was defeated.")
+                    hooks.emit("combat", type(enemy).__name__.lower(), True)
             elif action == player.defend:
                 action()
             elif action == enemy.attack:
                 action(player, enemy.attack_power)
                 if player._health <= 0:
                     print("Player was defeated. Game Over!")
+                    hooks.emit("combat", type(enemy).__name__.lower(), False)
+                    hooks.emit("game_over", hooks.LOSS)
                     sys.exit()
             else:
                 print("Invalid action")
@@ -0,0 +1,273 @@
+"""
+Projectiles flying one cell per tick.
+
+The ProjectileSystem of a maze keeps every projectile in flight as a row of
+parallel NumPy arrays: position, step, cells left to fly, damage and owner.
+Every tick advance() moves them all at once and resolves the collisions by
+indexing grids: the BlockMap of the maze for the obstacles and padlocks, and
+occupancy grids of the enemies and of the players, filled once per tick from
+their positions.
+
+A projectile of the player damages the first enemy it flies into, one of an
+enemy the first player. Projectiles stop there, at a blocked cell, at the edge
+of the grid or at the end of their range. As with the other weapons, damage
+that does not kill an enemy is not kept.
+"""
+import numpy as np
+
+from rpg.areaeffect import enemy_positions
+from rpg.enemytable import EnemyTable
+
+# Owner codes
+PLAYER = 0
+ENEMY = 1
+
+_DTYPES = (
+    ("row", np.int64),
+    ("col", np.int64),
+    ("d_row", np.int64),
+    ("d_col", np.int64),
+    ("left", np.int32),
+    ("damage", np.int64),
+    ("owner", np.int8),
+)
+
+
+class ProjectileSystem:
+    """
+    A class representing the projectiles in flight in a maze.
+
+    Attributes:
+        _maze (Maze): The maze.
+        _arrays (dict): name -> array of every field, _count rows in use.
+        _count (int): The number of projectiles in flight.
+        _player_hits (dict): name of a player in maze.chase_names() ->
+            damage dealt to them since the hits were last taken.
+        _enemies_hit (int): The enemies hit since the last report.
+        _enemies_killed (list): The names of the enemies killed since the last report.
+    """
+
+    def __init__(self, maze, capacity=64):
+        """
+        Initialize a system with no projectile.
+
+        Args:
+            maze (Maze): The maze.
+            capacity (int): The number of projectiles allocated ahead.
+        """
+        self._maze = maze
+        self._count = 0
+        self._arrays = {name: np.zeros(max(capacity, 8), dtype=dtype) for name, dtype in _DTYPES}
+        self._player_hits = {}
+        self._enemies_hit = 0
+        self._enemies_killed = []
+
+    def __len__(self):
+        return self._count
+
+    def positions(self, owner=None):
+        """
+        Get the cells of the projectiles in flight.
+
+        Args:
+            owner (int): PLAYER or ENEMY to get the projectiles of one side only.
+
+        Returns:
+            ndarray: (n, 2) rows and columns.
+        """
+        count = self._count
+        cells = np.stack((self._arrays["row"][:count], self._arrays["col"][:count]), axis=1)
+        if owner is None:
+            return cells
+        return cells[self._arrays["owner"][:count] == owner]
+
+    def cells(self):
+        """
+        Get the cells of the projectiles in flight, for drawing.
+
+        Returns:
+            tuple: (list of the cells of the player projectiles, list of the
+            cells of the enemy projectiles), as (row, col) tuples.
+        """
+        return tuple(
+            [tuple(cell) for cell in self.positions(owner).tolist()] for owner in (PLAYER, ENEMY)
+        )
+
+    def fire(self, origins, directions, reach, damage, owner):
+        """
+        Launch projectiles; they move a first cell on the next tick.
+
+        Args:
+            origins (array_like): (n, 2) cells, or one cell, they start from.
+            directions (array_like): (n, 2) steps, or one step, of -1, 0 or 1.
+            reach (int or array_like): The number of cells every projectile flies.
+            damage (int or array_like): The damage every projectile deals.
+            owner (int): PLAYER or ENEMY.
+        """
+        origins = np.asarray(origins, dtype=np.int64).reshape(-1, 2)
+        directions = np.broadcast_to(
+            np.asarray(directions, dtype=np.int64).reshape(-1, 2), origins.shape
+        )
+        added = len(origins)
+        if not added:
+            return
+        self._reserve(self._count + added)
+        new = slice(self._count, self._count + added)
+        values = {
+            "row": origins[:, 0],
+            "col": origins[:, 1],
+            "d_row": directions[:, 0],
+            "d_col": directions[:, 1],
+            "left": reach,
+            "damage": damage,
+            "owner": owner,
+        }
+        for name, value in values.items():
+            self._arrays[name][new] = value
+        self._count += added
+
+    def volley(self, shooters, targets, reach, damage):
+        """
+        Make every shooter in line with a target, within reach, fire at it.
+
+        Args:
+            shooters (array_like): (n, 2) cells of the enemies shooting.
+            targets (array_like): (m, 2) cells of the players.
+            reach (int): The range of the shots.
+            damage (int): The damage of every shot.
+
+        Returns:
+            int: The number of shots fired.
+        """
+        shooters = np.asarray(shooters, dtype=np.int64).reshape(-1, 2)
+        targets = np.asarray(targets, dtype=np.int64).reshape(-1, 2)
+        if not len(shooters) or not len(targets):
+            return 0
+        # (n, m, 2) offsets of every target from every shooter
+        offsets = targets[None, :, :] - shooters[:, None, :]
+        distance = np.abs(offsets).max(axis=2)
+        in_line = (offsets == 0).any(axis=2) & (distance > 0) & (distance <= reach)
+        firing = in_line.any(axis=1)
+        if not firing.any():
+            return 0
+        # the nearest target in line
+        distance = np.where(in_line, distance, reach + 1)
+        nearest = distance[firing].argmin(axis=1)
+        steps = np.sign(offsets[firing, nearest])
+        self.fire(shooters[firing], steps, reach, damage, ENEMY)
+        return int(firing.sum())
+
+    def advance(self):
+        """
+        Move every projectile one cell and resolve the collisions.
+        """
+        count = self._count
+        if not count:
+            return
+        maze = self._maze
+        size = maze.grid_size
+        arrays = self._arrays
+        row = arrays["row"][:count]
+        col = arrays["col"][:count]
+        row += arrays["d_row"][:count]
+        col += arrays["d_col"][:count]
+        arrays["left"][:count] -= 1
+        owner = arrays["owner"][:count]
+
+        flying = (row >= 0) & (row < size) & (col >= 0) & (col < size)
+        flying[flying] = ~maze.block_map().blocked[row[flying], col[flying]]
+        cells = np.where(flying, row * size + col, 0)
+
+        # occupancy grids: index of the enemy and of the player on every cell
+        enemies, skeletons = enemy_positions(maze)
+        enemy_at = np.full(size * size, -1, dtype=np.int64)
+        enemy_at[enemies[:, 0] * size + enemies[:, 1]] = np.arange(len(enemies))
+        players = np.asarray(maze.chase_targets(), dtype=np.int64).reshape(-1, 2)
+        player_at = np.full(size * size, -1, dtype=np.int64)
+        player_at[players[:, 0] * size + players[:, 1]] = np.arange(len(players))
+
+        on_enemy = flying & (enemy_at[cells] >= 0)
+        on_player = flying & (player_at[cells] >= 0)
+        hits_enemy = on_enemy & (owner == PLAYER)
+        hits_player = on_player & (owner == ENEMY)
+        if hits_enemy.any():
+            self._hit_enemies(enemies, skeletons, enemy_at[cells[hits_enemy]], hits_enemy)
+        if hits_player.any():
+            damage = np.bincount(
+                player_at[cells[hits_player]], weights=arrays["damage"][:count][hits_player]
+            )
+            # keyed by name, a player leaving before the hits are taken shifts no other
+            names = maze.chase_names()
+            for index in np.flatnonzero(damage).tolist():
+                name = names[index]
+                self._player_hits[name] = self._player_hits.get(name, 0) + int(damage[index])
+
+        keep = flying & ~on_enemy & ~on_player & (arrays["left"][:count] > 0)
+        kept = int(keep.sum())
+        for array in arrays.values():
+            array[:kept] = array[:count][keep]
+        self._count = kept
+
+    def take_player_hits(self):
+        """
+        Take the damage the projectiles dealt to the players since the last
+        call; hits nobody takes are dropped with the next call.
+
+        Returns:
+            dict: name of the player in maze.chase_names() -> damage.
+        """
+        hits = self._player_hits
+        self._player_hits = {}
+        return hits
+
+    def take_report(self):
+        """
+        Get what the projectiles of the player did since the last report.
+
+        Returns:
+            tuple: (number of enemies hit, names of the enemies killed).
+        """
+        report = (self._enemies_hit, self._enemies_killed)
+        self._enemies_hit = 0
+        self._enemies_killed = []
+        return report
+
+    def _hit_enemies(self, enemies, skeletons, targets, hits):
+        """
+        Damage the enemies hit by projectiles and remove the ones killed.
+
+        Args:
+            enemies (ndarray): (n, 2) positions, the skeletons then the dragons.
+            skeletons (int): The number of skeletons.
+            targets (ndarray): The enemy index hit by every hitting projectile.
+            hits (ndarray): The mask of the hitting projectiles.
+        """
+        unique, rows = np.unique(targets, return_inverse=True)
+        hit = enemies[unique].tolist()
+        split = int(np.searchsorted(unique, skeletons))
+        table = EnemyTable.from_positions(
+            self._maze,
+            [tuple(position) for position in hit[:split]],
+            [tuple(position) for position in hit[split:]],
+        )
+        # every projectile is stopped by the shield on its own
+        taken = self._arrays["damage"][:self._count][hits] - table.shield[rows]
+        np.subtract.at(table.health, rows, taken)
+        killed = table.compact()
+        self._maze.remove_enemies(zip(killed["row"].tolist(), killed["col"].tolist()))
+        self._enemies_hit += len(unique)
+        self._enemies_killed.extend(killed["names"].tolist())
+
+    def _reserve(self, count):
+        """
+        Grow the arrays to hold a number of projectiles.
+        """
+        capacity = len(self._arrays["row"])
+        if count <= capacity:
+            return
+        while capacity < count:
+            capacity *= 2
+        for name, array in self._arrays.items():
+            grown = np.zeros(capacity, dtype=array.dtype)
+            grown[:self._count] = array[:self._count]
+            self._arrays[name] = grown
@@ -0,0 +1,425 @@
+"""
+Compact binary protocol for remote maze viewers.
+
+Instead of a printed frame after every command, the server sends a full
+snapshot when the client connects and then one diff per turn: the changed cells,
+the player pose, health and inventory counters. Only the cells the turn wrote
+to are encoded, as recorded by the DirtyGrid of the session maze. Cells travel as one-byte codes
+of a palette of emojis that grows as new emojis appear.
+
+Every message starts with a header: type (1 byte), sequence number (4 bytes)
+and payload length (4 bytes), big-endian. Sequence numbers increase by one per
+message; a client that sees a gap (e.g. a diff dropped for a slow connection)
+asks for a new snapshot by sending the line "resync".
+
+Run `python -m rpg.protocol` to play random commands through a loopback client
+and compare its copy of the maze with the server's.
+"""
+import argparse
+import asyncio
+import random
+import struct
+
+import rpg.item as item
+from rpg.player import Direction
+
+# Message types
+SNAPSHOT = 1
+DIFF = 2
+TEXT = 3
+
+# Line a client sends to get a new snapshot
+RESYNC = "resync"
+
+_HEADER = struct.Struct("!BII")
+_SIZE = struct.Struct("!H")
+_COUNT = struct.Struct("!H")
+_CELL = struct.Struct("!HHB")
+# row, col, facing, health, keys, arrows, gems
+_POSE = struct.Struct("!HHBiHHH")
+_DIRECTIONS = list(Direction)
+
+
+class FrameEncoder:
+    """
+    A class representing the server side of the protocol for one client.
+
+    Attributes:
+        _palette (dict): emoji -> code of every emoji sent so far.
+        _new_emojis (list): Emojis added to the palette since the last message.
+        _cells (bytearray): The cell codes the client has, row by row.
+        _seq (int): The sequence number of the last message.
+    """
+
+    def __init__(self):
+        """
+        Initialize the encoder; nothing is sent before the first snapshot.
+        """
+        self._palette = {}
+        self._new_emojis = []
+        self._cells = None
+        self._seq = 0
+
+    @property
+    def seq(self):
+        """
+        The sequence number of the last message.
+        """
+        return self._seq
+
+    def snapshot(self, maze, player):
+        """
+        Encode the whole maze, the palette and the player pose.
+
+        Args:
+            maze (Maze): The maze of the client.
+            player (Player): The player of the client.
+
+        Returns:
+            bytes: The message.
+        """
+        size = maze.grid_size
+        self._cells = bytearray(size * size)
+        for row_index, row in enumerate(maze.grid):
+            start = row_index * size
+            self._cells[start:start + size] = bytes(self._code(cell) for cell in row)
+        # the snapshot carries the whole palette
+        self._new_emojis = list(self._palette)
+        payload = b"".join(
+            (
+                _SIZE.pack(size),
+                self._palette_block(),
+                bytes(self._cells),
+                self._pose(maze, player),
+            )
+        )
+        return self._message(SNAPSHOT, payload)
+
+    def diff(self, maze, player, dirty=None):
+        """
+        Encode the cells changed since the last message and the player pose.
+
+        Args:
+            maze (Maze): The maze of the client.
+            player (Player): The player of the client.
+            dirty (set): The cells written since the last message, from
+                SessionMaze.take_dirty(); None to compare the whole grid.
+
+        Returns:
+            bytes: The message.
+        """
+        size = maze.grid_size
+        grid = maze.grid
+        cells = self._cells
+        if dirty is None:
+            dirty = [(row, col) for row in range(size) for col in range(size)]
+        changed = []
+        for row, col in sorted(dirty):
+            code = self._code(grid[row][col])
+            if cells[row * size + col] != code:
+                cells[row * size + col] = code
+                changed.append(_CELL.pack(row, col, code))
+        payload = b"".join(
+            (
+                self._palette_block(),
+                _COUNT.pack(len(changed)),
+                b"".join(changed),
+                self._pose(maze, player),
+            )
+        )
+        return self._message(DIFF, payload)
+
+    def text(self, text):
+        """
+        Encode the text printed by a command.
+
+        Args:
+            text (str): The text.
+
+        Returns:
+            bytes: The message.
+        """
+        return self._message(TEXT, text.encode())
+
+    def _code(self, emoji):
+        """
+        Get the palette code of an emoji, adding it if it is new.
+
+        Args:
+            emoji (str): The content of a cell.
+
+        Returns:
+            int: The code.
+        """
+        code = self._palette.get(emoji)
+        if code is None:
+            code = len(self._palette)
+            if code > 255:
+                raise ValueError("more than 256 different cell contents")
+            self._palette[emoji] = code
+            self._new_emojis.append(emoji)
+        return code
+
+    def _palette_block(self):
+        """
+        Encode the emojis added to the palette since the last message.
+
+        Returns:
+            bytes: The count followed by the length-prefixed emojis.
+        """
+        parts = [bytes((len(self._new_emojis),))]
+        for emoji in self._new_emojis:
+            data = emoji.encode()
+            parts.append(bytes((len(data),)) + data)
+        self._new_emojis = []
+        return b"".join(parts)
+
+    def _pose(self, maze, player):
+        """
+        Encode the player pose, health and inventory counters.
+
+        Returns:
+            bytes: The pose.
+        """
+        row, col = maze.player_position
+        inventory = player.inventory
+        return _POSE.pack(
+            row,
+            col,
+            _DIRECTIONS.index(player.direction),
+            player.health,
+            inventory.get(item.Category.KEY, 0),
+            inventory.get(item.Category.ARROW, 0),
+            inventory.get(item.Category.GEM, 0),
+        )
+
+    def _message(self, kind, payload):
+        """
+        Add the header to a payload.
+
+        Args:
+            kind (int): The message type.
+            payload (bytes): The payload.
+
+        Returns:
+            bytes: The message.
+        """
+        self._seq += 1
+        return _HEADER.pack(kind, self._seq, len(payload)) + payload
+
+
+class FrameDecoder:
+    """
+    A class representing the client side of the protocol.
+
+    Attributes:
+        size (int): The grid size, None before the first snapshot.
+        grid (list): The rows of the maze, lists of emojis.
+        pose (dict): position, direction, health, keys, arrows and gems.
+        texts (list): The texts received.
+        seq (int): The sequence number of the last message applied.
+        out_of_sync (bool): Whether a gap was seen; diffs are ignored until the
+            next snapshot.
+    """
+
+    def __init__(self):
+        """
+        Initialize a decoder waiting for its first snapshot.
+        """
+        self.size = None
+        self.grid = []
+        self.pose = {}
+        self.texts = []
+        self.seq = 0
+        self.out_of_sync = True
+        self._palette = []
+        self._buffer = b""
+
+    def feed(self, data):
+        """
+        Apply the complete messages of the received bytes.
+
+        Args:
+            data (bytes): Bytes read from the server, possibly cut anywhere.
+
+        Returns:
+            bool: True if a gap was seen and a resync should be asked.
+        """
+        self._buffer += data
+        gap = False
+        while len(self._buffer) >= _HEADER.size:
+            kind, seq, length = _HEADER.unpack_from(self._buffer)
+            end = _HEADER.size + length
+            if len(self._buffer) < end:
+                break
+            payload = self._buffer[_HEADER.size:end]
+            self._buffer = self._buffer[end:]
+            if kind == SNAPSHOT:
+                self._apply_snapshot(payload)
+                self.out_of_sync = False
+            else:
+                if seq != self.seq + 1 and not self.out_of_sync:
+                    self.out_of_sync = True
+                    gap = True
+                if kind == TEXT:
+                    self.texts.append(payload.decode())
+                elif kind == DIFF and not self.out_of_sync:
+                    self._apply_diff(payload)
+            self.seq = seq
+        return gap
+
+    def _read_palette(self, payload, offset):
+        """
+        Add the emojis of a palette block.
+
+        Returns:
+            int: The offset after the block.
+        """
+        count = payload[offset]
+        offset += 1
+        for _ in range(count):
+            length = payload[offset]
+            self._palette.append(payload[offset + 1:offset + 1 + length].decode())
+            offset += 1 + length
+        return offset
+
+    def _read_pose(self, payload, offset):
+        """
+        Read the pose at the end of a message.
+        """
+        row, col, facing, health, keys, arrows, gems = _POSE.unpack_from(payload, offset)
+        self.pose = {
+            "position": (row, col),
+            "direction": _DIRECTIONS[facing],
+            "health": health,
+            "keys": keys,
+            "arrows": arrows,
+            "gems": gems,
+        }
+
+    def _apply_snapshot(self, payload):
+        """
+        Replace the maze with a snapshot.
+        """
+        (self.size,) = _SIZE.unpack_from(payload)
+        self._palette = []
+        offset = self._read_palette(payload, _SIZE.size)
+        size = self.size
+        self.grid = [
+            [self._palette[code] for code in payload[offset + row * size:offset + (row + 1) * size]]
+            for row in range(size)
+        ]
+        self._read_pose(payload, offset + size * size)
+
+    def _apply_diff(self, payload):
+        """
+        Apply the changed cells of a diff.
+        """
+        offset = self._read_palette(payload, 0)
+        (count,) = _COUNT.unpack_from(payload, offset)
+        offset += _COUNT.size
+        for _ in range(count):
+            row, col, code = _CELL.unpack_from(payload, offset)
+            self.grid[row][col] = self._palette[code]
+            offset += _CELL.size
+        self._read_pose(payload, offset)
+
+
+async def read_message(reader):
+    """
+    Read one whole message from a stream.
+
+    Args:
+        reader (StreamReader): The stream.
+
+    Returns:
+        tuple: (type, bytes of the message), None at the end of the stream.
+    """
+    try:
+        header = await reader.readexactly(_HEADER.size)
+        kind, _, length = _HEADER.unpack(header)
+        return kind, header + await reader.readexactly(length)
+    except asyncio.IncompleteReadError:
+        return None
+
+
+async def loopback(commands, drop_every=0, seed=0):
+    """
+    Play random commands on a local binary server and check the client copy.
+
+    Args:
+        commands (int): The number of commands to play.
+        drop_every (int): Drop one diff in this many on the client side, to
+            exercise resyncs; 0 to keep them all.
+        seed (int): Seed of the random commands.
+
+    Returns:
+        dict: Bytes received, resyncs and whether the copies matched every turn.
+    """
+    # the server imports this module
+    from rpg.server import GameServer
+
+    server = GameServer(binary=True)
+    listener = await server.start(port=0)
+    port = listener.sockets[0].getsockname()[1]
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    decoder = FrameDecoder()
+    rng = random.Random(seed)
+    result = {"commands": 0, "received": 0, "resyncs": 0, "matched": True}
+    diffs = 0
+    try:
+        while decoder.out_of_sync:
+            kind, message = await read_message(reader)
+            result["received"] += len(message)
+            decoder.feed(message)
+        session = next(iter(server.active_sessions))
+        for _ in range(commands):
+            writer.write((rng.choice("wwwsadkp") + "\n").encode())
+            await writer.drain()
+            result["commands"] += 1
+            texts = len(decoder.texts)
+            # every command is answered by a diff and a text
+            while len(decoder.texts) == texts or decoder.out_of_sync:
+                received = await read_message(reader)
+                if received is None:
+                    # the game is over
+                    return result
+                kind, message = received
+                result["received"] += len(message)
+                if kind == DIFF:
+                    diffs += 1
+                    if drop_every and diffs % drop_every == 0:
+                        continue
+                if decoder.feed(message):
+                    result["resyncs"] += 1
+                    writer.write((RESYNC + "\n").encode())
+                    await writer.drain()
+            if decoder.grid != [list(row) for row in session.maze.grid] or (
+                decoder.pose["health"] != session.player.health
+                or decoder.pose["position"] != tuple(session.maze.player_position)
+            ):
+                result["matched"] = False
+    finally:
+        writer.close()
+        await writer.wait_closed()
+        # let the server end the session before the loop stops
+        while server.active_sessions:
+            await asyncio.sleep(0.01)
+        listener.close()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Loopback test of the binary protocol")
+    parser.add_argument("--commands", type=int, default=200)
+    parser.add_argument("--drop-every", type=int, default=7, help="0 to drop no diff")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    result = asyncio.run(loopback(args.commands, args.drop_every, args.seed))
+    print(
+        f"{result['commands']} commands, {result['received']} bytes received, "
+        f"{result['resyncs']} resyncs, copies matched: {result['matched']}"
+    )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,373 @@
+"""
+Compact binary saved games.
+
+A saved game holds the whole live state: the grid, every position list, the
+spawn of the enemies that moved, the pending respawns and relocks, the player
+pose, health and inventory, and the maze settings and emojis. Loading it builds
+the Maze and the Player straight from the packed arrays without parsing YAML.
+
+Layout, little-endian: the magic b"RWA3SAVE" and a version, then a string
+table, the settings, the grid as string codes, the position lists as flat
+(row, col) arrays, the moved enemies, the player and the pending events.
+Enemies get their stats from the YAML file of the maze when they fight, as in
+a new game, so they have no live health to save. Projectiles in flight are not
+saved either.
+"""
+import os.path
+import struct
+import sys
+from array import array
+
+from rpg.item import Category, ItemRegistry
+from rpg.maze import Maze
+from rpg.player import Direction, Player
+from rpg.scheduler import Scheduler
+
+MAGIC = b"RWA3SAVE"
+VERSION = 3
+
+_HEADER = struct.Struct("<8sH")
+_COUNT = struct.Struct("<I")
+# grid size, arrow damage, heart boost, heart respawn, padlock relock, enemy chase,
+# enemy move every, fog radius, bomb damage, bomb radius, spell damage, spell
+# range, arrow flight, ranged every, ranged range, ranged damage; -1 stands for None
+_SETTINGS = struct.Struct("<HiiiiBHiiiiiBiii")
+# name, health, direction, attack power, row, col
+_PLAYER = struct.Struct("<IiBiHH")
+_INVENTORY_ITEM = struct.Struct("<Bi")
+_EVENT = struct.Struct("<IBHH")
+
+# The position lists of a maze, in file order
+_POSITIONS = (
+    "_obstacle_positions",
+    "_gem_positions",
+    "_key_positions",
+    "_arrow_positions",
+    "_heart_positions",
+    "_padlock_positions",
+    "_skeleton_positions",
+    "_dragon_positions",
+    "_bomb_positions",
+    "_spell_positions",
+)
+# The emojis of a maze, in file order
+_EMOJIS = (
+    "_obstacle_emoji",
+    "_gem_emoji",
+    "_key_emoji",
+    "_arrow_emoji",
+    "_heart_emoji",
+    "_padlock_emoji",
+    "_skeleton_emoji",
+    "_dragon_emoji",
+    "_player_emoji",
+    "_bomb_emoji",
+    "_spell_emoji",
+)
+# The maze methods a saved event can call, by code
+_EVENTS = ("respawn_heart", "relock_padlock")
+_DIRECTIONS = list(Direction)
+# The chase modes of the enemies, by code
+_CHASES = (False, True, "path")
+_PLAYER_EMOJIS = ("up", "down", "left", "right")
+
+
+def save_path(config_path):
+    """
+    Get the saved game file that goes with a maze YAML file.
+
+    Args:
+        config_path (str): The maze YAML file.
+
+    Returns:
+        str: The path of the saved game.
+    """
+    return os.path.splitext(config_path)[0] + ".sav"
+
+
+def save_game(path, player, maze):
+    """
+    Write the live state of a game.
+
+    Args:
+        path (str): The file to write.
+        player (Player): The player.
+        maze (Maze): The maze the player is on.
+    """
+    strings = _StringTable()
+    size = maze.grid_size
+    ranged_every, ranged_range, ranged_damage = maze.ranged
+    grid = array("H", [strings.code(cell) for row in maze.grid for cell in row])
+
+    parts = [
+        _pack_optional(maze.file_path, strings),
+        _SETTINGS.pack(
+            size,
+            _none_to(maze.arrow_damage),
+            _none_to(maze.heart_boost),
+            _none_to(maze.heart_respawn),
+            _none_to(maze.padlock_relock),
+            _CHASES.index("path" if maze.enemy_chase == "path" else bool(maze.enemy_chase)),
+            maze.enemy_move_every,
+            _none_to(maze.fog_radius),
+            _none_to(maze.bomb_damage),
+            _none_to(maze.bomb_radius),
+            _none_to(maze.spell_damage),
+            _none_to(maze.spell_range),
+            bool(maze.arrow_flight),
+            _none_to(ranged_every),
+            _none_to(ranged_range),
+            _none_to(ranged_damage),
+        ),
+        array("H", [strings.code(getattr(maze, name)) for name in _EMOJIS]),
+        grid,
+    ]
+    for name in _POSITIONS:
+        positions = getattr(maze, name)
+        parts.append(_COUNT.pack(len(positions)))
+        parts.append(array("H", [value for position in positions for value in position]))
+    parts.append(_COUNT.pack(len(maze.enemy_spawns)))
+    parts.append(
+        array(
+            "H",
+            [
+                value
+                for position, spawn in maze.enemy_spawns.items()
+                for value in position + spawn
+            ],
+        )
+    )
+
+    row, col = maze.player_position
+    parts.append(
+        _PLAYER.pack(
+            strings.code(player.name),
+            player.health,
+            _DIRECTIONS.index(player.direction),
+            player.attack_power,
+            row,
+            col,
+        )
+    )
+    parts.append(
+        array("H", [strings.code(Player._emoji.get(key, "")) for key in _PLAYER_EMOJIS])
+    )
+    parts.append(bytes((len(player.inventory),)))
+    for category, count in player.inventory.items():
+        parts.append(_INVENTORY_ITEM.pack(category.value, count))
+
+    events = [
+        event
+        for event in maze.scheduler.pending()
+        if getattr(event.callback, "__name__", None) in _EVENTS
+        and getattr(event.callback, "__self__", None) is maze
+    ]
+    parts.append(_COUNT.pack(maze.scheduler.tick))
+    parts.append(_COUNT.pack(len(events)))
+    for event in events:
+        position = event.args[0]
+        parts.append(
+            _EVENT.pack(event.tick, _EVENTS.index(event.callback.__name__), *position)
+        )
+
+    with open(path, "wb") as file:
+        file.write(_HEADER.pack(MAGIC, VERSION))
+        file.write(strings.pack())
+        for part in parts:
+            if isinstance(part, array):
+                if sys.byteorder != "little":
+                    part.byteswap()
+                part = part.tobytes()
+            file.write(part)
+
+
+def load_game(path):
+    """
+    Read a saved game.
+
+    Args:
+        path (str): The file to read.
+
+    Returns:
+        tuple: (Player, Maze) as they were saved.
+
+    Raises:
+        ValueError: If the file is not a saved game of this version.
+    """
+    with open(path, "rb") as file:
+        data = file.read()
+    reader = _Reader(data)
+    magic, version = reader.unpack(_HEADER)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a saved game")
+    if version != VERSION:
+        raise ValueError(f"{path} is a saved game of version {version}, not {VERSION}")
+    strings = reader.strings()
+
+    maze = Maze.__new__(Maze)
+    state = {"_file_path": reader.optional(strings)}
+    (
+        size,
+        arrow_damage,
+        heart_boost,
+        heart_respawn,
+        padlock_relock,
+        enemy_chase,
+        enemy_move_every,
+        fog_radius,
+        bomb_damage,
+        bomb_radius,
+        spell_damage,
+        spell_range,
+        arrow_flight,
+        ranged_every,
+        ranged_range,
+        ranged_damage,
+    ) = reader.unpack(_SETTINGS)
+    state.update(
+        _grid_size=size,
+        _arrow_damage=_to_none(arrow_damage),
+        _heart_boost=_to_none(heart_boost),
+        _heart_respawn=_to_none(heart_respawn),
+        _padlock_relock=_to_none(padlock_relock),
+        _enemy_chase=_CHASES[enemy_chase],
+        _enemy_move_every=enemy_move_every,
+        _fog_radius=_to_none(fog_radius),
+        _bomb_damage=_to_none(bomb_damage),
+        _bomb_radius=_to_none(bomb_radius),
+        _spell_damage=_to_none(spell_damage),
+        _spell_range=_to_none(spell_range),
+        _arrow_flight=bool(arrow_flight),
+        _ranged_every=_to_none(ranged_every),
+        _ranged_range=_to_none(ranged_range),
+        _ranged_damage=_to_none(ranged_damage),
+    )
+    for name, code in zip(_EMOJIS, reader.array("H", len(_EMOJIS))):
+        state[name] = strings[code]
+    cells = [strings[code] for code in reader.array("H", size * size)]
+    state["_grid"] = [cells[row * size:(row + 1) * size] for row in range(size)]
+    for name in _POSITIONS:
+        (count,) = reader.unpack(_COUNT)
+        values = reader.array("H", 2 * count)
+        state[name] = list(zip(values[0::2], values[1::2]))
+    (count,) = reader.unpack(_COUNT)
+    values = reader.array("H", 4 * count)
+    state["_enemy_spawns"] = {
+        (values[i], values[i + 1]): (values[i + 2], values[i + 3])
+        for i in range(0, len(values), 4)
+    }
+
+    name, health, direction, attack_power, row, col = reader.unpack(_PLAYER)
+    state["_player_position"] = (row, col)
+    for key, code in zip(_PLAYER_EMOJIS, reader.array("H", len(_PLAYER_EMOJIS))):
+        Player._emoji[key] = strings[code]
+    inventory = {}
+    for _ in range(reader.byte()):
+        category, item_count = reader.unpack(_INVENTORY_ITEM)
+        inventory[Category(category)] = item_count
+    player = Player(
+        strings[name], health, [row, col], _DIRECTIONS[direction], attack_power, inventory
+    )
+
+    (tick,) = reader.unpack(_COUNT)
+    state.update(
+        _obstacle_listeners=[],
+        _scheduler=Scheduler(tick),
+        _fov=None,
+        _block_map=None,
+        _projectiles=None,
+    )
+    vars(maze).update(state)
+    maze._items = ItemRegistry.from_items(maze.collect_items())
+    (count,) = reader.unpack(_COUNT)
+    for _ in range(count):
+        event_tick, kind, event_row, event_col = reader.unpack(_EVENT)
+        maze.scheduler.schedule(
+            event_tick - tick, getattr(maze, _EVENTS[kind]), (event_row, event_col)
+        )
+    maze.start_systems()
+    return player, maze
+
+
+class _StringTable:
+    """
+    The strings of a saved game, each written once and referred to by code.
+    """
+
+    def __init__(self):
+        self._codes = {}
+
+    def code(self, string):
+        """
+        Get the code of a string, adding it if it is new.
+        """
+        code = self._codes.get(string)
+        if code is None:
+            code = self._codes[string] = len(self._codes)
+        return code
+
+    def pack(self):
+        """
+        Encode the table: a count, then every string with its length.
+        """
+        parts = [_COUNT.pack(len(self._codes))]
+        for string in self._codes:
+            data = string.encode()
+            parts.append(_COUNT.pack(len(data)) + data)
+        return b"".join(parts)
+
+
+class _Reader:
+    """
+    A cursor over the bytes of a saved game.
+    """
+
+    def __init__(self, data):
+        self._data = data
+        self._offset = 0
+
+    def unpack(self, layout):
+        values = layout.unpack_from(self._data, self._offset)
+        self._offset += layout.size
+        return values
+
+    def byte(self):
+        self._offset += 1
+        return self._data[self._offset - 1]
+
+    def array(self, typecode, count):
+        values = array(typecode)
+        end = self._offset + count * values.itemsize
+        values.frombytes(self._data[self._offset:end])
+        if sys.byteorder != "little":
+            values.byteswap()
+        self._offset = end
+        return values
+
+    def strings(self):
+        (count,) = self.unpack(_COUNT)
+        strings = []
+        for _ in range(count):
+            (length,) = self.unpack(_COUNT)
+            strings.append(self._data[self._offset:self._offset + length].decode())
+            self._offset += length
+        return strings
+
+    def optional(self, strings):
+        (code,) = self.unpack(_COUNT)
+        return None if code == 0 else strings[code - 1]
+
+
+def _pack_optional(string, strings):
+    """
+    Encode a string that may be None; 0 stands for None.
+    """
+    return _COUNT.pack(0 if string is None else strings.code(string) + 1)
+
+
+def _none_to(value):
+    return -1 if value is None else value
+
+
+def _to_none(value):
+    return None if value == -1 else value
@@ -0,0 +1,158 @@
+"""
+Tick scheduler for timed events in the maze.
+
+Events are kept in a heap ordered by the tick they are due, so advancing the
+clock only touches the events that are due and never polls every entity.
+"""
+import heapq
+
+from rpg import hooks
+
+
+class ScheduledEvent:
+    """
+    A class representing a callback scheduled on the tick clock.
+
+    Attributes:
+        tick (int): The tick the event is due.
+        callback (callable): The function to call.
+        args (tuple): The arguments passed to the callback.
+        period (int): The number of ticks between two runs, None for a one-shot event.
+        cancelled (bool): Whether the event was cancelled.
+    """
+
+    def __init__(self, tick, callback, args, period=None):
+        """
+        Initialize the event.
+
+        Args:
+            tick (int): The tick the event is due.
+            callback (callable): The function to call.
+            args (tuple): The arguments passed to the callback.
+            period (int): The number of ticks between two runs, None for a one-shot event.
+        """
+        self.tick = tick
+        self.callback = callback
+        self.args = args
+        self.period = period
+        self.cancelled = False
+
+
+class Scheduler:
+    """
+    A class representing the tick clock of a maze.
+
+    Attributes:
+        _tick (int): The current tick.
+        _queue (list): Heap of (tick, sequence, event).
+        _sequence (int): The number of events pushed, the tie breaker keeping events
+            due on the same tick in FIFO order.
+    """
+
+    def __init__(self, tick=0):
+        """
+        Initialize the scheduler.
+
+        Args:
+            tick (int): The starting tick, e.g. of a saved game.
+        """
+        self._tick = tick
+        self._queue = []
+        # a plain int, since schedulers are pickled and deep-copied
+        self._sequence = 0
+
+    @property
+    def tick(self):
+        """
+        The current tick.
+        """
+        return self._tick
+
+    def __len__(self):
+        """
+        The number of pending events, including cancelled ones not yet discarded.
+        """
+        return len(self._queue)
+
+    def schedule(self, delay, callback, *args):
+        """
+        Run a callback once after a number of ticks.
+
+        Args:
+            delay (int): The number of ticks to wait, at least 1.
+            callback (callable): The function to call.
+            *args: The arguments passed to the callback.
+
+        Returns:
+            ScheduledEvent: The event, which can be cancelled.
+        """
+        event = ScheduledEvent(self._tick + max(delay, 1), callback, args)
+        self._push(event)
+        return event
+
+    def schedule_every(self, period, callback, *args):
+        """
+        Run a callback every period ticks.
+
+        Args:
+            period (int): The number of ticks between two runs, at least 1.
+            callback (callable): The function to call.
+            *args: The arguments passed to the callback.
+
+        Returns:
+            ScheduledEvent: The event, which can be cancelled.
+        """
+        period = max(period, 1)
+        event = ScheduledEvent(self._tick + period, callback, args, period)
+        self._push(event)
+        return event
+
+    def pending(self):
+        """
+        Get the events not run nor cancelled yet.
+
+        Returns:
+            list: The events, in the order they are due.
+        """
+        return [event for _, _, event in sorted(self._queue) if not event.cancelled]
+
+    @staticmethod
+    def cancel(event):
+        """
+        Cancel an event. It is discarded lazily when it reaches the top of the heap.
+
+        Args:
+            event (ScheduledEvent): The event to cancel.
+        """
+        event.cancelled = True
+
+    @hooks.phase("scheduler")
+    def advance(self):
+        """
+        Move the clock one tick forward and run the events due.
+
+        Returns:
+            int: The number of callbacks run.
+        """
+        self._tick += 1
+        ran = 0
+        while self._queue and self._queue[0][0] <= self._tick:
+            _, _, event = heapq.heappop(self._queue)
+            if event.cancelled:
+                continue
+            event.callback(*event.args)
+            ran += 1
+            if event.period is not None and not event.cancelled:
+                event.tick += event.period
+                self._push(event)
+        return ran
+
+    def _push(self, event):
+        """
+        Add an event to the heap.
+
+        Args:
+            event (ScheduledEvent): The event to add.
+        """
+        self._sequence += 1
+        heapq.heappush(self._queue, (event.tick, self._sequence, event))
@@ -0,0 +1,428 @@
+"""
+Asyncio server hosting many independent maze sessions on one process.
+
+Every connection plays its own game with a line-based protocol: the client sends
+one command per line (the commands of Player.start) and receives the text the
+game printed, followed by a prompt line. The session ends on quit, win or loss.
+
+The maze YAML file is parsed once into a shared template; every session only
+stores its own changes on it, so accepting a connection does no file access and
+costs little memory. Commands are short and synchronous, so they run directly
+on the event loop and their prints are captured per command.
+
+In binary mode the server sends the messages of rpg.protocol instead of
+printed frames: a snapshot on connect, then a diff and the printed text per
+command. A client that missed a diff sends the line "resync".
+
+In shared mode all the clients play in one maze instead (see rpg.multiplayer).
+The server sends JSON lines: a snapshot when the client joins, then after every
+tick the delta of the maze and the text printed by the client's own command.
+"""
+import argparse
+import asyncio
+import contextlib
+import copy
+import io
+import json
+
+from rpg.player import Player, command_menu
+from rpg.maze import file_path
+from rpg.session import MazeTemplate
+from rpg.multiplayer import SharedGame
+from rpg.protocol import FrameEncoder, RESYNC
+from rpg import hooks, stats
+
+PROMPT = "> "
+_BACKLOG = 4096
+_MENU = "commands: " + command_menu(", ")
+# Seconds between two ticks of a shared game
+_TICK_INTERVAL = 0.1
+# Clients whose unsent output grows past this are too slow and are dropped
+_MAX_WRITE_BUFFER = 1 << 20
+
+
+class GameSession:
+    """
+    A class representing the game of one client.
+
+    Attributes:
+        _maze (Maze): The maze of the session.
+        _player (Player): The player of the session.
+        _finished (bool): Whether the game is over.
+    """
+
+    def __init__(self, maze, player):
+        """
+        Initialize a session.
+
+        Args:
+            maze (Maze): The maze of the session, owned by it.
+            player (Player): The player of the session, owned by it.
+        """
+        self._maze = maze
+        self._player = player
+        self._finished = False
+
+    @property
+    def maze(self):
+        """
+        The maze of the session.
+        """
+        return self._maze
+
+    @property
+    def player(self):
+        """
+        The player of the session.
+        """
+        return self._player
+
+    @property
+    def finished(self):
+        """
+        Whether the game is over.
+        """
+        return self._finished
+
+    def render(self):
+        """
+        Get the current maze frame.
+
+        Returns:
+            str: The text printed by print_maze.
+        """
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            self._maze.print_maze()
+        return output.getvalue()
+
+    def handle(self, action):
+        """
+        Run one command and capture what the game printed.
+
+        Args:
+            action (str): The command.
+
+        Returns:
+            str: The text printed by the command.
+        """
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            try:
+                with hooks.turn(self):
+                    self._maze = self._player.handle_commands(action, self._maze)
+            except SystemExit:
+                # quit, win and loss all exit the game
+                self._finished = True
+        return output.getvalue()
+
+
+class GameServer:
+    """
+    A class representing the server of the maze sessions.
+
+    Attributes:
+        _template (MazeTemplate): The static parts of the maze, shared by the sessions.
+        _player (Player): The parsed player every session starts from.
+        _sessions (int): The number of sessions being played.
+        _active (set): The sessions being played, outside shared mode.
+        _binary (bool): Whether the clients get the binary protocol.
+        _game (SharedGame): The game of all the clients in shared mode, else None.
+        _writers (dict): name -> output of every client of the shared game.
+        _tick_interval (float): Seconds between two ticks of the shared game.
+    """
+
+    def __init__(
+        self, path=file_path, shared=False, tick_interval=_TICK_INTERVAL, binary=False
+    ):
+        """
+        Initialize the server, parsing the maze YAML file once.
+
+        Args:
+            path (str): The maze YAML file.
+            shared (bool): Whether all the clients play in one maze.
+            tick_interval (float): Seconds between two ticks of the shared game.
+            binary (bool): Whether the clients get the binary protocol, outside shared mode.
+        """
+        self._template = MazeTemplate(path)
+        self._player = Player.extract_player(path)
+        self._sessions = 0
+        self._active = set()
+        self._binary = binary
+        self._game = SharedGame(self._template, self._player) if shared else None
+        self._writers = {}
+        self._tick_interval = tick_interval
+        self._ticker = None
+
+    @property
+    def sessions(self):
+        """
+        The number of sessions being played.
+        """
+        return self._sessions
+
+    @property
+    def active_sessions(self):
+        """
+        The sessions being played, outside shared mode.
+        """
+        return self._active
+
+    def new_session(self):
+        """
+        Start a new game.
+
+        Returns:
+            GameSession: The session, independent from all the others.
+        """
+        return GameSession(self._template.new_session(), copy.deepcopy(self._player))
+
+    async def serve_client(self, reader, writer):
+        """
+        Play one session with a connected client.
+
+        Args:
+            reader (StreamReader): The client input.
+            writer (StreamWriter): The client output.
+        """
+        session = self.new_session()
+        self._sessions += 1
+        self._active.add(session)
+        try:
+            if self._binary:
+                await self._play_binary(session, reader, writer)
+            else:
+                await self._play_text(session, reader, writer)
+        except ConnectionError:
+            pass
+        finally:
+            self._sessions -= 1
+            self._active.discard(session)
+            # a client that disconnected mid-game
+            hooks.end_game(session)
+            writer.close()
+            with contextlib.suppress(ConnectionError):
+                await writer.wait_closed()
+
+    async def _play_text(self, session, reader, writer):
+        """
+        Play a session with printed frames.
+
+        Args:
+            session (GameSession): The session.
+            reader (StreamReader): The client input.
+            writer (StreamWriter): The client output.
+        """
+        writer.write((session.render() + _MENU + "\n" + PROMPT).encode())
+        await writer.drain()
+        while not session.finished:
+            action = await _read_command(reader)
+            if action is None:
+                break
+            output = session.handle(action)
+            if not session.finished:
+                output += PROMPT
+            writer.write(output.encode())
+            await writer.drain()
+
+    async def _play_binary(self, session, reader, writer):
+        """
+        Play a session with the binary protocol.
+
+        Args:
+            session (GameSession): The session.
+            reader (StreamReader): The client input.
+            writer (StreamWriter): The client output.
+        """
+        session.maze.set_quiet(True)
+        session.maze.track_dirty()
+        encoder = FrameEncoder()
+        writer.write(encoder.snapshot(session.maze, session.player))
+        session.maze.take_dirty()
+        await writer.drain()
+        while not session.finished:
+            action = await _read_command(reader)
+            if action is None:
+                break
+            if action == RESYNC:
+                writer.write(encoder.snapshot(session.maze, session.player))
+                session.maze.take_dirty()
+                await writer.drain()
+                continue
+            output = session.handle(action)
+            diff = encoder.diff(session.maze, session.player, session.maze.take_dirty())
+            # a client that does not keep up misses the diff, and resyncs when it
+            # sees the gap; only then wait for its output to be sent
+            if writer.transport.get_write_buffer_size() > _MAX_WRITE_BUFFER:
+                writer.write(encoder.text(output))
+                await writer.drain()
+            else:
+                writer.write(diff)
+                writer.write(encoder.text(output))
+
+    async def serve_shared_client(self, reader, writer):
+        """
+        Add a connected client to the shared game and queue its commands.
+
+        Args:
+            reader (StreamReader): The client input.
+            writer (StreamWriter): The client output.
+        """
+        name = self._game.join()
+        if name is None:
+            writer.write(_message({"type": "full"}))
+            writer.close()
+            return
+        self._writers[name] = writer
+        self._sessions += 1
+        try:
+            snapshot = self._game.snapshot()
+            snapshot["you"] = name
+            writer.write(_message(snapshot))
+            await writer.drain()
+            while name in self._writers:
+                action = await _read_command(reader)
+                if action is None:
+                    break
+                self._game.submit(name, action)
+        except ConnectionError:
+            pass
+        finally:
+            self._sessions -= 1
+            self._game.leave(name)
+            self._writers.pop(name, None)
+            writer.close()
+            with contextlib.suppress(ConnectionError):
+                await writer.wait_closed()
+
+    async def run_ticks(self):
+        """
+        Play the shared game one tick at a time and send the results.
+        """
+        while True:
+            await asyncio.sleep(self._tick_interval)
+            if not self._game.pending():
+                continue
+            delta, outputs, finished = self._game.step()
+            message = _message(delta)
+            for name, writer in list(self._writers.items()):
+                if writer.transport.get_write_buffer_size() > _MAX_WRITE_BUFFER:
+                    finished.append(name)
+                    continue
+                writer.write(message)
+                if name in outputs:
+                    writer.write(_message({"type": "output", "text": outputs[name]}))
+            for name in finished:
+                # the client task sees the closed stream and cleans up
+                writer = self._writers.pop(name, None)
+                if writer is not None:
+                    writer.close()
+
+    async def start(self, host="127.0.0.1", port=8765, unix_path=None):
+        """
+        Start listening on a TCP port or a Unix socket.
+
+        Args:
+            host (str): The TCP host.
+            port (int): The TCP port.
+            unix_path (str): The Unix socket path, used instead of TCP if given.
+
+        Returns:
+            asyncio.Server: The listening server.
+        """
+        handler = self.serve_client
+        if self._game is not None:
+            handler = self.serve_shared_client
+            self._ticker = asyncio.create_task(self.run_ticks())
+        # the default backlog of 100 drops connections when many clients arrive at once
+        if unix_path:
+            return await asyncio.start_unix_server(handler, path=unix_path, backlog=_BACKLOG)
+        return await asyncio.start_server(handler, host, port, backlog=_BACKLOG)
+
+
+async def _read_command(reader):
+    """
+    Read the next command line of a client.
+
+    Args:
+        reader (StreamReader): The client input.
+
+    Returns:
+        str: The command, None at the end of the input or on a line longer than
+        the limit of the reader, which ends the session.
+    """
+    try:
+        line = await reader.readline()
+    except (ValueError, asyncio.LimitOverrunError):
+        # readline raises ValueError once the line overruns the buffer limit
+        return None
+    if not line:
+        return None
+    return line.decode(errors="replace").strip()
+
+
+def _message(data):
+    """
+    Encode a message of the shared game as a JSON line.
+
+    Args:
+        data (dict): The message.
+
+    Returns:
+        bytes: The encoded line.
+    """
+    return (json.dumps(data, ensure_ascii=False, separators=(",", ":")) + "\n").encode()
+
+
+async def serve(path, host, port, unix_path, shared=False, binary=False):
+    """
+    Run the server until it is interrupted.
+
+    Args:
+        path (str): The maze YAML file.
+        host (str): The TCP host.
+        port (int): The TCP port.
+        unix_path (str): The Unix socket path, used instead of TCP if given.
+        shared (bool): Whether all the clients play in one maze.
+        binary (bool): Whether the clients get the binary protocol.
+    """
+    server = await GameServer(path, shared, binary=binary).start(host, port, unix_path)
+    print(f"Serving {path} on {unix_path or f'{host}:{port}'}")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve maze sessions over a socket")
+    parser.add_argument("--config", default=file_path, help="maze YAML file")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", metavar="PATH", help="listen on a Unix socket instead")
+    parser.add_argument(
+        "--shared", action="store_true", help="all the clients play in one maze"
+    )
+    parser.add_argument(
+        "--binary", action="store_true", help="send the binary protocol of rpg.protocol"
+    )
+    parser.add_argument(
+        "--stats", metavar="FILE", help="aggregate the statistics of the games into FILE as JSON"
+    )
+    parser.add_argument(
+        "--stats-every",
+        type=float,
+        default=60.0,
+        metavar="SECONDS",
+        help="seconds between two snapshots of the statistics",
+    )
+    args = parser.parse_args()
+    if args.stats:
+        stats.enable(output=args.stats, every=args.stats_every)
+    try:
+        with contextlib.suppress(KeyboardInterrupt):
+            asyncio.run(
+                serve(args.config, args.host, args.port, args.unix, args.shared, args.binary)
+            )
+    finally:
+        stats.write()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,527 @@
+"""
+Copy-on-write mazes for many sessions playing the same map.
+
+A MazeTemplate parses the maze YAML file once and holds its static parts: the
+grid size, the emojis, the config values, the initial grid and the initial
+position of every item and enemy. A SessionMaze plays on a template and only
+stores what its player changed: the changed cells over the shared grid, and the
+removed, moved and added entries over every shared position list. A new session
+costs its attributes and empty overlays, plus the enemy flow field when the
+enemies chase the player.
+"""
+import bisect
+
+from rpg.maze import Maze, file_path
+from rpg.scheduler import Scheduler
+
+# The position collections of a maze, by attribute name
+_POSITIONS = (
+    "_obstacle_positions",
+    "_gem_positions",
+    "_key_positions",
+    "_arrow_positions",
+    "_heart_positions",
+    "_padlock_positions",
+    "_skeleton_positions",
+    "_dragon_positions",
+    "_bomb_positions",
+    "_spell_positions",
+)
+
+# The attributes a session overlays or owns, all the others are shared
+_SESSION_ATTRIBUTES = _POSITIONS + (
+    "_grid",
+    "_items",
+    "_enemy_spawns",
+    "_player_position",
+    "_player_emoji",
+    "_obstacle_listeners",
+    "_scheduler",
+    "_fov",
+    "_block_map",
+    "_projectiles",
+)
+
+
+class OverlayGrid:
+    """
+    A class representing a grid whose changed cells are stored apart from the
+    shared initial grid.
+
+    It is read and written like the list of rows of Maze: grid[row][col].
+
+    Attributes:
+        _base (tuple): The shared initial grid, a tuple of rows.
+        _cells (dict): The changed cells, (row, col) -> emoji.
+    """
+
+    __slots__ = ("_base", "_cells")
+
+    def __init__(self, base):
+        """
+        Initialize a grid with no change.
+
+        Args:
+            base (tuple): The shared initial grid, a tuple of rows.
+        """
+        self._base = base
+        self._cells = {}
+
+    @property
+    def changes(self):
+        """
+        The changed cells, (row, col) -> emoji.
+        """
+        return self._cells
+
+    def __len__(self):
+        return len(self._base)
+
+    def __getitem__(self, row):
+        return _OverlayRow(self, row)
+
+    def __iter__(self):
+        for row in range(len(self._base)):
+            yield _OverlayRow(self, row)
+
+
+class _OverlayRow:
+    """
+    A view of one row of an OverlayGrid.
+    """
+
+    __slots__ = ("_grid", "_row")
+
+    def __init__(self, grid, row):
+        self._grid = grid
+        self._row = row
+
+    def __len__(self):
+        return len(self._grid._base[self._row])
+
+    def __getitem__(self, col):
+        return self._grid._cells.get((self._row, col), self._grid._base[self._row][col])
+
+    def __setitem__(self, col, emoji):
+        self._grid._cells[(self._row, col)] = emoji
+
+    def __iter__(self):
+        for col in range(len(self)):
+            yield self[col]
+
+
+class DirtyGrid:
+    """
+    A class representing a grid that records the cells written to it.
+
+    Attributes:
+        _grid (list): The wrapped grid, read and written as grid[row][col].
+        _dirty (set): The cells written since the last take_dirty().
+    """
+
+    __slots__ = ("_grid", "_dirty")
+
+    def __init__(self, grid):
+        """
+        Initialize the grid with no written cell.
+
+        Args:
+            grid (list): The wrapped grid.
+        """
+        self._grid = grid
+        self._dirty = set()
+
+    def __len__(self):
+        return len(self._grid)
+
+    def __getitem__(self, row):
+        return _DirtyRow(self._grid[row], row, self._dirty)
+
+    def __iter__(self):
+        # iteration is only used to read the grid
+        return iter(self._grid)
+
+    def take_dirty(self):
+        """
+        Get the cells written since the last call and forget them.
+
+        Returns:
+            set: The (row, col) of the written cells.
+        """
+        dirty = self._dirty
+        self._dirty = set()
+        return dirty
+
+
+class _DirtyRow:
+    """
+    A view of one row of a DirtyGrid.
+    """
+
+    __slots__ = ("_row", "_index", "_dirty")
+
+    def __init__(self, row, index, dirty):
+        self._row = row
+        self._index = index
+        self._dirty = dirty
+
+    def __len__(self):
+        return len(self._row)
+
+    def __getitem__(self, col):
+        return self._row[col]
+
+    def __setitem__(self, col, emoji):
+        self._row[col] = emoji
+        self._dirty.add((self._index, col))
+
+    def __iter__(self):
+        return iter(self._row)
+
+
+class OverlayPositions:
+    """
+    A class representing a list of positions stored as its changes over the
+    shared initial positions.
+
+    It supports the list operations Maze and its users need: iteration,
+    membership, len, index, item assignment, append and remove. Positions keep
+    their order, so an index stays valid while an enemy is moved. A list holds
+    the removed initial indices, the initial entries given a new position and
+    the appended positions, so its memory and the cost of its operations grow
+    with the changes only. Membership stays a dict lookup.
+
+    Attributes:
+        _base (tuple): The shared initial positions.
+        _base_index (dict): The shared index of the initial positions,
+            position -> tuple of its indices.
+        _removed (list): The sorted indices of the removed initial positions.
+        _moved (dict): Initial index -> new position of the entries moved.
+        _added (list): The appended positions, after the initial ones.
+        _extra (dict): Position -> number of moved and appended entries on it.
+    """
+
+    __slots__ = ("_base", "_base_index", "_removed", "_moved", "_added", "_extra")
+
+    def __init__(self, base, base_index):
+        """
+        Initialize a list of positions with no change.
+
+        Args:
+            base (tuple): The shared initial positions.
+            base_index (dict): The shared index of the initial positions,
+                position -> tuple of its indices.
+        """
+        self._base = base
+        self._base_index = base_index
+        # allocated on the first change
+        self._removed = None
+        self._moved = None
+        self._added = None
+        self._extra = None
+
+    def __iter__(self):
+        if self._removed is None:
+            return iter(self._base)
+        return self._iter_changed()
+
+    def _iter_changed(self):
+        removed = self._removed
+        moved = self._moved
+        base = self._base
+        # the removed indices are skipped in order; the moved entries are read
+        # when reached, so items can be set while iterating as on a list
+        skip = 0
+        for index in range(len(base)):
+            if skip < len(removed) and removed[skip] == index:
+                skip += 1
+                continue
+            yield moved.get(index, base[index])
+        yield from self._added
+
+    def __len__(self):
+        if self._removed is None:
+            return len(self._base)
+        return len(self._base) - len(self._removed) + len(self._added)
+
+    def __contains__(self, position):
+        # positions are tuples, a list never equals one
+        if not isinstance(position, tuple):
+            return False
+        indices = self._base_index.get(position, ())
+        if self._removed is None:
+            return bool(indices)
+        if self._extra.get(position):
+            return True
+        return any(self._is_initial(index) for index in indices)
+
+    def __getitem__(self, index):
+        if self._removed is None:
+            return self._base[index]
+        initial, at = self._locate(index)
+        if not initial:
+            return self._added[at]
+        return self._moved.get(at, self._base[at])
+
+    def __setitem__(self, index, position):
+        self._start()
+        initial, at = self._locate(index)
+        if not initial:
+            self._count(self._added[at], -1)
+            self._added[at] = position
+        else:
+            if at in self._moved:
+                self._count(self._moved.pop(at), -1)
+            if position == self._base[at]:
+                # back on its initial position: no change to store
+                return
+            self._moved[at] = position
+        self._count(position, 1)
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def index(self, position):
+        """
+        Get the index of a position.
+
+        Args:
+            position (tuple): The position.
+
+        Returns:
+            int: Its index, as in a list.
+        """
+        found = None
+        if isinstance(position, tuple):
+            for index in self._base_index.get(position, ()):
+                if self._removed is None or self._is_initial(index):
+                    found = index
+                    break
+            if self._removed is not None and self._extra.get(position):
+                for index, moved in self._moved.items():
+                    if moved == position and (found is None or index < found):
+                        found = index
+                if found is None:
+                    return self._initial_count() + self._added.index(position)
+        if found is None:
+            raise ValueError(f"{position} is not in list")
+        if self._removed is None:
+            return found
+        return found - bisect.bisect_left(self._removed, found)
+
+    def append(self, position):
+        """
+        Add a position at the end.
+
+        Args:
+            position (tuple): The position.
+        """
+        self._start()
+        self._added.append(position)
+        self._count(position, 1)
+
+    def remove(self, position):
+        """
+        Remove the first occurrence of a position.
+
+        Args:
+            position (tuple): The position.
+        """
+        self._delete(self.index(position))
+
+    def remove_all(self, removed):
+        """
+        Remove every occurrence of some positions.
+
+        Args:
+            removed (set): The positions to remove.
+        """
+        self._start()
+        for position in removed:
+            for index in self._base_index.get(position, ()):
+                if self._is_initial(index):
+                    bisect.insort(self._removed, index)
+            if self._extra.get(position):
+                for index in [index for index, moved in self._moved.items() if moved == position]:
+                    del self._moved[index]
+                    bisect.insort(self._removed, index)
+                self._added = [added for added in self._added if added != position]
+                del self._extra[position]
+
+    def _start(self):
+        """
+        Allocate the changes on the first one.
+        """
+        if self._removed is None:
+            self._removed = []
+            self._moved = {}
+            self._added = []
+            self._extra = {}
+
+    def _is_initial(self, index):
+        """
+        Whether an initial entry is still there on its initial position.
+        """
+        if index in self._moved:
+            return False
+        found = bisect.bisect_left(self._removed, index)
+        return found == len(self._removed) or self._removed[found] != index
+
+    def _initial_count(self):
+        """
+        The number of initial entries not removed.
+        """
+        return len(self._base) - len(self._removed)
+
+    def _locate(self, index):
+        """
+        Find the entry at an index.
+
+        Args:
+            index (int): The index, negative ones counting from the end.
+
+        Returns:
+            tuple: (True, initial index) or (False, index in the appended list).
+        """
+        length = len(self)
+        if index < 0:
+            index += length
+        if not 0 <= index < length:
+            raise IndexError("list index out of range")
+        if index >= self._initial_count():
+            return False, index - self._initial_count()
+        # the smallest initial index with `index` entries left before it
+        at = index
+        while True:
+            shifted = index + bisect.bisect_right(self._removed, at)
+            if shifted == at:
+                return True, at
+            at = shifted
+
+    def _delete(self, index):
+        """
+        Remove the entry at an index.
+        """
+        self._start()
+        initial, at = self._locate(index)
+        if not initial:
+            self._count(self._added.pop(at), -1)
+            return
+        if at in self._moved:
+            self._count(self._moved.pop(at), -1)
+        bisect.insort(self._removed, at)
+
+    def _count(self, position, change):
+        """
+        Update the number of moved and appended entries on a position.
+        """
+        count = self._extra.get(position, 0) + change
+        if count:
+            self._extra[position] = count
+        else:
+            self._extra.pop(position, None)
+
+
+class MazeTemplate:
+    """
+    A class representing the static parts of a maze, shared by all sessions.
+
+    Attributes:
+        _maze (Maze): The maze parsed from the YAML file, never played on.
+        _grid (tuple): The initial grid, a tuple of rows.
+        _positions (dict): Attribute name -> (initial positions, position ->
+            tuple of its indices).
+    """
+
+    def __init__(self, path=file_path):
+        """
+        Parse a maze YAML file once.
+
+        Args:
+            path (str): The maze YAML file.
+        """
+        self._maze = Maze(path)
+        self._grid = tuple(tuple(row) for row in self._maze.grid)
+        self._positions = {}
+        for name in _POSITIONS:
+            base = tuple(getattr(self._maze, name))
+            base_index = {}
+            for index, position in enumerate(base):
+                base_index[position] = base_index.get(position, ()) + (index,)
+            self._positions[name] = (base, base_index)
+
+    @property
+    def file_path(self):
+        """
+        The YAML file the template was parsed from.
+        """
+        return self._maze.file_path
+
+    def new_session(self):
+        """
+        Start a new maze on the template.
+
+        Returns:
+            SessionMaze: The maze of the session.
+        """
+        return SessionMaze(self)
+
+
+class SessionMaze(Maze):
+    """
+    A maze playing on a shared template and storing only its own changes.
+    """
+
+    # sessions are played by remote clients, who must not share one saved game
+    _savable = False
+
+    def __init__(self, template):
+        """
+        Initialize the maze of a session without parsing the YAML file.
+
+        Args:
+            template (MazeTemplate): The shared template.
+        """
+        for name, value in vars(template._maze).items():
+            if name not in _SESSION_ATTRIBUTES:
+                setattr(self, name, value)
+        for name, (base, base_index) in template._positions.items():
+            setattr(self, name, OverlayPositions(base, base_index))
+        self._grid = OverlayGrid(template._grid)
+        self._items = template._maze.items.fork()
+        self._enemy_spawns = {}
+        self._player_position = template._maze.player_position
+        self._player_emoji = template._maze.player_emoji
+        self._obstacle_listeners = []
+        self._scheduler = Scheduler()
+        self._fov = None
+        self._block_map = None
+        self._projectiles = None
+        self.start_systems()
+
+    def track_dirty(self):
+        """
+        Start recording the cells written to the grid, for take_dirty().
+        """
+        if not isinstance(self._grid, DirtyGrid):
+            self._grid = DirtyGrid(self._grid)
+
+    def take_dirty(self):
+        """
+        Get the cells written since the last call and forget them.
+
+        Returns:
+            set: The (row, col) of the written cells, None if they are not recorded.
+        """
+        if isinstance(self._grid, DirtyGrid):
+            return self._grid.take_dirty()
+        return None
+
+    @staticmethod
+    def _without(positions, removed):
+        # keep the overlay, and the initial positions shared
+        positions.remove_all(removed)
+        return positions
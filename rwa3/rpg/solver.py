@@ -0,0 +1,596 @@
+"""
+Exact value-iteration solver for small and medium rwa3 mazes.
+
+The reachable states (position, facing, remaining items, alive enemies, arrows,
+health bucket) are enumerated from the start and bit-packed into one integer.
+Transitions are stored as flat NumPy arrays (one row per state and action) and
+value iteration maximises the probability of winning, combat included. The
+policy is exported as a sorted lookup table used by the game's hint command.
+
+Health is kept as the nearest multiple of the bucket size, and a living player
+is never rounded down to 0. Every change of health is rounded again, so a hit or
+a heart worth less than half a bucket is not seen at all, and the modelled
+health can drift from the real one by that much per change. Smaller buckets
+model the game more closely at the cost of more states.
+
+Usage (from the rwa3 folder):
+    python -m rpg.solver rpg/config.yaml
+"""
+import argparse
+import os.path
+from collections import deque
+from math import comb
+
+import numpy as np
+
+from rpg.vecenv import (
+    ACTIONS,
+    ARROW,
+    BACKWARD,
+    DRAGON,
+    EMPTY,
+    FORWARD,
+    GEM,
+    HEART,
+    KEY,
+    OBSTACLE,
+    PADLOCK,
+    ROTATE_LEFT,
+    ROTATE_RIGHT,
+    SHOOT,
+    SKELETON,
+    load_template,
+)
+
+# Terminal states
+LOSE = 0
+WIN = 1
+
+_D_ROW = (-1, 0, 1, 0)
+_D_COL = (0, 1, 0, -1)
+_FACING = ("up", "right", "down", "left")
+_GEMS_TO_WIN = 3
+_ARROW_RANGE = 3
+
+
+def health_bucket(health, bucket_size):
+    """
+    Round a health to the nearest bucket.
+
+    Args:
+        health (int): The health of the player.
+        bucket_size (int): The width of a bucket.
+
+    Returns:
+        int: The bucket, at least 1 while the player is alive.
+    """
+    if health <= 0:
+        return 0
+    return max((health + bucket_size // 2) // bucket_size, 1)
+
+
+class StateLayout:
+    """
+    A class representing the bit packing of a game state.
+
+    Attributes:
+        item_cells (list): (position, code) of every item and padlock, one bit each.
+        enemy_cells (list): Position of every enemy, one bit each.
+        bucket_size (int): The width of a health bucket.
+    """
+
+    def __init__(self, template, bucket_size):
+        """
+        Initialize the layout of a maze.
+
+        Args:
+            template (dict): The maze template built by vecenv.load_template().
+            bucket_size (int): The width of a health bucket.
+        """
+        grid = template["grid"]
+        self.size = grid.shape[0]
+        self.bucket_size = bucket_size
+        self.item_cells = []
+        self.enemy_cells = []
+        for row in range(self.size):
+            for col in range(self.size):
+                code = int(grid[row, col])
+                if code in (GEM, KEY, PADLOCK, ARROW, HEART):
+                    self.item_cells.append(((row, col), code))
+                elif code in (SKELETON, DRAGON):
+                    self.enemy_cells.append((row, col))
+        self.item_bit = {cell: bit for bit, (cell, _) in enumerate(self.item_cells)}
+        self.enemy_bit = {cell: bit for bit, cell in enumerate(self.enemy_cells)}
+        self.masks = {
+            code: sum(1 << bit for bit, (_, each) in enumerate(self.item_cells) if each == code)
+            for code in (GEM, KEY, PADLOCK, ARROW, HEART)
+        }
+
+        arrow_count = bin(self.masks[ARROW]).count("1")
+        max_health = template["health"] + bin(self.masks[HEART]).count("1") * template["heart_boost"]
+        # (name, number of values) from the lowest bits up
+        self.fields = (
+            ("position", self.size * self.size),
+            ("facing", 4),
+            ("items", 1 << len(self.item_cells)),
+            ("enemies", 1 << len(self.enemy_cells)),
+            ("arrows", arrow_count + 1),
+            ("bucket", health_bucket(max_health, bucket_size) + 1),
+        )
+        self.shifts = []
+        shift = 0
+        for _, values in self.fields:
+            self.shifts.append(shift)
+            shift += max(values - 1, 1).bit_length()
+        if shift > 62:
+            raise ValueError(f"State needs {shift} bits, the maze is too large to solve")
+
+    def pack(self, state):
+        """
+        Pack a state into one integer.
+
+        Args:
+            state (tuple): (position index, facing, items, enemies, arrows, bucket).
+
+        Returns:
+            int: The packed state, offset by 2 to leave room for the terminal states.
+        """
+        key = 0
+        for value, shift in zip(state, self.shifts):
+            key |= value << shift
+        return key + 2
+
+    def unpack(self, key):
+        """
+        Unpack an integer into a state.
+
+        Args:
+            key (int): The packed state.
+
+        Returns:
+            tuple: (position index, facing, items, enemies, arrows, bucket).
+        """
+        key -= 2
+        state = []
+        for index, shift in enumerate(self.shifts):
+            end = self.shifts[index + 1] if index + 1 < len(self.shifts) else 63
+            state.append((key >> shift) & ((1 << (end - shift)) - 1))
+        return tuple(state)
+
+    def to_array(self):
+        """
+        Get the layout as an array, to store it next to the policy.
+
+        Returns:
+            ndarray: size, bucket size, item count, enemy count, the field shifts,
+            then row, col of every item and enemy cell.
+        """
+        cells = [cell for cell, _ in self.item_cells] + self.enemy_cells
+        return np.array(
+            [self.size, self.bucket_size, len(self.item_cells), len(self.enemy_cells)]
+            + self.shifts
+            + [value for cell in cells for value in cell],
+            dtype=np.int64,
+        )
+
+
+class Solver:
+    """
+    A class representing the value-iteration solver of a maze.
+
+    Attributes:
+        _template (dict): The maze template.
+        _layout (StateLayout): The bit packing of the states.
+        _keys (list): Packed key of every state, in index order.
+        _next (ndarray): Next state of every transition.
+        _prob (ndarray): Probability of every transition.
+        _start (ndarray): First transition of every (state, action) row.
+        values (ndarray): Maximum win probability of every state, after solve().
+        policy (ndarray): Best action of every state, after solve().
+    """
+
+    def __init__(self, template, bucket_size=500, max_states=2_000_000):
+        """
+        Initialize the solver and enumerate the reachable states.
+
+        Args:
+            template (dict): The maze template built by vecenv.load_template().
+            bucket_size (int): The width of a health bucket. The default keeps the
+                shipped maze under two million states; it sees a fight but not
+                a single hit or heart.
+            max_states (int): Give up when more states than this are reachable.
+        """
+        self._template = template
+        self._layout = StateLayout(template, bucket_size)
+        self._max_states = max_states
+        self.values = None
+        self.policy = None
+        self._enumerate()
+
+    @property
+    def num_states(self):
+        """
+        The number of states, the two terminal ones included.
+        """
+        return len(self._keys)
+
+    def solve(self, tolerance=1e-9, max_iterations=10_000, tie_gamma=0.99):
+        """
+        Run value iteration for the maximum win probability.
+
+        Several actions often have the same win probability (rotating in place
+        never loses), so the ties are broken by a discounted second pass
+        restricted to the optimal actions, which prefers the shortest win.
+
+        Args:
+            tolerance (float): Stop when no value changes more than this.
+            max_iterations (int): Stop after this many sweeps.
+            tie_gamma (float): Discount of the tie-breaking pass.
+
+        Returns:
+            float: The win probability from the start state.
+        """
+        actions = len(ACTIONS)
+        values = np.zeros(self.num_states)
+        values[WIN] = 1.0
+        for _ in range(max_iterations):
+            q = np.add.reduceat(self._prob * values[self._next], self._start)
+            new_values = q.reshape(-1, actions).max(axis=1)
+            new_values[LOSE] = 0.0
+            new_values[WIN] = 1.0
+            delta = np.abs(new_values - values).max()
+            values = new_values
+            if delta < tolerance:
+                break
+        q = np.add.reduceat(self._prob * values[self._next], self._start)
+        optimal = q.reshape(-1, actions) >= values[:, None] - 1e-7
+
+        discounted = values.copy()
+        for _ in range(max_iterations):
+            q = np.add.reduceat(self._prob * discounted[self._next], self._start)
+            q = np.where(optimal, tie_gamma * q.reshape(-1, actions), -1.0)
+            new_values = q.max(axis=1)
+            new_values[LOSE] = 0.0
+            new_values[WIN] = 1.0
+            delta = np.abs(new_values - discounted).max()
+            discounted = new_values
+            if delta < tolerance:
+                break
+
+        self.values = values
+        self.policy = q.argmax(axis=1).astype(np.int8)
+        # the start state is the first one after the two terminal states
+        return float(values[2])
+
+    def save_policy(self, path):
+        """
+        Save the policy as a lookup table sorted by packed state.
+
+        Args:
+            path (str): The .npz file to write.
+        """
+        keys = np.array(self._keys, dtype=np.int64)
+        order = np.argsort(keys)
+        np.savez_compressed(
+            path,
+            keys=keys[order],
+            actions=self.policy[order],
+            layout=self._layout.to_array(),
+        )
+
+    def _enumerate(self):
+        """
+        Enumerate the reachable states breadth-first and record their transitions.
+        """
+        layout = self._layout
+        template = self._template
+        start = (
+            template["start"][0] * layout.size + template["start"][1],
+            template["facing"],
+            (1 << len(layout.item_cells)) - 1,
+            (1 << len(layout.enemy_cells)) - 1,
+            0,
+            health_bucket(template["health"], layout.bucket_size),
+        )
+        self._keys = [LOSE, WIN]
+        index = {}
+        next_states = []
+        probabilities = []
+        starts = []
+
+        def state_index(state):
+            key = layout.pack(state)
+            found = index.get(key)
+            if found is None:
+                found = index[key] = len(self._keys)
+                self._keys.append(key)
+                queue.append(state)
+                if len(self._keys) > self._max_states:
+                    raise ValueError(
+                        f"More than {self._max_states} reachable states, the maze is too large"
+                    )
+            return found
+
+        # terminal states loop on themselves
+        for terminal in (LOSE, WIN):
+            for _ in ACTIONS:
+                starts.append(len(next_states))
+                next_states.append(terminal)
+                probabilities.append(1.0)
+
+        queue = deque()
+        state_index(start)
+        while queue:
+            state = queue.popleft()
+            for action in range(len(ACTIONS)):
+                starts.append(len(next_states))
+                for target, probability in self._transitions(state, action):
+                    if target in (LOSE, WIN):
+                        next_states.append(target)
+                    else:
+                        next_states.append(state_index(target))
+                    probabilities.append(probability)
+
+        self._next = np.array(next_states, dtype=np.int64)
+        self._prob = np.array(probabilities)
+        self._start = np.array(starts, dtype=np.int64)
+
+    def _code(self, cell, items, enemies):
+        """
+        Get the content of a cell in a state.
+
+        Args:
+            cell (tuple): The cell position.
+            items (int): The remaining items mask.
+            enemies (int): The alive enemies mask.
+
+        Returns:
+            int: The cell code.
+        """
+        code = int(self._template["grid"][cell])
+        if code in (SKELETON, DRAGON):
+            return code if enemies >> self._layout.enemy_bit[cell] & 1 else EMPTY
+        if code in (GEM, KEY, PADLOCK, ARROW, HEART):
+            return code if items >> self._layout.item_bit[cell] & 1 else EMPTY
+        return code
+
+    def _transitions(self, state, action):
+        """
+        Get the outcomes of an action.
+
+        Args:
+            state (tuple): The unpacked state.
+            action (int): The action index.
+
+        Returns:
+            list: (next state or terminal, probability) pairs.
+        """
+        position, facing, items, enemies, arrows, bucket = state
+        layout = self._layout
+        template = self._template
+        size = layout.size
+
+        if action == ROTATE_LEFT:
+            return [((position, (facing - 1) % 4, items, enemies, arrows, bucket), 1.0)]
+        if action == ROTATE_RIGHT:
+            return [((position, (facing + 1) % 4, items, enemies, arrows, bucket), 1.0)]
+
+        row, col = divmod(position, size)
+        if action == SHOOT:
+            if arrows == 0:
+                return [(state, 1.0)]
+            for distance in range(1, _ARROW_RANGE + 1):
+                cell = (row + _D_ROW[facing] * distance, col + _D_COL[facing] * distance)
+                if not (0 <= cell[0] < size and 0 <= cell[1] < size):
+                    continue
+                if self._code(cell, items, enemies) in (SKELETON, DRAGON):
+                    damage = template["arrow_damage"] - template["enemy_shield"][cell]
+                    if damage >= template["enemy_health"][cell]:
+                        enemies &= ~(1 << layout.enemy_bit[cell])
+                    break
+            return [((position, facing, items, enemies, arrows - 1, bucket), 1.0)]
+
+        direction = facing if action == FORWARD else (facing + 2) % 4
+        cell = (row + _D_ROW[direction], col + _D_COL[direction])
+        if not (0 <= cell[0] < size and 0 <= cell[1] < size):
+            return [(state, 1.0)]
+        code = self._code(cell, items, enemies)
+        # keys held = keys picked up - padlocks opened
+        keys = (
+            bin(layout.masks[KEY] & ~items).count("1")
+            - bin(layout.masks[PADLOCK] & ~items).count("1")
+        )
+        if code == OBSTACLE or (code == PADLOCK and keys == 0):
+            return [(state, 1.0)]
+
+        target = cell[0] * size + cell[1]
+        if code in (SKELETON, DRAGON):
+            return self._combat(state, cell, target)
+        health = bucket * layout.bucket_size
+        if code in (GEM, KEY, PADLOCK, ARROW, HEART):
+            items &= ~(1 << layout.item_bit[cell])
+            if code == ARROW:
+                arrows += 1
+            elif code == HEART:
+                health += template["heart_boost"]
+            elif code == GEM:
+                gems = bin(layout.masks[GEM] & ~items).count("1")
+                if gems >= _GEMS_TO_WIN:
+                    return [(WIN, 1.0)]
+        return [
+            (
+                (
+                    target,
+                    facing,
+                    items,
+                    enemies,
+                    arrows,
+                    health_bucket(health, layout.bucket_size),
+                ),
+                1.0,
+            )
+        ]
+
+    def _combat(self, state, cell, target):
+        """
+        Get the outcomes of a fight.
+
+        Args:
+            state (tuple): The unpacked state.
+            cell (tuple): The position of the enemy.
+            target (int): The position index of the enemy.
+
+        Returns:
+            list: (next state or terminal, probability) pairs.
+        """
+        _, facing, items, enemies, arrows, bucket = state
+        layout = self._layout
+        template = self._template
+        player_damage = template["player_attack"] - int(template["enemy_shield"][cell])
+        if player_damage <= 0:
+            # the shield stops every blow, the fight goes on until the player dies
+            return [(LOSE, 1.0)]
+        player_hits = -(-int(template["enemy_health"][cell]) // player_damage)
+        enemy_damage = int(template["enemy_damage"][cell])
+        health = bucket * layout.bucket_size
+        enemy_hits = -(-health // enemy_damage)
+        enemies &= ~(1 << layout.enemy_bit[cell])
+
+        outcomes = []
+        survive = 0.0
+        for taken in range(enemy_hits):
+            probability = comb(taken + player_hits - 1, taken) * 0.5 ** (player_hits + taken)
+            survive += probability
+            new_bucket = health_bucket(health - taken * enemy_damage, layout.bucket_size)
+            outcomes.append(
+                ((target, facing, items, enemies, arrows, new_bucket), probability)
+            )
+        outcomes.append((LOSE, 1.0 - survive))
+        return outcomes
+
+
+class PolicyTable:
+    """
+    A class representing an exported policy, used to give hints in the game.
+
+    Attributes:
+        _keys (ndarray): The sorted packed states.
+        _actions (ndarray): The best action of every state.
+        _size (int): The grid size of the maze.
+        _bucket_size (int): The width of a health bucket.
+        _shifts (list): The bit offset of every state field.
+        _item_cells (list): The item and padlock cells, in bit order.
+        _enemy_cells (list): The enemy cells, in bit order.
+    """
+
+    def __init__(self, path):
+        """
+        Load a policy saved by Solver.save_policy().
+
+        Args:
+            path (str): The .npz file.
+        """
+        data = np.load(path)
+        self._keys = data["keys"]
+        self._actions = data["actions"]
+        layout = [int(value) for value in data["layout"]]
+        self._size, self._bucket_size, item_count, enemy_count = layout[:4]
+        self._shifts = layout[4:10]
+        cells = [tuple(layout[index:index + 2]) for index in range(10, len(layout), 2)]
+        self._item_cells = cells[:item_count]
+        self._enemy_cells = cells[item_count:]
+
+    @staticmethod
+    def policy_path(config_path):
+        """
+        Get the policy file that goes with a maze YAML file.
+
+        Args:
+            config_path (str): The maze YAML file.
+
+        Returns:
+            str: The .npz path next to it.
+        """
+        return os.path.splitext(config_path)[0] + ".policy.npz"
+
+    def hint(self, maze, facing, arrows, health):
+        """
+        Get the best command for the current game.
+
+        Args:
+            maze (Maze): The current maze.
+            facing (str): The direction the player faces ("up", "right", ...).
+            arrows (int): The arrows in the inventory.
+            health (int): The health of the player.
+
+        Returns:
+            str: The command to play, or None if the game is not in the table:
+            the solver knows neither moving enemies nor respawning items, so
+            once an enemy is away from its spawn cell or an item has come back
+            there is no hint.
+        """
+        if maze.items.added():
+            return None
+        alive = list(maze.skeleton_positions) + list(maze.dragon_positions)
+        if any(maze.enemy_spawn(position) != tuple(position) for position in alive):
+            return None
+        row, col = maze.player_position
+        items = 0
+        for bit, (item_row, item_col) in enumerate(self._item_cells):
+            # consumed items leave an empty cell behind
+            if maze.grid[item_row][item_col] not in (maze.cls_empty, maze.player_emoji):
+                items |= 1 << bit
+        alive = set(alive)
+        enemies = 0
+        for bit, cell in enumerate(self._enemy_cells):
+            if cell in alive:
+                enemies |= 1 << bit
+        state = (
+            row * self._size + col,
+            _FACING.index(facing),
+            items,
+            enemies,
+            arrows,
+            health_bucket(health, self._bucket_size),
+        )
+        key = 2
+        for value, shift in zip(state, self._shifts):
+            key += value << shift
+        found = np.searchsorted(self._keys, key)
+        if found < len(self._keys) and self._keys[found] == key:
+            return ACTIONS[int(self._actions[found])]
+        return None
+
+
+def main():
+    """
+    Solve a maze and save its policy next to the config file.
+    """
+    parser = argparse.ArgumentParser(description="Solve an rwa3 maze by value iteration")
+    parser.add_argument("config", help="maze YAML file")
+    parser.add_argument(
+        "--bucket-size",
+        type=int,
+        default=500,
+        help="width of a health bucket, health is rounded to the nearest one; "
+        "wider buckets mean fewer states but a coarser model",
+    )
+    parser.add_argument(
+        "--max-states", type=int, default=2_000_000, help="give up above this many states"
+    )
+    args = parser.parse_args()
+
+    try:
+        solver = Solver(load_template(args.config), args.bucket_size, args.max_states)
+    except ValueError as e:
+        parser.error(f"{e}; raise --bucket-size or --max-states")
+    print(f"{solver.num_states} states")
+    probability = solver.solve()
+    print(f"Win probability with the optimal policy: {probability:.4f}")
+    path = PolicyTable.policy_path(args.config)
+    solver.save_policy(path)
+    print(f"Policy saved to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,730 @@
+"""
+Streaming statistics of many games.
+
+The recorder observes the events of rpg.hooks to feed a GameRecord per session
+being played: moves, pickups by Category, combats by enemy type, damage dealt
+and taken, and turns. When the game ends (won, lost or quit, a session can
+also be left unfinished) its record is folded into a StatsAggregator and
+dropped.
+
+The aggregator keeps no row per game: counters, Welford mean and variance, and
+a merging t-digest for the quantiles of the turns to win, so its memory stays
+the same over millions of games. It writes a JSON snapshot every few seconds,
+and when the program ends. Aggregators of separate workers can be merged.
+"""
+import json
+import math
+import os
+import time
+from collections import Counter
+
+from rpg import hooks
+from rpg.hooks import LOSS, QUIT, UNFINISHED, WIN
+from rpg.item import Category
+
+_OUTCOMES = (WIN, LOSS, QUIT, UNFINISHED)
+_QUANTILES = (0.5, 0.9, 0.99)
+
+_hook = None
+
+
+class Welford:
+    """
+    A class representing the running count, mean, variance and range of a series.
+
+    Uses Welford's update, which stays accurate over long series, and Chan's
+    formula to merge two series.
+
+    Attributes:
+        count (int): The number of values.
+        mean (float): Their mean.
+        _m2 (float): The sum of the squared distances to the mean.
+        minimum (float): The smallest value, None while empty.
+        maximum (float): The largest value, None while empty.
+    """
+
+    __slots__ = ("count", "mean", "_m2", "minimum", "maximum")
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.minimum = None
+        self.maximum = None
+
+    def add(self, value):
+        """
+        Add a value.
+
+        Args:
+            value (float): The value.
+        """
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+        if self.minimum is None or value < self.minimum:
+            self.minimum = value
+        if self.maximum is None or value > self.maximum:
+            self.maximum = value
+
+    def merge(self, other):
+        """
+        Add the values of another series.
+
+        Args:
+            other (Welford): The other series.
+        """
+        if not other.count:
+            return
+        if not self.count:
+            self.count, self.mean, self._m2 = other.count, other.mean, other._m2
+            self.minimum, self.maximum = other.minimum, other.maximum
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self._m2 += other._m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+
+    @property
+    def variance(self):
+        """
+        The sample variance, 0 below two values.
+        """
+        return self._m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def summary(self):
+        """
+        Get the statistics of the series.
+
+        Returns:
+            dict: count, mean, stdev, min and max.
+        """
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "stdev": math.sqrt(self.variance),
+            "min": self.minimum,
+            "max": self.maximum,
+        }
+
+
+class TDigest:
+    """
+    A class representing a merging t-digest: a sketch of a series answering
+    quantile queries, most accurate in the tails.
+
+    Values are buffered, then merged into at most about `compression` weighted
+    centroids. The arcsine scale function keeps the centroids near the extremes
+    small.
+
+    Attributes:
+        _compression (float): The size parameter of the sketch.
+        _means (list): The mean of every centroid, sorted.
+        _weights (list): The weight of every centroid.
+        _buffer (list): The values not merged yet.
+        _count (float): The total weight, buffered values included.
+        _minimum (float): The smallest value, None while empty.
+        _maximum (float): The largest value, None while empty.
+    """
+
+    __slots__ = ("_compression", "_means", "_weights", "_buffer", "_count", "_minimum", "_maximum")
+
+    def __init__(self, compression=100):
+        """
+        Initialize an empty sketch.
+
+        Args:
+            compression (float): The size parameter; more is more accurate and larger.
+        """
+        self._compression = compression
+        self._means = []
+        self._weights = []
+        self._buffer = []
+        self._count = 0
+        self._minimum = None
+        self._maximum = None
+
+    def __len__(self):
+        return int(self._count)
+
+    def add(self, value, weight=1):
+        """
+        Add a value.
+
+        Args:
+            value (float): The value.
+            weight (float): Its weight.
+        """
+        self._buffer.append((value, weight))
+        self._count += weight
+        if self._minimum is None or value < self._minimum:
+            self._minimum = value
+        if self._maximum is None or value > self._maximum:
+            self._maximum = value
+        if len(self._buffer) >= 5 * self._compression:
+            self._merge()
+
+    def merge(self, other):
+        """
+        Add the values of another sketch.
+
+        Args:
+            other (TDigest): The other sketch.
+        """
+        other._merge()
+        for mean, weight in zip(other._means, other._weights):
+            self.add(mean, weight)
+        if other._count:
+            self._minimum = min(self._minimum, other._minimum)
+            self._maximum = max(self._maximum, other._maximum)
+
+    def quantile(self, q):
+        """
+        Estimate a quantile.
+
+        Args:
+            q (float): The quantile, between 0 and 1.
+
+        Returns:
+            float: The estimate, None while empty.
+        """
+        self._merge()
+        if not self._count:
+            return None
+        means, weights = self._means, self._weights
+        if len(means) == 1:
+            return means[0]
+        target = q * self._count
+        # every centroid is centered on its half weight
+        cumulative = 0.0
+        previous_center = 0.0
+        previous_mean = self._minimum
+        for mean, weight in zip(means, weights):
+            center = cumulative + weight / 2
+            if target < center:
+                if center == previous_center:
+                    return mean
+                share = (target - previous_center) / (center - previous_center)
+                return previous_mean + share * (mean - previous_mean)
+            cumulative += weight
+            previous_center, previous_mean = center, mean
+        if cumulative == previous_center:
+            return self._maximum
+        share = (target - previous_center) / (cumulative - previous_center)
+        return previous_mean + share * (self._maximum - previous_mean)
+
+    def _merge(self):
+        """
+        Merge the buffered values into the centroids.
+        """
+        if not self._buffer:
+            return
+        points = sorted(list(zip(self._means, self._weights)) + self._buffer)
+        self._buffer = []
+        total = self._count
+        means, weights = [], []
+        mean, weight = points[0]
+        done = 0.0
+        k_low = self._scale(0.0)
+        for value, value_weight in points[1:]:
+            if self._scale((done + weight + value_weight) / total) - k_low <= 1:
+                weight += value_weight
+                mean += (value - mean) * value_weight / weight
+            else:
+                means.append(mean)
+                weights.append(weight)
+                done += weight
+                k_low = self._scale(done / total)
+                mean, weight = value, value_weight
+        means.append(mean)
+        weights.append(weight)
+        self._means, self._weights = means, weights
+
+    def _scale(self, q):
+        """
+        The arcsine scale function: centroids may span one unit of it.
+        """
+        return self._compression / (2 * math.pi) * math.asin(2 * min(max(q, 0.0), 1.0) - 1)
+
+
+class GameRecord:
+    """
+    A class representing the counters of one game being played.
+
+    Attributes:
+        moves (int): The moves that changed the player position.
+        turns (int): The commands played.
+        pickups (Counter): Category name -> items picked up.
+        combats (Counter): enemy type -> combats fought.
+        combats_won (Counter): enemy type -> combats won.
+        damage_dealt (Welford): The damage of every blow of the player.
+        damage_taken (Welford): The damage of every blow taken by the player.
+    """
+
+    __slots__ = ("moves", "turns", "pickups", "combats", "combats_won", "damage_dealt", "damage_taken")
+
+    def __init__(self):
+        self.moves = 0
+        self.turns = 0
+        self.pickups = Counter()
+        self.combats = Counter()
+        self.combats_won = Counter()
+        self.damage_dealt = Welford()
+        self.damage_taken = Welford()
+
+    def pickup(self, category):
+        """
+        Count an item picked up.
+
+        Args:
+            category (Category): The category of the item.
+        """
+        self.pickups[category.name] += 1
+
+    def combat(self, enemy_type, won):
+        """
+        Count a combat.
+
+        Args:
+            enemy_type (str): "skeleton" or "dragon".
+            won (bool): Whether the player won it.
+        """
+        self.combats[enemy_type] += 1
+        if won:
+            self.combats_won[enemy_type] += 1
+
+
+class StatsAggregator:
+    """
+    A class representing the statistics of all the games ended so far.
+
+    Attributes:
+        outcomes (Counter): outcome -> number of games.
+        moves (Welford): The moves per game.
+        turns (Welford): The turns per game.
+        pickups (Counter): Category name -> items picked up.
+        combats (Counter): enemy type -> combats fought.
+        combats_won (Counter): enemy type -> combats won.
+        damage_dealt (Welford): The damage of every blow of the players.
+        damage_taken (Welford): The damage of every blow taken by the players.
+        turns_to_win (Welford): The turns of every game won.
+        _turns_to_win_digest (TDigest): Their quantiles.
+        _output (str): The JSON file of the snapshots, None for none.
+        _every (float): Seconds between two snapshots.
+        _written (float): When the last snapshot was written, in monotonic seconds.
+    """
+
+    def __init__(self, output=None, every=60.0):
+        """
+        Initialize empty statistics.
+
+        Args:
+            output (str): The JSON file the snapshots are written to, None for none.
+            every (float): Seconds between two snapshots.
+        """
+        self.outcomes = Counter()
+        self.moves = Welford()
+        self.turns = Welford()
+        self.pickups = Counter()
+        self.combats = Counter()
+        self.combats_won = Counter()
+        self.damage_dealt = Welford()
+        self.damage_taken = Welford()
+        self.turns_to_win = Welford()
+        self._turns_to_win_digest = TDigest()
+        self._output = output
+        self._every = every
+        self._written = time.monotonic()
+
+    @property
+    def games(self):
+        """
+        The number of games ended.
+        """
+        return sum(self.outcomes.values())
+
+    def add_game(self, record, outcome):
+        """
+        Fold an ended game into the statistics, and write a snapshot if one is due.
+
+        Args:
+            record (GameRecord): The counters of the game.
+            outcome (str): WIN, LOSS, QUIT or UNFINISHED.
+        """
+        self.outcomes[outcome] += 1
+        self.moves.add(record.moves)
+        self.turns.add(record.turns)
+        self.pickups.update(record.pickups)
+        self.combats.update(record.combats)
+        self.combats_won.update(record.combats_won)
+        self.damage_dealt.merge(record.damage_dealt)
+        self.damage_taken.merge(record.damage_taken)
+        if outcome == WIN:
+            self.turns_to_win.add(record.turns)
+            self._turns_to_win_digest.add(record.turns)
+        if self._output and time.monotonic() - self._written >= self._every:
+            self.write()
+
+    def merge(self, other):
+        """
+        Add the games of another aggregator, e.g. of another worker.
+
+        Args:
+            other (StatsAggregator): The other statistics.
+        """
+        self.outcomes.update(other.outcomes)
+        self.pickups.update(other.pickups)
+        self.combats.update(other.combats)
+        self.combats_won.update(other.combats_won)
+        for name in ("moves", "turns", "damage_dealt", "damage_taken", "turns_to_win"):
+            getattr(self, name).merge(getattr(other, name))
+        self._turns_to_win_digest.merge(other._turns_to_win_digest)
+
+    def snapshot(self):
+        """
+        Get the statistics as a JSON-ready dict.
+
+        Returns:
+            dict: The games and outcomes, the moves, turns, pickups, combats and
+            damage, and the turns to win with their quantiles.
+        """
+        games = self.games
+        turns_to_win = self.turns_to_win.summary()
+        for q in _QUANTILES:
+            turns_to_win[f"p{round(q * 100)}"] = self._turns_to_win_digest.quantile(q)
+        return {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "games": games,
+            "outcomes": {outcome: self.outcomes[outcome] for outcome in _OUTCOMES},
+            "win_rate": self.outcomes[WIN] / games if games else None,
+            "moves_per_game": self.moves.summary(),
+            "turns_per_game": self.turns.summary(),
+            "pickups": {category.name: self.pickups[category.name] for category in Category},
+            "combats": {
+                enemy_type: {"fought": fought, "won": self.combats_won[enemy_type]}
+                for enemy_type, fought in sorted(self.combats.items())
+            },
+            "damage_dealt": self.damage_dealt.summary(),
+            "damage_taken": self.damage_taken.summary(),
+            "turns_to_win": turns_to_win,
+        }
+
+    def write(self, path=None):
+        """
+        Write a snapshot; the file is replaced at once, so a reader never sees half of it.
+
+        Args:
+            path (str): The JSON file, the output file if None.
+        """
+        path = path or self._output
+        if not path:
+            return
+        temporary = f"{path}.tmp"
+        with open(temporary, "w") as file:
+            json.dump(self.snapshot(), file, indent=2)
+        os.replace(temporary, path)
+        self._written = time.monotonic()
+
+
+class StatsRecorder:
+    """
+    A class representing the observer of rpg.hooks that feeds the records of
+    the games being played.
+
+    Attributes:
+        _aggregator (StatsAggregator): The statistics the ended games go to.
+        _records (dict): session -> GameRecord of its game.
+    """
+
+    def __init__(self, aggregator):
+        """
+        Initialize a recorder; nothing is recorded until install().
+
+        Args:
+            aggregator (StatsAggregator): The statistics the ended games go to.
+        """
+        self._aggregator = aggregator
+        self._records = {}
+
+    @property
+    def aggregator(self):
+        """
+        The statistics the ended games go to.
+        """
+        return self._aggregator
+
+    def install(self):
+        """
+        Start observing the games.
+        """
+        hooks.install(self)
+
+    def uninstall(self):
+        """
+        Stop observing the games.
+        """
+        hooks.uninstall(self)
+
+    def record(self, game):
+        """
+        Get the record of the game of a session, starting it if needed.
+        """
+        record = self._records.get(game)
+        if record is None:
+            record = self._records[game] = GameRecord()
+        return record
+
+    def command(self, game, action):
+        """
+        Count a command played.
+        """
+        if game is not None:
+            self.record(game).turns += 1
+
+    def move(self, game):
+        """
+        Count a move that changed the player position.
+        """
+        if game is not None:
+            self.record(game).moves += 1
+
+    def pickup(self, game, category):
+        """
+        Count an item picked up.
+        """
+        if game is not None:
+            self.record(game).pickup(category)
+
+    def combat(self, game, enemy_type, won):
+        """
+        Count a combat, won or lost.
+        """
+        if game is not None:
+            self.record(game).combat(enemy_type, won)
+
+    def damage_dealt(self, game, amount):
+        """
+        Add the damage of a blow of the player.
+        """
+        if game is not None:
+            self.record(game).damage_dealt.add(amount)
+
+    def damage_taken(self, game, damage):
+        """
+        Add the damage of a blow taken by the player.
+        """
+        if game is not None:
+            self.record(game).damage_taken.add(damage)
+
+    def game_over(self, game, outcome):
+        """
+        Fold the game of a session into the statistics; a game already ended is ignored.
+
+        Args:
+            game (object): The session.
+            outcome (str): WIN, LOSS, QUIT or UNFINISHED.
+        """
+        record = self._records.pop(game, None)
+        if record is not None:
+            self._aggregator.add_game(record, outcome)
+
+
+def enable(output=None, every=60.0):
+    """
+    Turn statistics on.
+
+    Args:
+        output (str): The JSON file the snapshots are written to, None for none.
+        every (float): Seconds between two snapshots.
+
+    Returns:
+        StatsAggregator: The statistics.
+    """
+    global _hook
+    if _hook is None:
+        _hook = StatsRecorder(StatsAggregator(output, every))
+        _hook.install()
+    return _hook.aggregator
+
+
+def disable():
+    """
+    Turn statistics off.
+    """
+    global _hook
+    if _hook is not None:
+        _hook.uninstall()
+        _hook = None
+
+
+def write(self, path=None):
+        """
+        Write a snapshot; the file is replaced at once, so a reader never sees half of it.
+
+        Args:
+            path (str): The JSON file, the output file if None.
+        """
+        path = path or self._output
+        if not path:
+            return
+        temporary = f"{path}.tmp"
+        with open(temporary, "w") as file:
+            json.dump(self.snapshot(), file, indent=2)
+        os.replace(temporary, path)
+        self._written = time.monotonic()
+
+
+class StatsRecorder:
+    """
+    A class representing the observer of rpg.hooks that feeds the records of
+    the games being played.
+
+    Attributes:
+        _aggregator (StatsAggregator): The statistics the ended games go to.
+        _records (dict): session -> GameRecord of its game.
+    """
+
+    def __init__(self, aggregator):
+        """
+        Initialize a recorder; nothing is recorded until install().
+
+        Args:
+            aggregator (StatsAggregator): The statistics the ended games go to.
+        """
+        self._aggregator = aggregator
+        self._records = {}
+
+    @property
+    def aggregator(self):
+        """
+        The statistics the ended games go to.
+        """
+        return self._aggregator
+
+    def install(self):
+        """
+        Start observing the games.
+        """
+        hooks.install(self)
+
+    def uninstall(self):
+        """
+        Stop observing the games.
+        """
+        hooks.uninstall(self)
+
+    def record(self, game):
+        """
+        Get the record of the game of a session, starting it if needed.
+        """
+        record = self._records.get(game)
+        if record is None:
+            record = self._records[game] = GameRecord()
+        return record
+
+    def command(self, game, action):
+        """
+        Count a command played.
+        """
+        if game is not None:
+            self.record(game).turns += 1
+
+    def move(self, game):
+        """
+        Count a move that changed the player position.
+        """
+        if game is not None:
+            self.record(game).moves += 1
+
+    def pickup(self, game, category):
+        """
+        Count an item picked up.
+        """
+        if game is not None:
+            self.record(game).pickup(category)
+
+    def combat(self, game, enemy_type, won):
+        """
+        Count a combat, won or lost.
+        """
+        if game is not None:
+            self.record(game).combat(enemy_type, won)
+
+    def damage_dealt(self, game, amount):
+        """
+        Add the damage of a blow of the player.
+        """
+        if game is not None:
+            self.record(game).damage_dealt.add(amount)
+
+    def damage_taken(self, game, damage):
+        """
+        Add the damage of a blow taken by the player.
+        """
+        if game is not None:
+            self.record(game).damage_taken.add(damage)
+
+    def game_over(self, game, outcome):
+        """
+        Fold the game of a session into the statistics; a game already ended is ignored.
+
+        Args:
+            game (object): The session.
+            outcome (str): WIN, LOSS, QUIT or UNFINISHED.
+        """
+        record = self._records.pop(game, None)
+        if record is not None:
+            self._aggregator.add_game(record, outcome)
+
+
+def enable(output=None, every=60.0):
+    """
+    Turn statistics on.
+
+    Args:
+        output (str): The JSON file the snapshots are written to, None for none.
+        every (float): Seconds between two snapshots.
+
+    Returns:
+        StatsAggregator: The statistics.
+    """
+    global _hook
+    if _hook is None:
+        _hook = StatsRecorder(StatsAggregator(output, every))
+        _hook.install()
+    return _hook.aggregator
+
+
+def disable():
+    """
+    Turn statistics off.
+    """
+    global _hook
+    if _hook is not None:
+        _hook.uninstall()
+        _hook = None
+
+
+def end_game(player, outcome=UNFINISHED):
+    """
+    End the game of a player that stopped without quitting, winning or losing,
+    e.g. a client that disconnected. Does nothing if statistics are off.
+
+    Args:
+        player (Player): The player.
+        outcome (str): The outcome recorded.
+    """
+    if _hook is not None:
+        _hook.end_game(player, outcome)
+
+
+def write():
+    """
+    Write a snapshot if statistics are on.
+    """
+    if _hook is not None:
+        _hook.aggregator.write()
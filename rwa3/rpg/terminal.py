@@ -0,0 +1,194 @@
+"""
+Raw keypress input for the maze game.
+
+The terminal is put in cbreak mode so every key is read as soon as it is typed,
+without Enter. Keys are read through asyncio and handled immediately; drawing
+is done by a separate task that redraws at most once per frame, so fast typing
+or a held key is coalesced into one redraw instead of a backlog of frames.
+"""
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import termios
+import tty
+
+from rpg import hooks, stats, tracing
+from rpg.player import command_menu
+
+# Clear the screen and move the cursor to the top left corner
+_CLEAR = "\x1b[H\x1b[2J"
+# One key is one command, so the menu has no batches
+_HELP = command_menu(", ", batch=False)
+# Lines of game messages kept under the maze
+_MESSAGES = 6
+
+
+class RawTerminal:
+    """
+    A context manager putting a terminal in cbreak mode and restoring it on exit.
+
+    Attributes:
+        _fd (int): The file descriptor of the terminal.
+        _saved (list): The terminal attributes to restore.
+    """
+
+    def __init__(self, fd):
+        """
+        Initialize the context manager.
+
+        Args:
+            fd (int): The file descriptor of the terminal.
+        """
+        self._fd = fd
+        self._saved = None
+
+    def __enter__(self):
+        self._saved = termios.tcgetattr(self._fd)
+        tty.setcbreak(self._fd)
+        return self
+
+    def __exit__(self, *exc_info):
+        termios.tcsetattr(self._fd, termios.TCSADRAIN, self._saved)
+        return False
+
+
+class RawGame:
+    """
+    A class representing a game played with raw keypresses.
+
+    Attributes:
+        _player (Player): The player.
+        _maze (Maze): The maze the player is on.
+        _dungeon (Dungeon): The dungeon the maze is a floor of, if any.
+        _messages (list): The last lines printed by the commands.
+        _dirty (asyncio.Event): Set when the screen needs a redraw.
+        _done (asyncio.Future): Resolved when the game is over.
+        _frame (float): The minimum number of seconds between two redraws.
+    """
+
+    def __init__(self, player, maze, dungeon=None, fps=30):
+        """
+        Initialize the game.
+
+        Args:
+            player (Player): The player.
+            maze (Maze): The maze the player is on.
+            dungeon (Dungeon): The dungeon the maze is a floor of, if any.
+            fps (int): The maximum number of redraws per second.
+        """
+        self._player = player
+        self._maze = maze
+        self._dungeon = dungeon
+        self._messages = []
+        self._dirty = None
+        self._done = None
+        self._frame = 1 / fps
+
+    async def run(self, fd):
+        """
+        Play until the player quits, wins or loses.
+
+        Args:
+            fd (int): The file descriptor of the terminal.
+        """
+        loop = asyncio.get_running_loop()
+        self._dirty = asyncio.Event()
+        self._done = loop.create_future()
+        self._maze.set_quiet(True)
+        self._dirty.set()
+        drawer = asyncio.create_task(self._draw_loop())
+        loop.add_reader(fd, self._on_input, fd)
+        try:
+            await self._done
+        finally:
+            loop.remove_reader(fd)
+            drawer.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await drawer
+            # the last frame shows how the game ended
+            self._draw()
+
+    def handle_key(self, key):
+        """
+        Run the command of one key and keep what it printed.
+
+        Args:
+            key (str): The key typed.
+        """
+        if key.isspace():
+            return
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            try:
+                with hooks.turn(self):
+                    self._maze = self._player.handle_command(key, self._maze, self._dungeon)
+            except SystemExit:
+                # quit, win and loss all exit the game
+                if not self._done.done():
+                    self._done.set_result(None)
+        # a new floor is drawn by this loop too
+        self._maze.set_quiet(True)
+        self._messages.extend(line for line in output.getvalue().splitlines() if line)
+        del self._messages[:-_MESSAGES]
+        self._dirty.set()
+
+    def _on_input(self, fd):
+        """
+        Handle every key available on the terminal.
+
+        Args:
+            fd (int): The file descriptor of the terminal.
+        """
+        data = os.read(fd, 1024)
+        if not data:
+            if not self._done.done():
+                self._done.set_result(None)
+            return
+        for key in data.decode(errors="ignore"):
+            if self._done.done():
+                break
+            self.handle_key(key)
+
+    async def _draw_loop(self):
+        """
+        Redraw when something changed, at most once per frame.
+        """
+        while True:
+            await self._dirty.wait()
+            self._dirty.clear()
+            self._draw()
+            await asyncio.sleep(self._frame)
+
+    def _draw(self):
+        """
+        Draw the maze and the last messages in one write.
+        """
+        self._maze.set_quiet(False)
+        with contextlib.redirect_stdout(io.StringIO()) as frame:
+            self._maze.print_maze()
+        self._maze.set_quiet(True)
+        sys.stdout.write(
+            _CLEAR + frame.getvalue() + _HELP + "\n" + "\n".join(self._messages) + "\n"
+        )
+        sys.stdout.flush()
+
+
+def play(player, maze, dungeon=None):
+    """
+    Play the game with raw keypresses on the terminal of stdin.
+
+    Args:
+        player (Player): The player.
+        maze (Maze): The maze the player is on.
+        dungeon (Dungeon): The dungeon the maze is a floor of, if any.
+    """
+    fd = sys.stdin.fileno()
+    game = RawGame(player, maze, dungeon)
+    try:
+        with RawTerminal(fd):
+            asyncio.run(game.run(fd))
+    finally:
+        tracing.dump()
+        hooks.end_game(game)
+        stats.write()
@@ -0,0 +1,228 @@
+"""
+Per-turn latency tracing of the game loop.
+
+The tracer observes the hook points of rpg.hooks: the turns (one command line,
+one key in raw mode or one command of a shared game) and the phases timed in
+them: parsing the input, perform_action, the YAML reads of extract_enemy,
+combat, the arrows, the scheduler (enemy moves) and print_maze. The time of
+every phase is summed over the turn and kept in a rolling histogram of the last
+turns, dumped when the game ends or on SIGUSR1.
+"""
+import json
+import signal
+import sys
+from collections import deque
+
+from rpg import hooks
+
+# The phases timed by rpg.hooks, in the order of a turn
+_PHASES = (
+    "input",
+    "perform_action",
+    "extract_enemy",
+    "combat",
+    "use_arrow",
+    "scheduler",
+    "print_maze",
+)
+# Upper bounds of the histogram buckets, in microseconds
+_BUCKETS = (10, 100, 1_000, 10_000, 100_000, 1_000_000)
+
+_tracer = None
+
+
+class RollingHistogram:
+    """
+    A class representing the latencies of the last samples of one phase.
+
+    Attributes:
+        _samples (deque): The last samples, in nanoseconds.
+        _count (int): The number of samples ever added.
+    """
+
+    def __init__(self, window):
+        """
+        Initialize an empty histogram.
+
+        Args:
+            window (int): The number of samples kept.
+        """
+        self._samples = deque(maxlen=window)
+        self._count = 0
+
+    def add(self, nanoseconds):
+        """
+        Add a sample.
+
+        Args:
+            nanoseconds (int): The latency.
+        """
+        self._samples.append(nanoseconds)
+        self._count += 1
+
+    def summary(self):
+        """
+        Get the statistics of the kept samples.
+
+        Returns:
+            dict: The counts, the percentiles and the maximum in microseconds,
+            and the number of samples in every bucket.
+        """
+        samples = sorted(self._samples)
+        if not samples:
+            return {"count": self._count, "window": 0}
+
+        def percentile(p):
+            return samples[min(len(samples) - 1, int(p / 100 * len(samples)))] / 1e3
+
+        buckets = {f"<{bound}us": 0 for bound in _BUCKETS}
+        buckets[f">={_BUCKETS[-1]}us"] = 0
+        for sample in samples:
+            for bound in _BUCKETS:
+                if sample < bound * 1e3:
+                    buckets[f"<{bound}us"] += 1
+                    break
+            else:
+                buckets[f">={_BUCKETS[-1]}us"] += 1
+        return {
+            "count": self._count,
+            "window": len(samples),
+            "p50_us": percentile(50),
+            "p90_us": percentile(90),
+            "p99_us": percentile(99),
+            "max_us": samples[-1] / 1e3,
+            "buckets": buckets,
+        }
+
+
+class Tracer:
+    """
+    A class representing the timing of the phases of every turn, as an
+    observer of rpg.hooks.
+
+    Attributes:
+        _histograms (dict): phase -> RollingHistogram, "turn" included.
+        _turn (dict): phase -> nanoseconds spent in it during the current turn,
+            None between turns.
+        _output (str): The JSON file the dumps are written to, None for stderr only.
+    """
+
+    def __init__(self, window=1000, output=None):
+        """
+        Initialize a tracer; nothing is timed until install().
+
+        Args:
+            window (int): The number of turns kept in the histograms.
+            output (str): The JSON file the dumps are written to, None for stderr only.
+        """
+        self._histograms = {"turn": RollingHistogram(window)}
+        for phase in _PHASES:
+            self._histograms[phase] = RollingHistogram(window)
+        self._turn = None
+        self._output = output
+
+    def install(self):
+        """
+        Start observing the turns.
+        """
+        hooks.install(self)
+
+    def uninstall(self):
+        """
+        Stop observing the turns.
+        """
+        hooks.uninstall(self)
+
+    def report(self):
+        """
+        Get the histogram of every phase.
+
+        Returns:
+            dict: phase -> summary of its RollingHistogram.
+        """
+        return {phase: histogram.summary() for phase, histogram in self._histograms.items()}
+
+    def dump(self):
+        """
+        Print the report on stderr, and write it to the output file if any.
+        """
+        report = self.report()
+        lines = [
+            f"{'phase':>15} {'samples':>7} {'p50 us':>10} {'p90 us':>10} "
+            f"{'p99 us':>10} {'max us':>10}"
+        ]
+        for phase, summary in report.items():
+            if summary.get("window"):
+                lines.append(
+                    f"{phase:>15} {summary['count']:>7} {summary['p50_us']:>10.1f} "
+                    f"{summary['p90_us']:>10.1f} {summary['p99_us']:>10.1f} {summary['max_us']:>10.1f}"
+                )
+        print("\n".join(lines), file=sys.stderr)
+        if self._output:
+            with open(self._output, "w") as file:
+                json.dump(report, file, indent=2)
+
+    def turn_start(self, game):
+        """
+        Start summing the phases of a turn.
+        """
+        self._turn = {}
+
+    def turn_end(self, game, nanoseconds):
+        """
+        Move the phases of the finished turn to the histograms.
+        """
+        self._histograms["turn"].add(nanoseconds)
+        for phase, total in self._turn.items():
+            self._histograms[phase].add(total)
+        self._turn = None
+
+    def phase(self, game, name, nanoseconds):
+        """
+        Add the time of one call to the current turn, or as a turn of its own
+        when it ran between turns (e.g. the first frame).
+        """
+        if name not in self._histograms:
+            self._histograms[name] = RollingHistogram(self._histograms["turn"]._samples.maxlen)
+        if self._turn is not None:
+            self._turn[name] = self._turn.get(name, 0) + nanoseconds
+        else:
+            self._histograms[name].add(nanoseconds)
+
+
+def enable(window=1000, output=None):
+    """
+    Turn tracing on; SIGUSR1 dumps the histograms where the platform has it.
+
+    Args:
+        window (int): The number of turns kept in the histograms.
+        output (str): The JSON file the dumps are written to, None for stderr only.
+
+    Returns:
+        Tracer: The tracer.
+    """
+    global _tracer
+    if _tracer is None:
+        _tracer = Tracer(window, output)
+        _tracer.install()
+        if hasattr(signal, "SIGUSR1"):
+            signal.signal(signal.SIGUSR1, lambda *_: _tracer.dump())
+    return _tracer
+
+
+def disable():
+    """
+    Turn tracing off.
+    """
+    global _tracer
+    if _tracer is not None:
+        _tracer.uninstall()
+        _tracer = None
+
+
+def dump():
+    """
+    Dump the histograms if tracing is on.
+    """
+    if _tracer is not None:
+        _tracer.dump()
@@ -0,0 +1,333 @@
+"""
+Gym-style vectorized environment running many rwa3 games at once.
+
+N independent copies of a maze are held as batched NumPy arrays and one call to
+step() applies N actions. The rules are the ones of Player: movement, rotation,
+pickups, padlocks, arrows and combat. Combat is sampled in batch: the player
+and the enemy hit with equal probability until one of them dies, so the number
+of enemy hits before the player lands the last blow is negative binomial.
+The optional systems of the config file (chasing enemies, respawning hearts,
+bombs, fire spells, flying arrows and ranged enemies) are not modelled, so
+neither are they by the solver built on this module.
+"""
+import numpy as np
+import yaml
+
+# Cell codes
+EMPTY = 0
+OBSTACLE = 1
+GEM = 2
+KEY = 3
+PADLOCK = 4
+ARROW = 5
+HEART = 6
+SKELETON = 7
+DRAGON = 8
+
+# Actions, in the order of the game commands w, s, a, d, k
+ACTIONS = "wsadk"
+FORWARD, BACKWARD, ROTATE_LEFT, ROTATE_RIGHT, SHOOT = range(5)
+
+# Facing 0 = up, 1 = right, 2 = down, 3 = left
+_FACING = {"up": 0, "right": 1, "down": 2, "left": 3}
+_D_ROW = np.array([-1, 0, 1, 0])
+_D_COL = np.array([0, 1, 0, -1])
+
+# Gems needed to win, as in Player.pick_up_item
+_GEMS_TO_WIN = 3
+_ARROW_RANGE = 3
+
+
+class VecMazeEnv:
+    """
+    A class representing N independent games of the same maze.
+
+    Finished games are reset automatically at the end of step().
+
+    Attributes:
+        num_envs (int): The number of games.
+        grid (ndarray): (N, size, size) cell codes.
+        row (ndarray): (N,) player row.
+        col (ndarray): (N,) player column.
+        facing (ndarray): (N,) player facing.
+        health (ndarray): (N,) player health.
+        keys (ndarray): (N,) keys in the inventory.
+        arrows (ndarray): (N,) arrows in the inventory.
+        gems (ndarray): (N,) gems in the inventory.
+        steps (ndarray): (N,) steps played in the current game.
+    """
+
+    def __init__(self, template, num_envs, max_steps=500, seed=None):
+        """
+        Initialize the games from a template.
+
+        Args:
+            template (dict): The maze template built by load_template().
+            num_envs (int): The number of games.
+            max_steps (int): Games are truncated after this many steps.
+            seed (int): Seed of the random generator used for combat.
+        """
+        self._template = template
+        self.num_envs = num_envs
+        self._max_steps = max_steps
+        self._rng = np.random.default_rng(seed)
+        size = template["grid"].shape[0]
+        self._size = size
+        self.grid = np.empty((num_envs, size, size), dtype=np.int8)
+        self.row = np.empty(num_envs, dtype=np.int64)
+        self.col = np.empty(num_envs, dtype=np.int64)
+        self.facing = np.empty(num_envs, dtype=np.int64)
+        self.health = np.empty(num_envs, dtype=np.int64)
+        self.keys = np.empty(num_envs, dtype=np.int64)
+        self.arrows = np.empty(num_envs, dtype=np.int64)
+        self.gems = np.empty(num_envs, dtype=np.int64)
+        self.steps = np.empty(num_envs, dtype=np.int64)
+        self._index = np.arange(num_envs)
+        self.reset()
+
+    @classmethod
+    def from_config(cls, path, num_envs, max_steps=500, seed=None):
+        """
+        Build the environment from a maze YAML file.
+
+        Args:
+            path (str): The maze YAML file.
+            num_envs (int): The number of games.
+            max_steps (int): Games are truncated after this many steps.
+            seed (int): Seed of the random generator used for combat.
+
+        Returns:
+            VecMazeEnv: The environment.
+        """
+        return cls(load_template(path), num_envs, max_steps, seed)
+
+    def reset(self, mask=None):
+        """
+        Reset games to the start of the maze.
+
+        Args:
+            mask (ndarray): (N,) bool, the games to reset; all of them if None.
+
+        Returns:
+            dict: The observations.
+        """
+        if mask is None:
+            mask = np.ones(self.num_envs, dtype=bool)
+        template = self._template
+        self.grid[mask] = template["grid"]
+        self.row[mask] = template["start"][0]
+        self.col[mask] = template["start"][1]
+        self.facing[mask] = template["facing"]
+        self.health[mask] = template["health"]
+        self.keys[mask] = 0
+        self.arrows[mask] = 0
+        self.gems[mask] = 0
+        self.steps[mask] = 0
+        return self.observe()
+
+    def observe(self):
+        """
+        Get the observations of all games. The arrays are shared with the
+        environment and change on the next step.
+
+        Returns:
+            dict: "grid" (N, size, size), "position" (N, 2), "facing" (N,) and
+            "stats" (N, 4) holding health, keys, arrows and gems.
+        """
+        return {
+            "grid": self.grid,
+            "position": np.stack((self.row, self.col), axis=1),
+            "facing": self.facing,
+            "stats": np.stack((self.health, self.keys, self.arrows, self.gems), axis=1),
+        }
+
+    def step(self, actions):
+        """
+        Apply one action in every game.
+
+        Args:
+            actions (ndarray): (N,) action of every game, see ACTIONS.
+
+        Returns:
+            tuple: (observations, rewards, dones, info). The reward is 1 for a win,
+            -1 for a death and 0 otherwise. info["won"], info["lost"] and
+            info["truncated"] tell why a game ended, before it was reset.
+        """
+        actions = np.asarray(actions)
+        self.steps += 1
+
+        self.facing[actions == ROTATE_LEFT] -= 1
+        self.facing[actions == ROTATE_RIGHT] += 1
+        self.facing %= 4
+
+        lost = np.zeros(self.num_envs, dtype=bool)
+        moving = (actions == FORWARD) | (actions == BACKWARD)
+        if moving.any():
+            lost |= self._move(np.flatnonzero(moving), actions)
+        shooting = (actions == SHOOT) & (self.arrows > 0)
+        if shooting.any():
+            self._shoot(np.flatnonzero(shooting))
+
+        won = self.gems >= _GEMS_TO_WIN
+        truncated = ~won & ~lost & (self.steps >= self._max_steps)
+        rewards = won.astype(np.float32) - lost.astype(np.float32)
+        dones = won | lost | truncated
+        info = {"won": won, "lost": lost, "truncated": truncated}
+        if dones.any():
+            self.reset(dones)
+        return self.observe(), rewards, dones, info
+
+    def _move(self, index, actions):
+        """
+        Move the players of some games one cell forward or backward.
+
+        Args:
+            index (ndarray): The games moving.
+            actions (ndarray): (N,) action of every game.
+
+        Returns:
+            ndarray: (N,) bool, the games lost in combat.
+        """
+        direction = self.facing[index]
+        direction = np.where(actions[index] == BACKWARD, (direction + 2) % 4, direction)
+        row = self.row[index] + _D_ROW[direction]
+        col = self.col[index] + _D_COL[direction]
+        inside = (row >= 0) & (row < self._size) & (col >= 0) & (col < self._size)
+        index, row, col = index[inside], row[inside], col[inside]
+        code = self.grid[index, row, col]
+
+        # obstacles and locked padlocks block the way
+        keep = (code != OBSTACLE) & ((code != PADLOCK) | (self.keys[index] > 0))
+        index, row, col, code = index[keep], row[keep], col[keep], code[keep]
+
+        self.keys[index] -= code == PADLOCK
+        self.keys[index] += code == KEY
+        self.arrows[index] += code == ARROW
+        self.gems[index] += code == GEM
+        self.health[index] += (code == HEART) * self._template["heart_boost"]
+
+        lost = np.zeros(self.num_envs, dtype=bool)
+        fighting = (code == SKELETON) | (code == DRAGON)
+        if fighting.any():
+            defeated = self._combat(index[fighting], row[fighting], col[fighting])
+            lost[index[fighting][defeated]] = True
+            survived = np.ones(len(index), dtype=bool)
+            survived[np.flatnonzero(fighting)[defeated]] = False
+            index, row, col = index[survived], row[survived], col[survived]
+
+        self.grid[index, row, col] = EMPTY
+        self.row[index] = row
+        self.col[index] = col
+        return lost
+
+    def _combat(self, index, row, col):
+        """
+        Resolve the fights of some games in one draw.
+
+        As in Player.combat, a player whose attack does not get through the
+        shield of the enemy fights on until defeated.
+
+        Args:
+            index (ndarray): The games fighting.
+            row (ndarray): Row of the enemy of every game.
+            col (ndarray): Column of the enemy of every game.
+
+        Returns:
+            ndarray: bool, True where the player was defeated.
+        """
+        template = self._template
+        player_damage = template["player_attack"] - template["enemy_shield"][row, col]
+        hopeless = player_damage <= 0
+        player_hits = -(
+            -template["enemy_health"][row, col] // np.where(hopeless, 1, player_damage)
+        )
+        enemy_damage = template["enemy_damage"][row, col]
+        health = self.health[index]
+        enemy_hits = -(-health // enemy_damage)
+
+        # enemy hits landed before the player's last blow
+        taken = self._rng.negative_binomial(player_hits, 0.5)
+        taken = np.where(hopeless, enemy_hits, taken)
+        defeated = taken >= enemy_hits
+        self.health[index] = health - np.minimum(taken, enemy_hits) * enemy_damage
+        return defeated
+
+    def _shoot(self, index):
+        """
+        Shoot an arrow in some games, hitting the first enemy within range.
+
+        Args:
+            index (ndarray): The games shooting.
+        """
+        self.arrows[index] -= 1
+        direction = self.facing[index]
+        distance = np.arange(1, _ARROW_RANGE + 1)
+        row = self.row[index, None] + _D_ROW[direction, None] * distance
+        col = self.col[index, None] + _D_COL[direction, None] * distance
+        inside = (row >= 0) & (row < self._size) & (col >= 0) & (col < self._size)
+        row = np.where(inside, row, 0)
+        col = np.where(inside, col, 0)
+        code = self.grid[index[:, None], row, col]
+        enemy = inside & ((code == SKELETON) | (code == DRAGON))
+        hit = enemy.any(axis=1)
+        first = enemy.argmax(axis=1)
+        index, row, col = index[hit], row[hit, first[hit]], col[hit, first[hit]]
+
+        template = self._template
+        damage = template["arrow_damage"] - template["enemy_shield"][row, col]
+        killed = damage >= template["enemy_health"][row, col]
+        self.grid[index[killed], row[killed], col[killed]] = EMPTY
+
+
+def load_template(path):
+    """
+    Read a maze YAML file once into the arrays shared by all games.
+
+    Args:
+        path (str): The maze YAML file.
+
+    Returns:
+        dict: The cell codes, the enemy stats per cell and the player stats.
+    """
+    with open(path, "r") as file:
+        data = yaml.safe_load(file)["maze"]
+    size = data["grid_size"]
+    grid = np.zeros((size, size), dtype=np.int8)
+    for row, col in data["obstacles"]["position"]:
+        grid[row, col] = OBSTACLE
+    codes = {"gems": GEM, "keys": KEY, "padlocks": PADLOCK, "arrows": ARROW, "hearts": HEART}
+    for name, code in codes.items():
+        for row, col in data["items"][name]["position"]:
+            grid[row, col] = code
+
+    enemy_health = np.ones((size, size), dtype=np.int64)
+    enemy_shield = np.zeros((size, size), dtype=np.int64)
+    enemy_damage = np.ones((size, size), dtype=np.int64)
+    attack_power = data["enemies"]["attack_power"]
+    for skeleton_data in data["enemies"]["skeletons"]:
+        skeleton = skeleton_data["skeleton"]
+        row, col = skeleton["position"]
+        grid[row, col] = SKELETON
+        enemy_health[row, col] = skeleton["health"]
+        enemy_shield[row, col] = skeleton["shield_power"]
+        enemy_damage[row, col] = attack_power
+    for dragon_data in data["enemies"]["dragons"]:
+        dragon = dragon_data["dragon"]
+        row, col = dragon["position"]
+        grid[row, col] = DRAGON
+        enemy_health[row, col] = dragon["health"]
+        enemy_damage[row, col] = attack_power + dragon["fire_power"]
+
+    player = data["player"]
+    return {
+        "grid": grid,
+        "start": tuple(player["position"]),
+        "facing": _FACING[player["direction"]],
+        "health": player["health"],
+        "player_attack": player["attack_power"],
+        "heart_boost": data["items"]["hearts"]["health"],
+        "arrow_damage": data["items"]["arrows"]["damage"],
+        "enemy_health": enemy_health,
+        "enemy_shield": enemy_shield,
+        "enemy_damage": enemy_damage,
+    }
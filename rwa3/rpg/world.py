@@ -0,0 +1,752 @@
+"""
+Unbounded world mode streamed by deterministic chunks.
+
+Every chunk is generated from (world seed, chunk coordinates), so it can be
+dropped from memory at any time and regenerated identically. Only the changes
+made by the player are kept, as per-chunk deltas written to disk when the
+chunk is unloaded. Memory stays flat however far the player walks.
+
+The world is played through a WorldMaze, a view of the cells with the
+interface of Maze, so the commands and the rules of Player run unchanged.
+"""
+import json
+import os.path
+import random
+import tempfile
+from collections import OrderedDict
+
+import yaml
+
+# player imports enemy, which needs player to be imported first
+import rpg.player
+import rpg.enemy
+from rpg import hooks, stats, tracing
+from rpg.item import Category, Item
+from rpg.maze import _BOMB_EMOJI, _SPELL_EMOJI, file_path
+from rpg.scheduler import Scheduler
+
+# Probability of each content in a generated cell, the rest is empty
+_DENSITY = (
+    ("obstacles", 0.22),
+    ("gems", 0.004),
+    ("keys", 0.008),
+    ("padlocks", 0.004),
+    ("arrows", 0.008),
+    ("hearts", 0.008),
+    ("skeletons", 0.008),
+    ("dragons", 0.004),
+)
+
+
+class World:
+    """
+    A class representing an unbounded world made of square chunks.
+
+    Attributes:
+        _seed (int): The world seed.
+        _chunk_size (int): The side length of a chunk.
+        _max_chunks (int): The number of chunks kept in memory.
+        _keep_radius (int): Chunks further than this (in chunks) from the player are dropped.
+        _emoji (dict): The emoji of every content, keyed like the config file sections.
+        _chunks (OrderedDict): The chunks in memory, least recently used first.
+        _deltas (dict): The changes of the chunks in memory, chunk -> {cell: emoji}.
+        _dirty (set): The chunks whose delta changed since it was written.
+        _delta_dir (str): The folder the deltas are written to.
+        _temporary (TemporaryDirectory): The folder made for them if none was
+            given, removed with the world or at exit.
+    """
+
+    _cls_empty = "  "
+    _cls_vertical_wall = "│"
+
+    def __init__(
+        self, seed, emoji, chunk_size=16, max_chunks=64, keep_radius=2, delta_dir=None
+    ):
+        """
+        Initialize the world. No chunk is generated until it is needed.
+
+        Args:
+            seed (int): The world seed.
+            emoji (dict): The emoji of every content, keyed like the config file sections.
+            chunk_size (int): The side length of a chunk.
+            max_chunks (int): The number of chunks kept in memory.
+            keep_radius (int): Chunks further than this (in chunks) from the player are dropped.
+            delta_dir (str): The folder for the deltas, a temporary one if None.
+        """
+        self._seed = seed
+        self._emoji = emoji
+        self._chunk_size = chunk_size
+        self._max_chunks = max(max_chunks, (2 * keep_radius + 1) ** 2)
+        self._keep_radius = keep_radius
+        self._temporary = None
+        if delta_dir is None:
+            self._temporary = tempfile.TemporaryDirectory(prefix="rwa3-world-")
+            delta_dir = self._temporary.name
+        self._delta_dir = delta_dir
+        self._chunks = OrderedDict()
+        self._deltas = {}
+        self._dirty = set()
+        self._player_position = (0, 0)
+        # the spawn cell is always free
+        if self.cell((0, 0)) != self._cls_empty:
+            self.set_cell((0, 0), self._cls_empty)
+
+    @classmethod
+    def from_config(cls, path, seed):
+        """
+        Build a world using the emojis of a maze config file.
+
+        Args:
+            path (str): The maze YAML file.
+            seed (int): The world seed.
+
+        Returns:
+            World: The world.
+
+        Raises:
+            ValueError: If the file could not be parsed.
+        """
+        with open(path, "r") as file:
+            try:
+                data = yaml.safe_load(file)["maze"]
+            except yaml.YAMLError as e:
+                raise ValueError(f"{path} could not be parsed: {e}") from e
+        emoji = {"obstacles": data["obstacles"]["emoji"]}
+        for name in ("gems", "keys", "padlocks", "arrows", "hearts"):
+            emoji[name] = data["items"][name]["emoji"]
+        emoji["skeletons"] = data["enemies"]["skeleton_emoji"]
+        emoji["dragons"] = data["enemies"]["dragon_emoji"]
+        emoji["player"] = data["player"]["emoji_up"]
+        world_data = data.get("world", {})
+        return cls(
+            seed,
+            emoji,
+            world_data.get("chunk_size", 16),
+            world_data.get("max_chunks", 64),
+            world_data.get("keep_radius", 2),
+        )
+
+    def close(self):
+        """
+        Remove the deltas written to a temporary folder.
+        """
+        if self._temporary is not None:
+            self._temporary.cleanup()
+            self._temporary = None
+
+    @property
+    def cls_empty(self):
+        return self._cls_empty
+
+    @property
+    def emoji(self):
+        """
+        The emoji of every content, keyed like the config file sections.
+        """
+        return self._emoji
+
+    @property
+    def loaded_chunks(self):
+        """
+        The coordinates of the chunks in memory.
+        """
+        return list(self._chunks)
+
+    @property
+    def player_position(self):
+        """
+        The player position
+        """
+        return self._player_position
+
+    def chunk_of(self, position):
+        """
+        Get the chunk a cell belongs to.
+
+        Args:
+            position (tuple): The cell position, any integers.
+
+        Returns:
+            tuple: (row, col) coordinates of the chunk.
+        """
+        return (position[0] // self._chunk_size, position[1] // self._chunk_size)
+
+    def cell(self, position):
+        """
+        Get the content of a cell.
+
+        Args:
+            position (tuple): The cell position.
+
+        Returns:
+            str: The emoji in the cell.
+        """
+        chunk = self._chunk(self.chunk_of(position))
+        return chunk[position[0] % self._chunk_size][position[1] % self._chunk_size]
+
+    def set_cell(self, position, emoji):
+        """
+        Change the content of a cell and record it in the chunk delta.
+
+        Args:
+            position (tuple): The cell position.
+            emoji (str): The new content.
+        """
+        key = self.chunk_of(position)
+        chunk = self._chunk(key)
+        local = (position[0] % self._chunk_size, position[1] % self._chunk_size)
+        chunk[local[0]][local[1]] = emoji
+        self._deltas.setdefault(key, {})[local] = emoji
+        self._dirty.add(key)
+
+    def set_player_position(self, position):
+        """
+        Set the player position and drop the chunks that are now far away.
+
+        Args:
+            position (tuple): The new position.
+        """
+        self._player_position = tuple(position)
+        player_chunk = self.chunk_of(position)
+        for key in list(self._chunks):
+            if (
+                max(abs(key[0] - player_chunk[0]), abs(key[1] - player_chunk[1]))
+                > self._keep_radius
+            ):
+                self._unload(key)
+
+    def print_window(self, radius=5, player_emoji=None):
+        """
+        Print the square part of the world around the player.
+
+        Args:
+            radius (int): The number of cells shown on each side of the player.
+            player_emoji (str): The emoji of the player, the one facing up if None.
+        """
+        width = 2 * radius + 1
+        top = self._player_position[0] - radius
+        left = self._player_position[1] - radius
+        print("┌" + "─" * (width * 3 - 1) + "┐")
+        for row in range(top, top + width):
+            cells = []
+            for col in range(left, left + width):
+                if (row, col) == self._player_position:
+                    cells.append(player_emoji or self._emoji["player"])
+                else:
+                    cells.append(self.cell((row, col)))
+            print(self._cls_vertical_wall + self._cls_vertical_wall.join(cells) + self._cls_vertical_wall)
+        print("└" + "─" * (width * 3 - 1) + "┘")
+
+    def _chunk(self, key):
+        """
+        Get a chunk, generating it and applying its delta if it is not in memory.
+
+        Args:
+            key (tuple): The chunk coordinates.
+
+        Returns:
+            list: The rows of the chunk.
+        """
+        chunk = self._chunks.get(key)
+        if chunk is not None:
+            self._chunks.move_to_end(key)
+            return chunk
+
+        chunk = self._generate(key)
+        delta = self._load_delta(key)
+        if delta:
+            self._deltas[key] = delta
+            for (row, col), emoji in delta.items():
+                chunk[row][col] = emoji
+        self._chunks[key] = chunk
+        while len(self._chunks) > self._max_chunks:
+            self._unload(next(iter(self._chunks)))
+        return chunk
+
+    def _generate(self, key):
+        """
+        Generate a chunk from the world seed and its coordinates.
+
+        Args:
+            key (tuple): The chunk coordinates.
+
+        Returns:
+            list: The rows of the chunk.
+        """
+        rng = random.Random(f"{self._seed}:{key[0]}:{key[1]}")
+        chunk = []
+        for _ in range(self._chunk_size):
+            row = []
+            for _ in range(self._chunk_size):
+                draw = rng.random()
+                emoji = self._cls_empty
+                for name, density in _DENSITY:
+                    if draw < density:
+                        emoji = self._emoji[name]
+                        break
+                    draw -= density
+                row.append(emoji)
+            chunk.append(row)
+        return chunk
+
+    def _unload(self, key):
+        """
+        Drop a chunk from memory, writing its delta first if it changed.
+
+        Args:
+            key (tuple): The chunk coordinates.
+        """
+        self._chunks.pop(key, None)
+        delta = self._deltas.pop(key, None)
+        if key in self._dirty:
+            self._dirty.discard(key)
+            with open(self._delta_path(key), "w") as file:
+                json.dump([[row, col, emoji] for (row, col), emoji in delta.items()], file)
+
+    def _load_delta(self, key):
+        """
+        Read the delta of a chunk from disk.
+
+        Args:
+            key (tuple): The chunk coordinates.
+
+        Returns:
+            dict: cell -> emoji, empty if the chunk was never changed.
+        """
+        path = self._delta_path(key)
+        if not os.path.exists(path):
+            return {}
+        with open(path, "r") as file:
+            return {(row, col): emoji for row, col, emoji in json.load(file)}
+
+    def _delta_path(self, key):
+        """
+        Get the file the delta of a chunk is written to.
+
+        Args:
+            key (tuple): The chunk coordinates.
+
+        Returns:
+            str: The path of the file.
+        """
+        return os.path.join(self._delta_dir, f"chunk_{key[0]}_{key[1]}.json")
+
+
+class _Cells:
+    """
+    The cells of the world holding some emojis, as a position list of Maze.
+    """
+
+    __slots__ = ("_world", "_emojis")
+
+    def __init__(self, world, *emojis):
+        self._world = world
+        self._emojis = emojis
+
+    def __contains__(self, position):
+        return self._world.cell(position) in self._emojis
+
+
+class _Row:
+    """
+    One row of the world, as a row of the grid of Maze.
+    """
+
+    __slots__ = ("_world", "_row")
+
+    def __init__(self, world, row):
+        self._world = world
+        self._row = row
+
+    def __getitem__(self, col):
+        return self._world.cell((self._row, col))
+
+    def __setitem__(self, col, emoji):
+        # the player is drawn by print_window, never written to the cells
+        if self._world.cell((self._row, col)) != emoji:
+            self._world.set_cell((self._row, col), emoji)
+
+
+class _Grid:
+    """
+    The cells of the world, as the grid of Maze.
+    """
+
+    __slots__ = ("_world",)
+
+    def __init__(self, world):
+        self._world = world
+
+    def __getitem__(self, row):
+        return _Row(self._world, row)
+
+
+class WorldMaze:
+    """
+    A class representing the world as the maze a Player plays in.
+
+    The world has no bounds, no projectiles and no timed events: the enemies
+    stand still and the hearts and padlocks never come back. Every enemy takes
+    the stats of one enemy of its kind in the YAML file, picked from its cell.
+
+    Attributes:
+        _world (World): The world.
+        _file_path (str): The YAML file of the stats of the player, items and enemies.
+        _player_emoji (str): The emoji of the player.
+        _categories (dict): emoji -> Category of the items lying in the world.
+        _values (dict): Category -> value of its items.
+        _spawns (dict): enemy emoji -> the YAML positions of the enemies of that kind.
+        _bomb_emoji (str): The bomb emoji.
+        _spell_emoji (str): The fire spell emoji.
+        _scheduler (Scheduler): The clock, which never has any event.
+    """
+
+    def __init__(self, world, path=file_path):
+        """
+        Initialize the view of the world.
+
+        Args:
+            world (World): The world.
+            path (str): The maze YAML file the world was made from.
+
+        Raises:
+            ValueError: If the file could not be parsed.
+        """
+        with open(path, "r") as file:
+            try:
+                data = yaml.safe_load(file)["maze"]
+            except yaml.YAMLError as e:
+                raise ValueError(f"{path} could not be parsed: {e}") from e
+        self._world = world
+        self._file_path = path
+        self._player_emoji = data["player"][f"emoji_{data['player']['direction']}"]
+        emoji = world.emoji
+        self._categories = {
+            emoji["gems"]: Category.GEM,
+            emoji["keys"]: Category.KEY,
+            emoji["arrows"]: Category.ARROW,
+            emoji["hearts"]: Category.HEART,
+        }
+        self._values = {
+            Category.ARROW: data["items"]["arrows"]["damage"],
+            Category.HEART: data["items"]["hearts"]["health"],
+        }
+        # the world has no bombs nor fire spells, but the inventory shows them
+        self._bomb_emoji = data["items"].get("bombs", {}).get("emoji", _BOMB_EMOJI)
+        self._spell_emoji = data["items"].get("fire_spells", {}).get("emoji", _SPELL_EMOJI)
+        enemies = data["enemies"]
+        self._spawns = {
+            emoji["skeletons"]: [
+                tuple(enemy["skeleton"]["position"]) for enemy in enemies["skeletons"]
+            ],
+            emoji["dragons"]: [tuple(enemy["dragon"]["position"]) for enemy in enemies["dragons"]],
+        }
+        self._scheduler = Scheduler()
+
+    @property
+    def world(self):
+        """
+        The world.
+        """
+        return self._world
+
+    @property
+    def cls_empty(self):
+        return self._world.cls_empty
+
+    @property
+    def file_path(self):
+        """
+        The YAML file of the stats of the player, items and enemies.
+        """
+        return self._file_path
+
+    @property
+    def savable(self):
+        """
+        Whether the game can be saved: a saved game holds one bounded maze.
+        """
+        return False
+
+    @property
+    def grid(self):
+        """
+        The cells of the world, read and written as grid[row][col].
+        """
+        return _Grid(self._world)
+
+    @property
+    def grid_size(self):
+        """
+        None: the world has no bounds.
+        """
+        return None
+
+    @property
+    def obstacle_positions(self):
+        """
+        The cells of the obstacles.
+        """
+        return _Cells(self._world, self._world.emoji["obstacles"])
+
+    @property
+    def padlock_positions(self):
+        """
+        The cells of the padlocks.
+        """
+        return _Cells(self._world, self._world.emoji["padlocks"])
+
+    @property
+    def skeleton_positions(self):
+        """
+        The cells of the skeletons.
+        """
+        return _Cells(self._world, self._world.emoji["skeletons"])
+
+    @property
+    def dragon_positions(self):
+        """
+        The cells of the dragons.
+        """
+        return _Cells(self._world, self._world.emoji["dragons"])
+
+    def remove_padlock_position(self, position):
+        """
+        Open a padlock for good.
+
+        Args:
+            position (tuple): The padlock position.
+        """
+        self._world.set_cell(position, self._world.cls_empty)
+
+    def remove_skeleton_position(self, position):
+        """
+        Remove a defeated skeleton.
+
+        Args:
+            position (tuple): The skeleton position.
+        """
+        self._world.set_cell(position, self._world.cls_empty)
+
+    def remove_dragon_position(self, position):
+        """
+        Remove a defeated dragon.
+
+        Args:
+            position (tuple): The dragon position.
+        """
+        self._world.set_cell(position, self._world.cls_empty)
+
+    def enemy_spawn(self, position):
+        """
+        Get the position in the YAML file of the enemy whose stats an enemy of
+        the world takes, the same every time for a cell.
+
+        Args:
+            position (tuple): The position of the enemy in the world.
+
+        Returns:
+            tuple: The position of an enemy of the same kind in the YAML file.
+        """
+        spawns = self._spawns[self._world.cell(position)]
+        return spawns[hash(tuple(position)) % len(spawns)]
+
+    def item_at(self, position):
+        """
+        Get the item lying on a cell.
+
+        Args:
+            position (tuple): The cell.
+
+        Returns:
+            Item: The item, None if there is none.
+        """
+        category = self._categories.get(self._world.cell(position))
+        if category is None:
+            return None
+        return Item(category, tuple(position), self._values.get(category))
+
+    def take_item(self, position):
+        """
+        Remove the item lying on a cell from the world.
+
+        Args:
+            position (tuple): The cell.
+
+        Returns:
+            Item: The item taken, None if there was none.
+        """
+        picked = self.item_at(position)
+        if picked is not None:
+            self._world.set_cell(position, self._world.cls_empty)
+        return picked
+
+    @property
+    def gem_emoji(self):
+        """
+        The gem emoji
+        """
+        return self._world.emoji["gems"]
+
+    @property
+    def key_emoji(self):
+        """
+        The key emoji
+        """
+        return self._world.emoji["keys"]
+
+    @property
+    def padlock_emoji(self):
+        """
+        The padlock emoji
+        """
+        return self._world.emoji["padlocks"]
+
+    @property
+    def arrow_emoji(self):
+        """
+        The arrow emoji
+        """
+        return self._world.emoji["arrows"]
+
+    @property
+    def skeleton_emoji(self):
+        """
+        The skeleton emoji
+        """
+        return self._world.emoji["skeletons"]
+
+    @property
+    def dragon_emoji(self):
+        """
+        The dragon emoji
+        """
+        return self._world.emoji["dragons"]
+
+    @property
+    def bomb_emoji(self):
+        """
+        The bomb emoji, shown in the inventory
+        """
+        return self._bomb_emoji
+
+    @property
+    def spell_emoji(self):
+        """
+        The fire spell emoji, shown in the inventory
+        """
+        return self._spell_emoji
+
+    @property
+    def arrow_damage(self):
+        """
+        The damage of an arrow.
+        """
+        return self._values[Category.ARROW]
+
+    @property
+    def arrow_flight(self):
+        """
+        False: the arrows of the world hit at once.
+        """
+        return False
+
+    @property
+    def heart_respawn(self):
+        """
+        None: the hearts of the world do not come back.
+        """
+        return None
+
+    @property
+    def padlock_relock(self):
+        """
+        None: the padlocks of the world stay open.
+        """
+        return None
+
+    @property
+    def projectile_system(self):
+        """
+        None: nothing flies in the world.
+        """
+        return None
+
+    @property
+    def scheduler(self):
+        """
+        The clock of the world, which never has any event.
+        """
+        return self._scheduler
+
+    @property
+    def player_position(self):
+        """
+        The player position
+        """
+        return self._world.player_position
+
+    def set_player_position(self, position):
+        """
+        Set the player position, dropping the chunks that are now far away.
+
+        Args:
+            position (tuple): player's new position
+        """
+        self._world.set_player_position(position)
+
+    @property
+    def player_emoji(self):
+        """
+        The player emoji
+        """
+        return self._player_emoji
+
+    def set_player_emoji(self, emoji):
+        """
+        Set the player's emoji
+
+        Args:
+            emoji (str): The emoji of the player to be used.
+        """
+        self._player_emoji = emoji
+
+    def spawn_player(self):
+        """
+        The player is drawn by print_maze, never written to the cells.
+        """
+
+    def print_maze(self):
+        """
+        Print the part of the world around the player.
+        """
+        self._world.print_window(player_emoji=self._player_emoji)
+
+
+def explore(world, player, path=file_path):
+    """
+    Play the maze game in the world, one command per line: the commands and the
+    rules are those of the mazes.
+
+    Args:
+        world (World): The world to explore.
+        player (Player): The player.
+        path (str): The maze YAML file the world was made from.
+    """
+    maze = WorldMaze(world, path)
+    # the key of this game for the observers of rpg.hooks
+    game = object()
+    maze.print_maze()
+    try:
+        while True:
+            action = input("*" * 34 + "\nEnter a command: ")
+            if action == "h":
+                # the solver policies are made for the mazes of the YAML files
+                print("No hint in the world.")
+                continue
+            with hooks.turn(game):
+                player.handle_command(action, maze)
+    finally:
+        tracing.dump()
+        hooks.end_game(game)
+        stats.write()
@@ -0,0 +1,56 @@
+"""
+Shared fixtures of the rwa3 tests.
+
+Run from the rwa3 folder:
+    python -m pytest -q tests
+"""
+import os
+import sys
+
+import pytest
+import yaml
+
+# the rpg package is in the parent folder
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+# player imports enemy, which needs player to be imported first
+from rpg.player import Player  # noqa: E402
+from rpg.maze import Maze, file_path  # noqa: E402
+
+
+@pytest.fixture
+def maze():
+    """
+    A fresh maze of the shipped config file.
+    """
+    return Maze(file_path)
+
+
+@pytest.fixture
+def player():
+    """
+    The player of the shipped config file.
+    """
+    return Player.extract_player()
+
+
+@pytest.fixture
+def write_config(tmp_path):
+    """
+    Write a copy of the shipped config file with some changes.
+
+    Returns:
+        callable: Takes a function editing the "maze" section in place and
+        returns the path of the new file.
+    """
+
+    def write(edit):
+        with open(file_path, "r") as file:
+            data = yaml.safe_load(file)
+        edit(data["maze"])
+        path = tmp_path / "config.yaml"
+        with open(path, "w") as file:
+            yaml.safe_dump(data, file, allow_unicode=True)
+        return str(path)
+
+    return write
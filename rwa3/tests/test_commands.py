@@ -0,0 +1,67 @@
+"""
+Tests of the command line parsing and dispatch of Player.
+"""
+import pytest
+
+from rpg.player import MAX_BATCH, Player
+
+
+@pytest.mark.parametrize(
+    "line, actions",
+    [
+        ("w", ["w"]),
+        ("1w", ["w"]),
+        ("wwdk", ["w", "w", "d", "k"]),
+        ("5w2d", ["w"] * 5 + ["d"] * 2),
+        ("w w d", ["w", "w", "d"]),
+        ("0w", []),
+    ],
+)
+def test_parse_commands(line, actions):
+    assert Player.parse_commands(line) == actions
+
+
+@pytest.mark.parametrize("line", ["", "5", "w5", "W", "w!", f"{MAX_BATCH + 1}w"])
+def test_parse_commands_rejects(line):
+    assert Player.parse_commands(line) is None
+
+
+def test_single_counted_command_moves(maze, player, capsys):
+    # the player starts on (9, 9) facing up, (8, 9) is empty
+    player.handle_commands("1w", maze)
+    assert tuple(maze.player_position) == (8, 9)
+    assert "Invalid command" not in capsys.readouterr().out
+
+
+def test_counted_command_is_repeated(maze, player):
+    player.handle_commands("2w", maze)
+    assert tuple(maze.player_position) == (7, 9)
+
+
+def test_sequence_prints_the_maze_once(maze, player, capsys):
+    # every frame starts with one top-left corner
+    maze.print_maze()
+    assert capsys.readouterr().out.count("┌") == 1
+    player.handle_commands("wd", maze)
+    assert capsys.readouterr().out.count("┌") == 1
+    assert tuple(maze.player_position) == (8, 9)
+    assert player.direction.value == "right"
+
+
+@pytest.mark.parametrize("line", ["x", "0w", "w!"])
+def test_invalid_line_is_reported(maze, player, capsys, line):
+    player.handle_commands(line, maze)
+    assert f"Invalid command entered ({line})" in capsys.readouterr().out
+    assert tuple(maze.player_position) == (9, 9)
+
+
+def test_sequence_stops_on_a_blocked_move(maze, player):
+    # (9, 8) is an obstacle: the second rotation is never played
+    player.handle_commands("awd", maze)
+    assert tuple(maze.player_position) == (9, 9)
+    assert player.direction.value == "left"
+
+
+def test_quit_exits(maze, player):
+    with pytest.raises(SystemExit):
+        player.handle_commands("q", maze)
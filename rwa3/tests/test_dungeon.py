@@ -0,0 +1,90 @@
+"""
+Tests of the multi-floor dungeon and its floors evicted to disk.
+"""
+import os
+
+import pytest
+
+from rpg.dungeon import Dungeon
+
+dungeon_path = os.path.join(os.path.dirname(__file__), "..", "rpg", "dungeon.yaml")
+
+
+@pytest.fixture
+def dungeon():
+    """
+    The shipped dungeon, one floor kept in memory.
+    """
+    dungeon = Dungeon.from_file(dungeon_path)
+    yield dungeon
+    dungeon.close()
+
+
+def test_stairs_round_trip(dungeon):
+    maze = dungeon.floor(0)
+    obstacle = maze.obstacle_positions[0]
+    maze.remove_obstacle_position(obstacle)
+    maze.set_player_position((7, 8))
+
+    upstairs = dungeon.use_stairs(maze)
+    assert dungeon.current_floor == 1
+    assert upstairs.player_position == (0, 1)
+    assert upstairs.player_emoji == maze.player_emoji
+    assert dungeon.loaded_floors == [1]
+
+    upstairs.set_player_position((0, 0))
+    back = dungeon.use_stairs(upstairs)
+    assert dungeon.current_floor == 0
+    assert back.player_position == (7, 9)
+    # the floor comes back from disk with the changes made to it
+    assert back is not maze
+    assert obstacle not in back.obstacle_positions
+    assert back.grid[7][8] == "🪜"
+
+
+def test_stairs_need_the_stairs_cell(dungeon):
+    maze = dungeon.floor(0)
+    assert dungeon.use_stairs(maze) is maze
+    assert dungeon.current_floor == 0
+
+
+def test_least_recent_floor_is_evicted_to_disk(tmp_path):
+    floor_path = os.path.join(os.path.dirname(dungeon_path), "floor2.yaml")
+    dungeon = Dungeon(
+        [floor_path] * 3, {}, "🪜", hot_floors=2, cache_dir=str(tmp_path)
+    )
+    first = dungeon.floor(0)
+    first.remove_obstacle_position(first.obstacle_positions[0])
+    dungeon.floor(1)
+    dungeon.floor(0)
+    assert os.listdir(tmp_path) == []
+
+    # floor 1 was visited least recently
+    dungeon.floor(2)
+    assert dungeon.loaded_floors == [0, 2]
+    assert os.listdir(tmp_path) == ["floor_1.pickle"]
+
+    dungeon.floor(1)
+    assert dungeon.loaded_floors == [2, 1]
+    assert sorted(os.listdir(tmp_path)) == ["floor_0.pickle", "floor_1.pickle"]
+    restored = dungeon.floor(0)
+    assert restored is not first
+    assert restored.obstacle_positions == first.obstacle_positions
+    assert restored.grid == first.grid
+
+
+def test_close_removes_the_temporary_folder():
+    dungeon = Dungeon.from_file(dungeon_path)
+    dungeon.floor(0)
+    dungeon.floor(1)
+    folder = dungeon._cache_dir
+    assert os.listdir(folder) == ["floor_0.pickle"]
+    dungeon.close()
+    assert not os.path.exists(folder)
+
+
+def test_bad_file_is_rejected(tmp_path):
+    path = tmp_path / "dungeon.yaml"
+    path.write_text("maze: {}\n")
+    with pytest.raises(ValueError):
+        Dungeon.from_file(str(path))
@@ -0,0 +1,68 @@
+"""
+Tests of the incremental flow field against a full recompute.
+"""
+import random
+
+import pytest
+
+from rpg.flowfield import FlowField
+
+
+def _distances(field, size):
+    return [[field.distance((row, col)) for col in range(size)] for row in range(size)]
+
+
+def _walk(field, reference, start, rng, steps):
+    """Move the single source of the field at random and compare every step."""
+    size = field._size
+    position = start
+    for _ in range(steps):
+        row, col = position
+        moves = [
+            (row + d_row, col + d_col)
+            for d_row, d_col in ((-1, 0), (1, 0), (0, -1), (0, 1))
+            if 0 <= row + d_row < size
+            and 0 <= col + d_col < size
+            and not field._blocked[(row + d_row) * size + col + d_col]
+        ]
+        if not moves:
+            return
+        position = rng.choice(moves)
+        field.update(position)
+        reference.compute([position])
+        assert _distances(field, size) == _distances(reference, size)
+
+
+def test_walk_on_the_maze(maze):
+    field = FlowField(maze)
+    reference = FlowField(maze)
+    # the player starts in a corner closed off by padlocks
+    field.compute([(0, 3)])
+    _walk(field, reference, (0, 3), random.Random(0), 300)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_walk_on_random_obstacles(maze, seed):
+    rng = random.Random(seed)
+    field = FlowField(maze)
+    reference = FlowField(maze)
+    size = maze.grid_size
+    for row in range(size):
+        for col in range(size):
+            blocked = (row, col) != (0, 3) and rng.random() < 0.3
+            field.on_obstacle_change((row, col), blocked)
+            reference.on_obstacle_change((row, col), blocked)
+    field.compute([(0, 3)])
+    _walk(field, reference, (0, 3), rng, 200)
+
+
+def test_obstacle_change_is_picked_up(maze):
+    field = FlowField(maze)
+    reference = FlowField(maze)
+    field.compute([(0, 3)])
+    field.update((0, 4))
+    field.on_obstacle_change((1, 4), True)
+    reference.on_obstacle_change((1, 4), True)
+    field.update((0, 3))
+    reference.compute([(0, 3)])
+    assert _distances(field, maze.grid_size) == _distances(reference, maze.grid_size)
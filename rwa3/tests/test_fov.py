@@ -0,0 +1,70 @@
+"""
+Tests of the cached field of view of the fog-of-war mode.
+"""
+import random
+
+import pytest
+
+from rpg.fov import FieldOfView
+from rpg.maze import Maze
+
+
+@pytest.fixture
+def fog_maze(write_config):
+    """
+    The shipped maze with a fog of war of radius 3.
+    """
+
+    def edit(data):
+        data["fog_of_war"] = {"radius": 3}
+
+    return Maze(write_config(edit))
+
+
+def _cells(maze):
+    size = maze.grid_size
+    return [(row, col) for row in range(size) for col in range(size)]
+
+
+def _assert_matches_fresh(fov, maze):
+    """Check every cached entry against a field of view built from scratch."""
+    fresh = FieldOfView(maze, fov.radius)
+    for position in _cells(maze):
+        for radius in (2, fov.radius, 6):
+            assert fov.visible(position, radius) == fresh.visible(position, radius)
+
+
+def test_cache_is_dropped_when_obstacles_change(fog_maze):
+    random.seed(5)
+    fov = fog_maze.fov
+    _assert_matches_fresh(fov, fog_maze)
+    for _ in range(6):
+        obstacle = random.choice(fog_maze.obstacle_positions)
+        fog_maze.remove_obstacle_position(obstacle)
+        _assert_matches_fresh(fov, fog_maze)
+
+
+def test_cache_follows_opened_and_relocked_padlocks(fog_maze):
+    fov = fog_maze.fov
+    _assert_matches_fresh(fov, fog_maze)
+    padlocks = list(fog_maze.padlock_positions)
+    for position in padlocks:
+        fog_maze.remove_padlock_position(position)
+        _assert_matches_fresh(fov, fog_maze)
+    for position in padlocks:
+        fog_maze.relock_padlock(position)
+        _assert_matches_fresh(fov, fog_maze)
+
+
+def test_remembered_cells_keep_their_last_content(fog_maze):
+    fov = fog_maze.fov
+    position = tuple(fog_maze.player_position)
+    seen = fov.update(position)
+    assert position in seen
+    row, col = next(cell for cell in seen if cell != position)
+    before = fog_maze.grid[row][col]
+    fog_maze.grid[row][col] = "X"
+    # the memory only changes when the cell is seen again
+    assert fov.remembered[(row, col)] == before
+    fov.update(position)
+    assert fov.remembered[(row, col)] == "X"
@@ -0,0 +1,99 @@
+"""
+Tests of the hook points observed by tracing and statistics.
+"""
+import pytest
+
+from rpg import hooks, stats, tracing
+from rpg.maze import Maze, file_path
+from rpg.multiplayer import SharedGame
+from rpg.player import Player
+from rpg.session import MazeTemplate
+
+
+@pytest.fixture
+def recorder():
+    """
+    Statistics recorded for the test only.
+    """
+    recorder = stats.StatsRecorder(stats.StatsAggregator())
+    recorder.install()
+    yield recorder
+    recorder.uninstall()
+
+
+def test_observers_change_no_class():
+    classes = (Player, Maze)
+    before = [dict(vars(owner)) for owner in classes]
+    tracing.enable()
+    stats.enable()
+    try:
+        assert hooks.enabled
+        assert [dict(vars(owner)) for owner in classes] == before
+    finally:
+        tracing.disable()
+        stats.disable()
+    assert not hooks.enabled
+
+
+def test_records_are_kept_per_session(recorder):
+    first, second = object(), object()
+    players = [Player.extract_player(), Player.extract_player()]
+    mazes = [Maze(file_path), Maze(file_path)]
+    for action in "pip":
+        with hooks.turn(first):
+            players[0].handle_command(action, mazes[0])
+    with hooks.turn(second):
+        players[1].handle_command("i", mazes[1])
+    with pytest.raises(SystemExit):
+        with hooks.turn(first):
+            players[0].handle_command("q", mazes[0])
+    aggregator = recorder.aggregator
+    assert aggregator.outcomes == {hooks.QUIT: 1}
+    assert aggregator.turns.maximum == 4
+
+    hooks.end_game(second)
+    # a game already over is not counted twice
+    hooks.end_game(first)
+    assert aggregator.outcomes == {hooks.QUIT: 1, hooks.UNFINISHED: 1}
+    assert aggregator.turns.minimum == 1
+
+
+def test_events_outside_of_a_session_are_ignored(recorder, player, maze):
+    player.handle_command("p", maze)
+    player.take_damage(10)
+    hooks.end_game(None)
+    assert recorder.aggregator.games == 0
+
+
+def test_shared_game_records_every_seat(recorder):
+    game = SharedGame(MazeTemplate(file_path), Player.extract_player())
+    first = game.join()
+    second = game.join()
+    game.submit(first, "q")
+    game.submit(second, "p")
+    game.step()
+    assert recorder.aggregator.outcomes == {hooks.QUIT: 1}
+    game.leave(second)
+    assert recorder.aggregator.outcomes == {hooks.QUIT: 1, hooks.UNFINISHED: 1}
+    assert recorder.aggregator.turns.count == 2
+
+
+def test_tracer_sums_the_phases_of_a_turn(player, maze):
+    tracer = tracing.Tracer()
+    tracer.install()
+    try:
+        # the first frame is drawn between turns
+        maze.print_maze()
+        with hooks.turn(object()):
+            player.handle_commands("p", maze)
+        with hooks.turn(object()):
+            player.handle_commands("p p", maze)
+    finally:
+        tracer.uninstall()
+    report = tracer.report()
+    assert report["turn"]["count"] == 2
+    # one sample per turn, whatever the number of calls in it
+    assert report["input"]["count"] == 2
+    # "p" alone prints no frame, a batch prints its last one
+    assert report["print_maze"]["count"] == 2
+    assert report["combat"]["count"] == 0
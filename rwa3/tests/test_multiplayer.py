@@ -0,0 +1,92 @@
+"""
+Tests of the players sharing one maze.
+"""
+import random
+
+import pytest
+
+from rpg.maze import file_path
+from rpg.multiplayer import SharedGame
+from rpg.player import Player
+from rpg.projectiles import ENEMY
+from rpg.session import MazeTemplate
+
+
+@pytest.fixture
+def game():
+    """
+    A shared game of the shipped maze.
+    """
+    return SharedGame(MazeTemplate(file_path), Player.extract_player())
+
+
+def test_every_seat_has_its_own_emoji(game):
+    names = [game.join() for _ in range(3)]
+    views = game.maze.players
+    emojis = [views[name].player_emoji for name in names]
+    assert len(set(emojis)) == 3
+
+    game.submit(names[0], "d")
+    delta, outputs, finished = game.step()
+    # the emoji of a seat does not turn with the player
+    assert views[names[0]].player_emoji == emojis[0]
+    assert delta["players"][names[0]]["direction"] == "right"
+    row, col = views[names[0]].player_position
+    assert game.maze.grid[row][col] == emojis[0]
+
+
+def test_emoji_of_a_player_who_left_is_given_again(game):
+    first = game.join()
+    second = game.join()
+    emoji = game.maze.players[first].player_emoji
+    game.leave(first)
+    third = game.join()
+    assert game.maze.players[third].player_emoji == emoji
+    assert game.maze.players[second].player_emoji != emoji
+
+
+def test_other_players_block_the_way(game):
+    names = [game.join() for _ in range(3)]
+    views = [game.maze.players[name] for name in names]
+    for view in views:
+        blocked = view.obstacle_positions
+        assert view.player_position not in blocked
+        for other in views:
+            if other is not view:
+                assert other.player_position in blocked
+        assert set(blocked) == set(game.maze.obstacle_positions) | {
+            other.player_position for other in views if other is not view
+        }
+
+
+def test_occupied_cells_follow_the_moves(game):
+    random.seed(3)
+    names = [game.join() for _ in range(3)]
+    for _ in range(60):
+        for name in names:
+            game.submit(name, random.choice("wsad"))
+        delta, outputs, finished = game.step()
+        assert not finished
+        positions = [view.player_position for view in game.maze.players.values()]
+        # two players never share a cell
+        assert len(set(positions)) == len(positions)
+        assert game.maze.occupied == set(positions)
+    game.leave(names[1])
+    assert game.maze.occupied == {
+        view.player_position for view in game.maze.players.values()
+    }
+
+
+def test_hits_are_kept_by_player_name(game):
+    first = game.join()
+    second = game.join()
+    hit = game._seats[second][0]
+    health = hit.health
+    row, col = game.maze.players[second].player_position
+    game.maze.projectiles().fire((row - 1, col), (1, 0), 3, 15, ENEMY)
+    game.maze.scheduler.advance()
+    # the player before the one hit leaves before the hits are dealt
+    game.leave(first)
+    delta, outputs, finished = game.step()
+    assert hit.health == health - 15
+    assert "is hit by fire!" in outputs[second]
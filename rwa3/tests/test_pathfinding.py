@@ -0,0 +1,128 @@
+"""
+Tests of the hierarchical pathfinder against a plain BFS.
+"""
+import random
+from collections import deque
+
+import pytest
+
+from rpg.maze import Maze
+from rpg.pathfinding import HierarchicalPathfinder
+from rpg.savegame import load_game, save_game
+
+_MOVES = ((-1, 0), (1, 0), (0, -1), (0, 1))
+
+
+def _bfs(blocked, size, start):
+    """The BFS distance of every cell reachable from start."""
+    distance = {start: 0}
+    queue = deque([start])
+    while queue:
+        row, col = queue.popleft()
+        for d_row, d_col in _MOVES:
+            cell = (row + d_row, col + d_col)
+            if (
+                0 <= cell[0] < size
+                and 0 <= cell[1] < size
+                and cell not in blocked
+                and cell not in distance
+            ):
+                distance[cell] = distance[(row, col)] + 1
+                queue.append(cell)
+    return distance
+
+
+def _check_paths(finder, size, rng, queries):
+    """Compare random queries of the pathfinder with a BFS."""
+    blocked = finder._blocked
+    free = [
+        (row, col)
+        for row in range(size)
+        for col in range(size)
+        if (row, col) not in blocked
+    ]
+    for _ in range(queries):
+        start, goal = rng.choice(free), rng.choice(free)
+        path = finder.find_path(start, goal)
+        distance = _bfs(blocked, size, start)
+        if goal not in distance:
+            assert path is None
+            continue
+        assert path is not None
+        assert path[0] == start and path[-1] == goal
+        assert len(path) - 1 >= distance[goal]
+        for cell, after in zip(path, path[1:]):
+            assert abs(cell[0] - after[0]) + abs(cell[1] - after[1]) == 1
+            assert after not in blocked
+
+
+def _block_at_random(finder, size, rng, share):
+    for row in range(size):
+        for col in range(size):
+            finder.on_obstacle_change((row, col), rng.random() < share)
+
+
+@pytest.mark.parametrize("cluster_size", (3, 4, 10))
+@pytest.mark.parametrize("seed", range(10))
+def test_paths_match_bfs(maze, seed, cluster_size):
+    rng = random.Random(seed)
+    finder = HierarchicalPathfinder(maze, cluster_size)
+    _block_at_random(finder, maze.grid_size, rng, 0.3)
+    _check_paths(finder, maze.grid_size, rng, 100)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_paths_match_bfs_after_obstacle_changes(maze, seed):
+    rng = random.Random(seed)
+    size = maze.grid_size
+    finder = HierarchicalPathfinder(maze, 3)
+    _block_at_random(finder, size, rng, 0.3)
+    for _ in range(30):
+        cell = (rng.randrange(size), rng.randrange(size))
+        finder.on_obstacle_change(cell, cell not in finder._blocked)
+        _check_paths(finder, size, rng, 10)
+
+
+def test_opened_padlock_is_picked_up(maze):
+    finder = HierarchicalPathfinder(maze, 3)
+    # the player starts in a corner closed off by padlocks
+    assert finder.find_path((0, 3), maze.player_position) is None
+    for position in list(maze.padlock_positions):
+        maze.remove_padlock_position(position)
+    path = finder.find_path((0, 3), maze.player_position)
+    assert path is not None and path[-1] == tuple(maze.player_position)
+
+
+@pytest.fixture
+def path_chase_config(write_config):
+    """
+    The shipped maze without padlocks, the enemies chasing with path searches.
+    """
+
+    def edit(data):
+        data["enemies"]["chase"] = "path"
+        data["items"]["padlocks"]["position"] = []
+
+    return write_config(edit)
+
+
+def test_enemies_chase_along_paths(path_chase_config):
+    maze = Maze(path_chase_config)
+    blocked = set(maze.obstacle_positions)
+    before = list(maze.skeleton_positions) + list(maze.dragon_positions)
+    for _ in range(20):
+        maze.scheduler.advance()
+        after = list(maze.skeleton_positions) + list(maze.dragon_positions)
+        for old, new in zip(before, after):
+            assert abs(old[0] - new[0]) + abs(old[1] - new[1]) <= 1
+            assert new not in blocked
+        before = after
+    row, col = maze.player_position
+    assert any(abs(row - r) + abs(col - c) == 1 for r, c in before)
+
+
+def test_path_chase_is_saved(path_chase_config, player, tmp_path):
+    path = str(tmp_path / "game.sav")
+    save_game(path, player, Maze(path_chase_config))
+    _, loaded = load_game(path)
+    assert loaded.enemy_chase == "path"
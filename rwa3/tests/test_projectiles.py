@@ -0,0 +1,115 @@
+"""
+Tests of the projectiles hitting the players.
+"""
+import pytest
+
+from rpg.maze import Maze
+from rpg.multiplayer import SharedGame
+from rpg.player import Player
+from rpg.projectiles import ENEMY
+from rpg.session import MazeTemplate
+
+
+@pytest.fixture
+def ranged_config(write_config):
+    """
+    The shipped maze with enemies shooting every tick.
+    """
+
+    def edit(data):
+        data["enemies"]["ranged"] = {"every": 1, "range": 5, "damage": 15}
+
+    return write_config(edit)
+
+
+def test_hit_is_taken_once(maze):
+    # the player starts on (9, 9)
+    maze.projectiles().fire((7, 9), (1, 0), 3, 15, ENEMY)
+    maze.scheduler.advance()
+    assert maze.take_fire_damage() == 0
+    maze.scheduler.advance()
+    assert maze.take_fire_damage() == 15
+    assert maze.take_fire_damage() == 0
+    assert len(maze.projectile_system) == 0
+
+
+def test_player_projectile_does_not_hit_the_player(maze):
+    maze.projectiles().fire((8, 9), (1, 0), 3, 15, 1 - ENEMY)
+    maze.scheduler.advance()
+    assert maze.take_fire_damage() == 0
+
+
+def test_unclaimed_hits_are_dropped(maze):
+    projectiles = maze.projectiles()
+    projectiles.fire((8, 9), (1, 0), 3, 15, ENEMY)
+    maze.scheduler.advance()
+    assert projectiles.take_player_hits() == {None: 15}
+    assert maze.take_fire_damage() == 0
+
+
+def test_player_takes_the_hit_after_the_clock(write_config, capsys):
+    def edit(data):
+        data["enemies"]["ranged"] = {"every": 1, "range": 5, "damage": 15}
+        # in line with a dragon, outside of the padlocked corner
+        data["player"]["position"] = [0, 3]
+
+    path = write_config(edit)
+    maze = Maze(path)
+    player = Player.extract_player(path)
+    health = player.health
+    for _ in range(5):
+        player.advance(maze)
+    output = capsys.readouterr().out
+    assert player.health < health
+    assert (health - player.health) % 15 == 0
+    assert output.count("is hit by fire!") == (health - player.health) // 15
+
+
+def _shared_game(path):
+    """
+    Start a shared game with a second player moved in line with a dragon.
+
+    Returns:
+        tuple: (game, name of the first player, name of the second player).
+    """
+    game = SharedGame(MazeTemplate(path), Player.extract_player(path))
+    first = game.join()
+    second = game.join()
+    maze = game.maze
+    view = maze.players[second]
+    row, col = view.player_position
+    maze.grid[row][col] = maze.cls_empty
+    view.set_player_position((0, 3))
+    view.spawn_player()
+    return game, first, second
+
+
+def test_shared_hit_goes_to_the_player_hit(ranged_config):
+    game, first, second = _shared_game(ranged_config)
+    hit, safe = game._seats[second][0], game._seats[first][0]
+    health = hit.health
+    for _ in range(6):
+        game.submit(first, "p")
+        game.submit(second, "p")
+        before = hit.health
+        delta, outputs, finished = game.step()
+        # the damage is dealt in the tick the projectile lands
+        if hit.health < before:
+            assert "is hit by fire!" in outputs[second]
+        assert "is hit by fire!" not in outputs.get(first, "")
+    assert hit.health < health
+    assert safe.health == health
+
+
+def test_shared_player_killed_by_fire_leaves(ranged_config):
+    game, first, second = _shared_game(ranged_config)
+    game._seats[second][0]._health = 1
+    for _ in range(6):
+        game.submit(first, "p")
+        delta, outputs, finished = game.step()
+        if finished:
+            break
+    assert finished == [second]
+    assert "Game Over!" in outputs[second]
+    assert second not in game.maze.players
+    assert first in game.maze.players
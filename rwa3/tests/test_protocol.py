@@ -0,0 +1,43 @@
+"""
+Tests of the binary protocol for remote viewers.
+"""
+import asyncio
+
+from rpg.protocol import FrameDecoder, FrameEncoder, loopback
+from rpg.session import MazeTemplate
+
+
+def test_diffs_of_the_dirty_cells_keep_the_client_in_sync(player):
+    maze = MazeTemplate().new_session()
+    maze.track_dirty()
+    encoder = FrameEncoder()
+    decoder = FrameDecoder()
+    decoder.feed(encoder.snapshot(maze, player))
+    maze.take_dirty()
+    for action in "wwwaaskkdw":
+        player.handle_command(action, maze)
+        assert not decoder.feed(encoder.diff(maze, player, maze.take_dirty()))
+        assert decoder.grid == [list(row) for row in maze.grid]
+        assert decoder.pose["position"] == tuple(maze.player_position)
+        assert decoder.pose["health"] == player.health
+
+
+def test_dirty_diff_matches_a_full_scan(player):
+    maze = MazeTemplate().new_session()
+    maze.track_dirty()
+    dirty_encoder = FrameEncoder()
+    full_encoder = FrameEncoder()
+    dirty_encoder.snapshot(maze, player)
+    full_encoder.snapshot(maze, player)
+    maze.take_dirty()
+    # an item picked up and an enemy removed, written through the grid
+    maze.grid[0][9] = maze.cls_empty
+    maze.grid[2][7] = maze.cls_empty
+    assert maze.take_dirty() == {(0, 9), (2, 7)}
+    assert dirty_encoder.diff(maze, player, {(0, 9), (2, 7)}) == full_encoder.diff(maze, player)
+
+
+def test_loopback_resyncs_after_dropped_diffs():
+    result = asyncio.run(loopback(60, drop_every=7, seed=1))
+    assert result["matched"]
+    assert result["resyncs"] > 0
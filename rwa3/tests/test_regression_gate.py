@@ -0,0 +1,55 @@
+"""
+Tests of the statistics of the performance regression gate.
+"""
+import importlib.util
+import os
+
+import pytest
+
+gate_path = os.path.join(
+    os.path.dirname(__file__), "..", "..", "benchmarks", "regression_gate.py"
+)
+
+
+@pytest.fixture(scope="module")
+def gate():
+    """
+    The regression gate script of the repository root, loaded as a module.
+    """
+    spec = importlib.util.spec_from_file_location("regression_gate", gate_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+# p-values of the normal approximation with the tie and continuity corrections,
+# worked out by hand
+def test_separated_samples(gate):
+    slower = list(range(9, 17))
+    faster = list(range(1, 9))
+    assert gate.mann_whitney_greater(slower, faster) == pytest.approx(4.6955e-4, rel=1e-4)
+    assert gate.mann_whitney_greater(faster, slower) == pytest.approx(0.99968, rel=1e-4)
+
+
+def test_tied_samples(gate):
+    # ranks 1, 3, 3 against 3, 5: U = 1, tie-corrected variance 2.4
+    p_value = gate.mann_whitney_greater([1, 2, 2], [2, 3])
+    assert p_value == pytest.approx(0.94671, rel=1e-4)
+
+
+def test_identical_samples(gate):
+    assert gate.mann_whitney_greater([5] * 8, [5] * 8) == 0.5
+
+
+def test_compare_flags_a_slowdown(gate):
+    baseline = {"moves": list(range(100, 116)), "render": list(range(100, 116))}
+    current = {
+        "moves": list(range(200, 216)),
+        "render": list(range(100, 116)),
+        "new": [1],
+    }
+    verdicts = {
+        verdict["scenario"]: verdict["status"]
+        for verdict in gate.compare(current, baseline, alpha=0.01, threshold=0.1)
+    }
+    assert verdicts == {"moves": "regression", "render": "ok", "new": "new"}
@@ -0,0 +1,175 @@
+"""
+Tests of the binary saved games.
+"""
+import os
+import random
+
+import pytest
+
+from rpg import savegame
+from rpg.dungeon import Dungeon
+from rpg.item import Category
+from rpg.maze import Maze, file_path
+from rpg.player import Player
+from rpg.session import MazeTemplate
+
+
+def _state(player, maze):
+    """
+    Get what a saved game must restore, as plain values.
+    """
+    return {
+        "grid": [list(row) for row in maze.grid],
+        "positions": {name: list(getattr(maze, name)) for name in savegame._POSITIONS},
+        "spawns": dict(maze._enemy_spawns),
+        "player_position": tuple(maze.player_position),
+        "tick": maze.scheduler.tick,
+        "events": [
+            (event.tick, event.callback.__name__, event.args)
+            for event in maze.scheduler.pending()
+        ],
+        "items": sorted(
+            (item.item_position, item.item_type, item.item_value) for item in maze.items
+        ),
+        "player": (
+            player.name,
+            player.health,
+            player.direction,
+            player.attack_power,
+            dict(player.inventory),
+        ),
+    }
+
+
+def _play(player, maze, commands, seed=0):
+    random.seed(seed)
+    for action in commands:
+        player.handle_command(action, maze)
+
+
+@pytest.fixture
+def timed_config(write_config):
+    """
+    The shipped maze with chasing enemies and respawning hearts, and the
+    player starting outside of the padlocked corner.
+    """
+
+    def edit(data):
+        data["enemies"]["chase"] = True
+        data["items"]["hearts"]["respawn"] = 5
+        data["player"]["position"] = [0, 3]
+
+    return write_config(edit)
+
+
+def test_new_game_round_trip(maze, player, tmp_path):
+    path = tmp_path / "game.sav"
+    savegame.save_game(path, player, maze)
+    loaded_player, loaded_maze = savegame.load_game(path)
+    assert _state(loaded_player, loaded_maze) == _state(player, maze)
+
+
+def test_played_game_round_trip(timed_config, tmp_path):
+    maze = Maze(timed_config)
+    player = Player.extract_player(timed_config)
+    player.inventory[Category.ARROW] = 2
+    _play(player, maze, "wkaawwdk")
+    # the enemies moved and their next moves are pending
+    assert maze._enemy_spawns and maze.scheduler.pending()
+    path = tmp_path / "game.sav"
+    savegame.save_game(path, player, maze)
+    loaded_player, loaded_maze = savegame.load_game(path)
+    assert _state(loaded_player, loaded_maze) == _state(player, maze)
+
+    # a second save of the loaded game is the same file
+    again = tmp_path / "again.sav"
+    savegame.save_game(again, loaded_player, loaded_maze)
+    assert again.read_bytes() == path.read_bytes()
+
+
+def test_loaded_game_plays_on_like_the_saved_one(timed_config, tmp_path, capsys):
+    maze = Maze(timed_config)
+    player = Player.extract_player(timed_config)
+    _play(player, maze, "ww")
+    path = tmp_path / "game.sav"
+    savegame.save_game(path, player, maze)
+    loaded_player, loaded_maze = savegame.load_game(path)
+    _play(player, maze, "aawdwwdd", seed=1)
+    _play(loaded_player, loaded_maze, "aawdwwdd", seed=1)
+    assert _state(loaded_player, loaded_maze) == _state(player, maze)
+
+
+def test_load_rejects_other_files(tmp_path):
+    path = tmp_path / "game.sav"
+    path.write_bytes(b"not a saved game")
+    with pytest.raises(ValueError, match="not a saved game"):
+        savegame.load_game(path)
+
+
+def test_load_rejects_other_versions(maze, player, tmp_path):
+    path = tmp_path / "game.sav"
+    savegame.save_game(path, player, maze)
+    data = bytearray(path.read_bytes())
+    data[len(savegame.MAGIC)] += 1
+    path.write_bytes(bytes(data))
+    with pytest.raises(ValueError, match="version"):
+        savegame.load_game(path)
+
+
+def test_save_and_load_commands(write_config, capsys):
+    path = write_config(lambda data: None)
+    maze = Maze(path)
+    player = Player.extract_player(path)
+    player.handle_command("w", maze)
+    player.handle_command("o", maze)
+    saved = _state(player, maze)
+    player.handle_command("d", maze)
+    loaded = player.handle_command("l", maze)
+    assert "Game loaded!" in capsys.readouterr().out
+    assert _state(player, loaded) == saved
+
+
+def test_sessions_cannot_save(monkeypatch, tmp_path, capsys):
+    path = tmp_path / "config.sav"
+    monkeypatch.setattr(savegame, "save_path", lambda config_path: str(path))
+    session = MazeTemplate().new_session()
+    player = Player.extract_player()
+    for action in "ol":
+        assert player.handle_command(action, session) is session
+    assert capsys.readouterr().out.count("Saving is not available") == 2
+    assert not path.exists()
+
+
+@pytest.mark.parametrize("damage", ["truncated", "version"])
+def test_load_command_keeps_the_game_on_a_bad_file(write_config, capsys, damage):
+    path = write_config(lambda data: None)
+    maze = Maze(path)
+    player = Player.extract_player(path)
+    player.handle_command("o", maze)
+    data = bytearray(open(savegame.save_path(path), "rb").read())
+    if damage == "truncated":
+        data = data[:len(savegame.MAGIC) + 4]
+    else:
+        data[len(savegame.MAGIC)] += 1
+    with open(savegame.save_path(path), "wb") as file:
+        file.write(bytes(data))
+    player.handle_command("w", maze)
+    before = _state(player, maze)
+    assert player.handle_command("l", maze) is maze
+    assert "could not be loaded" in capsys.readouterr().out
+    assert _state(player, maze) == before
+
+
+def test_dungeons_cannot_save(monkeypatch, tmp_path, capsys):
+    path = tmp_path / "floor.sav"
+    monkeypatch.setattr(savegame, "save_path", lambda config_path: str(path))
+    dungeon = Dungeon.from_file(os.path.join(os.path.dirname(file_path), "dungeon.yaml"))
+    try:
+        maze = dungeon.floor(0)
+        player = Player.extract_player()
+        for action in "ol":
+            assert player.handle_command(action, maze, dungeon) is maze
+    finally:
+        dungeon.close()
+    assert capsys.readouterr().out.count("Saving is not available") == 2
+    assert not path.exists()
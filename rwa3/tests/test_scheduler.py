@@ -0,0 +1,49 @@
+"""
+Tests of the tick clock.
+"""
+import copy
+import pickle
+
+from rpg.scheduler import Scheduler
+
+
+def _record(log, name):
+    log.append(name)
+
+
+def test_events_due_on_the_same_tick_run_in_order():
+    scheduler = Scheduler()
+    log = []
+    for name in "abcde":
+        scheduler.schedule(2, _record, log, name)
+    scheduler.advance()
+    assert log == []
+    assert scheduler.advance() == 5
+    assert log == list("abcde")
+
+
+def test_periodic_and_cancelled_events():
+    scheduler = Scheduler()
+    log = []
+    scheduler.schedule_every(2, _record, log, "every")
+    cancelled = scheduler.schedule(1, _record, log, "cancelled")
+    Scheduler.cancel(cancelled)
+    for _ in range(6):
+        scheduler.advance()
+    assert log == ["every"] * 3
+    assert scheduler.tick == 6
+    assert [event.args[1] for event in scheduler.pending()] == ["every"]
+
+
+def test_copies_keep_the_order():
+    scheduler = Scheduler()
+    for name in "abc":
+        scheduler.schedule(1, _record, [], name)
+    for restored in (copy.deepcopy(scheduler), pickle.loads(pickle.dumps(scheduler))):
+        log = []
+        for event in restored.pending():
+            event.args = (log,) + event.args[1:]
+        # events scheduled after the copy still run after the copied ones
+        restored.schedule(1, _record, log, "d")
+        restored.advance()
+        assert log == list("abcd")
@@ -0,0 +1,158 @@
+"""
+Tests of the server on a local socket, in its text, binary and shared modes.
+"""
+import asyncio
+import contextlib
+import json
+
+from rpg.player import COMMANDS
+from rpg.protocol import FrameDecoder, TEXT, read_message
+from rpg.server import PROMPT, GameServer
+
+
+async def _connect(server):
+    """
+    Start a server on a free local port and connect a client to it.
+
+    Returns:
+        tuple: (listening server, client reader, client writer).
+    """
+    listener = await server.start(port=0)
+    port = listener.sockets[0].getsockname()[1]
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    return listener, reader, writer
+
+
+def _run(play):
+    """
+    Run a client coroutine, failing on any error left unhandled by the server.
+
+    Returns:
+        object: What the coroutine returned.
+    """
+    errors = []
+
+    async def run():
+        asyncio.get_running_loop().set_exception_handler(
+            lambda loop, context: errors.append(context)
+        )
+        return await play()
+
+    result = asyncio.run(run())
+    assert not errors
+    return result
+
+
+async def _close(server, listener, *writers):
+    """
+    Disconnect the clients and wait for the server to end their sessions.
+    """
+    for writer in writers:
+        writer.close()
+        with contextlib.suppress(ConnectionError):
+            await writer.wait_closed()
+    while server.sessions:
+        await asyncio.sleep(0.01)
+    listener.close()
+
+
+async def _read_to_end(reader):
+    """
+    Read until the server closes the connection.
+
+    Returns:
+        bytes: What was left to read; closing with input left unread may reset
+        the connection instead.
+    """
+    try:
+        return await reader.read()
+    except ConnectionResetError:
+        return b""
+
+
+def test_text_session():
+    async def play():
+        server = GameServer()
+        listener, reader, writer = await _connect(server)
+        welcome = (await reader.readuntil(PROMPT.encode())).decode()
+        writer.write(b"p\n")
+        health = (await reader.readuntil(PROMPT.encode())).decode()
+        writer.write(b"q\n")
+        goodbye = (await reader.read()).decode()
+        await _close(server, listener, writer)
+        return welcome, health, goodbye
+
+    welcome, health, goodbye = _run(play)
+    assert "┌" in welcome
+    # the menu lists every command of the game
+    menu = welcome.splitlines()[-2]
+    for key, text in COMMANDS:
+        assert f"{key} - {text}" in menu
+    assert "has 1000 health" in health
+    assert "chose to exit" in goodbye
+
+
+def test_overlong_line_ends_the_session():
+    async def play():
+        server = GameServer()
+        listener, reader, writer = await _connect(server)
+        await reader.readuntil(PROMPT.encode())
+        writer.write(b"w" * (1 << 17) + b"\n")
+        await writer.drain()
+        # the server closes the connection instead of failing
+        rest = await _read_to_end(reader)
+        await _close(server, listener, writer)
+        return rest, server.sessions
+
+    rest, sessions = _run(play)
+    assert rest == b""
+    assert sessions == 0
+
+
+def test_binary_session():
+    async def play():
+        server = GameServer(binary=True)
+        listener, reader, writer = await _connect(server)
+        decoder = FrameDecoder()
+        while decoder.out_of_sync:
+            kind, message = await read_message(reader)
+            decoder.feed(message)
+        session = next(iter(server.active_sessions))
+        writer.write(b"d\n")
+        kind = None
+        while kind != TEXT:
+            kind, message = await read_message(reader)
+            decoder.feed(message)
+        synced = decoder.grid == [list(row) for row in session.maze.grid]
+        await _close(server, listener, writer)
+        return synced, decoder.pose
+
+    synced, pose = _run(play)
+    assert synced
+    assert pose["health"] == 1000
+
+
+def test_shared_session():
+    async def play():
+        server = GameServer(shared=True, tick_interval=0.01)
+        listener, first, first_writer = await _connect(server)
+        port = listener.sockets[0].getsockname()[1]
+        second, second_writer = await asyncio.open_connection("127.0.0.1", port)
+        first_snapshot = json.loads(await first.readline())
+        second_snapshot = json.loads(await second.readline())
+        first_writer.write(b"d\n")
+        messages = [json.loads(await first.readline()) for _ in range(2)]
+        # an overlong line only drops the client that sent it
+        second_writer.write(b"w" * (1 << 17) + b"\n")
+        await _read_to_end(second)
+        players = list(server._game.maze.players)
+        await _close(server, listener, first_writer, second_writer)
+        return first_snapshot, second_snapshot, messages, players
+
+    first_snapshot, second_snapshot, messages, players = _run(play)
+    assert first_snapshot["you"] != second_snapshot["you"]
+    delta, output = messages
+    assert delta["type"] == "delta"
+    assert delta["players"][first_snapshot["you"]]["direction"] == "right"
+    assert output["type"] == "output"
+    assert players == [first_snapshot["you"]]
@@ -0,0 +1,157 @@
+"""
+Tests of the copy-on-write session mazes.
+"""
+import random
+
+import pytest
+
+from rpg.session import DirtyGrid, MazeTemplate, OverlayGrid, OverlayPositions
+
+
+def _overlay(positions):
+    base = tuple(positions)
+    base_index = {}
+    for index, position in enumerate(base):
+        base_index[position] = base_index.get(position, ()) + (index,)
+    return OverlayPositions(base, base_index)
+
+
+def test_overlay_positions_behave_like_a_list():
+    rng = random.Random(0)
+    cells = [(row, col) for row in range(6) for col in range(6)]
+    # a few positions twice, as a YAML file may list them
+    reference = rng.sample(cells, 12) + rng.sample(cells, 3)
+    overlay = _overlay(reference)
+    reference = list(reference)
+    for _ in range(500):
+        operation = rng.choice(("set", "append", "remove", "remove_all"))
+        if operation == "set" and reference:
+            index = rng.randrange(-len(reference), len(reference))
+            position = rng.choice(cells)
+            reference[index] = position
+            overlay[index] = position
+        elif operation == "append":
+            position = rng.choice(cells)
+            reference.append(position)
+            overlay.append(position)
+        elif operation == "remove" and reference:
+            position = rng.choice(reference)
+            reference.remove(position)
+            overlay.remove(position)
+        elif operation == "remove_all":
+            removed = set(rng.sample(cells, 3))
+            reference = [position for position in reference if position not in removed]
+            overlay.remove_all(removed)
+        assert list(overlay) == reference
+        assert len(overlay) == len(reference)
+        for position in rng.sample(cells, 5):
+            assert (position in overlay) == (position in reference)
+            if position in reference:
+                assert overlay.index(position) == reference.index(position)
+        if reference:
+            assert overlay[-1] == reference[-1]
+
+
+def test_unchanged_overlay_reads_the_shared_positions():
+    overlay = _overlay([(0, 1), (2, 3), (0, 1)])
+    assert overlay[1] == (2, 3)
+    assert overlay.index((0, 1)) == 0
+    assert (2, 3) in overlay
+    assert [2, 3] not in overlay
+    with pytest.raises(ValueError):
+        overlay.index((5, 5))
+    with pytest.raises(IndexError):
+        overlay[3]
+
+
+def test_overlays_do_not_change_the_shared_positions():
+    base = ((0, 0), (1, 1))
+    first = OverlayPositions(base, {(0, 0): (0,), (1, 1): (1,)})
+    second = OverlayPositions(base, {(0, 0): (0,), (1, 1): (1,)})
+    first[0] = (2, 2)
+    first.remove((1, 1))
+    assert base == ((0, 0), (1, 1))
+    assert list(second) == [(0, 0), (1, 1)]
+    assert (0, 0) not in first
+
+
+def test_items_can_be_set_while_iterating():
+    overlay = _overlay([(0, 0), (1, 1), (2, 2)])
+    overlay.remove((0, 0))
+    for index, position in enumerate(overlay):
+        overlay[index] = (position[0], position[1] + 1)
+    assert list(overlay) == [(1, 2), (2, 3)]
+    assert overlay.index((2, 3)) == 1
+
+
+def test_a_change_stores_only_itself():
+    base = tuple((row, col) for row in range(10) for col in range(10))
+    overlay = _overlay(base)
+    overlay[40] = (20, 20)
+    overlay.remove((7, 7))
+    overlay.append((30, 30))
+    # the untouched entries are still read from the shared positions
+    assert overlay._base is base
+    assert overlay._moved == {40: (20, 20)}
+    assert overlay._removed == [77]
+    assert overlay._added == [(30, 30)]
+    assert overlay[40] == (20, 20)
+    assert overlay[77] == (7, 8)
+    assert overlay.index((9, 9)) == 98
+    assert (4, 0) not in overlay and (20, 20) in overlay
+    # moving an entry back on its initial position forgets the change
+    overlay[40] = (4, 0)
+    assert overlay._moved == {}
+
+
+def test_overlay_grid_keeps_the_changes_apart():
+    base = (("a", "b"), ("c", "d"))
+    grid = OverlayGrid(base)
+    grid[1][0] = "x"
+    assert [list(row) for row in grid] == [["a", "b"], ["x", "d"]]
+    assert grid.changes == {(1, 0): "x"}
+    assert base[1][0] == "c"
+
+
+def test_dirty_grid_records_the_written_cells():
+    grid = DirtyGrid(OverlayGrid((("a", "b"), ("c", "d"))))
+    grid[0][1] = "y"
+    grid[0][1] = "z"
+    assert grid[0][1] == "z"
+    assert grid.take_dirty() == {(0, 1)}
+    assert grid.take_dirty() == set()
+
+
+def test_sessions_are_independent(player):
+    template = MazeTemplate()
+    first = template.new_session()
+    second = template.new_session()
+    # the player starts on (9, 9) facing up
+    player.handle_command("w", first)
+    assert tuple(first.player_position) == (8, 9)
+    assert tuple(second.player_position) == (9, 9)
+    assert first.grid[9][9] == first.cls_empty
+    assert second.grid[9][9] == second.player_emoji
+    first.remove_skeleton_position((2, 7))
+    first.take_item((0, 9))
+    assert (2, 7) not in first.skeleton_positions
+    assert (2, 7) in second.skeleton_positions
+    assert first.item_at((0, 9)) is None
+    assert second.item_at((0, 9)) is not None
+    assert template.new_session().grid[9][9] == second.player_emoji
+    # the lists the first session did not change are still shared, and the
+    # changed ones only hold the change
+    gems, _ = template._positions["_gem_positions"]
+    assert first._gem_positions._base is gems
+    assert first._gem_positions._removed is None
+    assert first._skeleton_positions._removed == [0]
+    assert first._skeleton_positions._moved == {}
+
+
+def test_session_dirty_cells(player):
+    session = MazeTemplate().new_session()
+    assert session.take_dirty() is None
+    session.track_dirty()
+    player.handle_command("w", session)
+    assert {(9, 9), (8, 9)} <= session.take_dirty()
+    assert session.take_dirty() == set()
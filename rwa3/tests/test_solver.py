@@ -0,0 +1,94 @@
+"""
+Tests of the solver and the hints of its policy.
+"""
+import os
+import random
+
+import pytest
+import yaml
+
+from rpg import vecenv
+from rpg.maze import Maze
+from rpg.player import Player
+from rpg.solver import PolicyTable, Solver, health_bucket
+
+
+@pytest.fixture(scope="module")
+def floor(tmp_path_factory):
+    """
+    The small floor of the dungeon with a third gem right below the player, so
+    that it can be won. It solves in about a second.
+    """
+    with open(os.path.join(os.path.dirname(vecenv.__file__), "floor2.yaml"), "r") as file:
+        data = yaml.safe_load(file)
+    data["maze"]["items"]["gems"]["position"].append([1, 0])
+    path = tmp_path_factory.mktemp("floor") / "floor.yaml"
+    with open(path, "w") as file:
+        yaml.safe_dump(data, file, allow_unicode=True)
+    return str(path)
+
+
+@pytest.fixture(scope="module")
+def policy(floor):
+    solver = Solver(vecenv.load_template(floor))
+    assert solver.solve() > 0.99
+    path = PolicyTable.policy_path(floor)
+    solver.save_policy(path)
+    return PolicyTable(path)
+
+
+def _hint(policy, maze, player):
+    return policy.hint(maze, player.direction.value, 0, player.health)
+
+
+def test_health_is_rounded_to_the_nearest_bucket():
+    assert health_bucket(1000, 500) == 2
+    # one hit or one heart is not a whole bucket
+    assert health_bucket(980, 500) == 2
+    assert health_bucket(1100, 500) == 2
+    assert health_bucket(1100, 100) == 11
+    assert health_bucket(740, 500) == 1
+    # a living player is never in the bucket of the dead
+    assert health_bucket(1, 500) == 1
+    assert health_bucket(0, 500) == 0
+    assert health_bucket(-20, 500) == 0
+
+
+def test_hint_at_the_start(floor, policy):
+    maze = Maze(floor)
+    player = Player.extract_player(floor)
+    # the player faces down, toward the gem
+    assert _hint(policy, maze, player) == "w"
+    player.handle_command("d", maze)
+    assert _hint(policy, maze, player) == "a"
+
+
+def test_hints_win_the_game(floor, policy, capsys):
+    random.seed(0)
+    maze = Maze(floor)
+    player = Player.extract_player(floor)
+    with pytest.raises(SystemExit):
+        for _ in range(100):
+            hint = _hint(policy, maze, player)
+            assert hint is not None
+            player.handle_command(hint, maze)
+    assert "You collected all" in capsys.readouterr().out
+
+
+def test_no_hint_once_an_enemy_moved(floor, policy):
+    maze = Maze(floor)
+    player = Player.extract_player(floor)
+    # Rattles steps left from its spawn cell
+    maze.move_enemy((2, 3), (2, 2))
+    assert maze.enemy_spawn((2, 2)) == (2, 3)
+    assert _hint(policy, maze, player) is None
+
+
+def test_no_hint_once_a_heart_came_back(floor, policy):
+    maze = Maze(floor)
+    player = Player.extract_player(floor)
+    maze.take_item((2, 5))
+    maze.grid[2][5] = maze.cls_empty
+    maze.respawn_heart((2, 5))
+    assert maze.grid[2][5] == maze.heart_emoji
+    assert _hint(policy, maze, player) is None
@@ -0,0 +1,25 @@
+"""
+Tests of the raw keypress mode, fed through a pipe instead of a terminal.
+"""
+import asyncio
+import os
+
+from rpg.player import COMMANDS
+from rpg.terminal import RawGame
+
+
+def test_keys_run_the_commands_listed_in_the_help(player, maze, capsys):
+    read_fd, write_fd = os.pipe()
+    os.write(write_fd, b"bq")
+    try:
+        asyncio.run(RawGame(player, maze).run(read_fd))
+    finally:
+        os.close(read_fd)
+        os.close(write_fd)
+    screen = capsys.readouterr().out
+    for key, text in COMMANDS:
+        assert f"{key} - {text}" in screen
+    # one key is one command, a batch cannot be typed
+    assert "several at once" not in screen
+    assert "to use_bomb!" in screen
+    assert "Player chose to exit game..." in screen
@@ -0,0 +1,111 @@
+"""
+Tests of the vectorized environment against the game played by Player.
+"""
+import random
+
+import numpy as np
+import pytest
+
+from rpg import vecenv
+from rpg.item import Category
+from rpg.maze import Maze
+from rpg.player import Player
+
+_ENEMIES = (vecenv.SKELETON, vecenv.DRAGON)
+# forward more often than the other actions, to get further into the maze
+_WALK = (vecenv.FORWARD,) * 3 + (
+    vecenv.BACKWARD,
+    vecenv.ROTATE_LEFT,
+    vecenv.ROTATE_RIGHT,
+    vecenv.SHOOT,
+)
+
+
+def _codes(maze):
+    """The grid of a maze in the cell codes of the environment."""
+    codes = {
+        maze.gem_emoji: vecenv.GEM,
+        maze.key_emoji: vecenv.KEY,
+        maze.padlock_emoji: vecenv.PADLOCK,
+        maze.arrow_emoji: vecenv.ARROW,
+        maze.heart_emoji: vecenv.HEART,
+        maze.skeleton_emoji: vecenv.SKELETON,
+        maze.dragon_emoji: vecenv.DRAGON,
+    }
+    grid = np.array(
+        [[codes.get(cell, vecenv.EMPTY) for cell in row] for row in maze.grid]
+    )
+    for row, col in maze.obstacle_positions:
+        grid[row, col] = vecenv.OBSTACLE
+    return grid
+
+
+def _play(player, maze, command):
+    """Play a command, telling whether it ended the game."""
+    try:
+        player.handle_command(command, maze)
+    except SystemExit:
+        return True
+    return False
+
+
+@pytest.fixture
+def open_config(write_config):
+    """
+    The shipped maze with the player in its open part.
+    """
+
+    def edit(data):
+        data["player"]["position"] = [0, 3]
+
+    return write_config(edit)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_steps_match_the_game(open_config, seed):
+    random.seed(seed)
+    actions = random.Random(seed)
+    env = vecenv.VecMazeEnv.from_config(open_config, 1, max_steps=10**6, seed=seed)
+    player = Player.extract_player(open_config)
+    maze = Maze(open_config)
+    offset = 0
+    for _ in range(1000):
+        action = actions.choice(_WALK)
+        enemies = np.isin(env.grid[0], _ENEMIES).sum()
+        _, _, dones, info = env.step([action])
+        if _play(player, maze, vecenv.ACTIONS[action]):
+            assert dones[0]
+            assert info["won"][0] == (player.inventory.get(Category.GEM, 0) == 3)
+            return
+        assert not dones[0]
+        assert (env.row[0], env.col[0]) == tuple(maze.player_position)
+        assert env.facing[0] == vecenv._FACING[player.direction.value]
+        assert env.keys[0] == player.inventory.get(Category.KEY, 0)
+        assert env.arrows[0] == player.inventory.get(Category.ARROW, 0)
+        assert env.gems[0] == player.inventory.get(Category.GEM, 0)
+        assert (env.grid[0] == _codes(maze)).all()
+        # the health only differs by the fights, which are drawn apart
+        if np.isin(env.grid[0], _ENEMIES).sum() == enemies:
+            assert env.health[0] - player.health == offset
+        offset = env.health[0] - player.health
+
+
+def test_shield_too_strong_defeats_the_player(write_config):
+    def edit(data):
+        data["player"]["position"] = [9, 4]
+        data["player"]["direction"] = "left"
+        data["player"]["health"] = 200
+        # a single blow would kill the skeleton, if it got through the shield
+        data["enemies"]["skeletons"][2]["skeleton"]["health"] = 1
+        data["enemies"]["skeletons"][2]["skeleton"]["shield_power"] = 60
+
+    path = write_config(edit)
+    random.seed(0)
+    player = Player.extract_player(path)
+    assert _play(player, Maze(path), "w")
+    assert player.health <= 0
+
+    env = vecenv.VecMazeEnv.from_config(path, 4, seed=0)
+    _, rewards, dones, info = env.step([vecenv.FORWARD] * 4)
+    assert info["lost"].all()
+    assert (rewards == -1).all()
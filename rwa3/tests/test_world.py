@@ -0,0 +1,120 @@
+"""
+Tests of the world mode played with the rules of the maze game.
+"""
+import random
+
+import pytest
+
+from rpg.item import Category
+from rpg.maze import file_path
+from rpg.player import Player
+from rpg.world import World, WorldMaze, explore
+
+
+@pytest.fixture
+def world():
+    """
+    A world whose 9 by 9 cells around the spawn cell are empty.
+    """
+    world = World.from_config(file_path, 7)
+    for row in range(-4, 5):
+        for col in range(-4, 5):
+            world.set_cell((row, col), world.cls_empty)
+    yield world
+    world.close()
+
+
+@pytest.fixture
+def maze(world):
+    """
+    The world as the maze of the player.
+    """
+    return WorldMaze(world)
+
+
+def test_moves_follow_the_facing(player, maze):
+    player.handle_command("w", maze)
+    assert maze.player_position == (-1, 0)
+    player.handle_command("d", maze)
+    assert maze.player_emoji == "⏩"
+    player.handle_command("w", maze)
+    assert maze.player_position == (-1, 1)
+    player.handle_command("s", maze)
+    assert maze.player_position == (-1, 0)
+
+
+def test_obstacles_block_the_way(player, maze, world):
+    world.set_cell((-1, 0), world.emoji["obstacles"])
+    player.handle_command("w", maze)
+    assert maze.player_position == (0, 0)
+
+
+def test_padlock_opens_with_a_key(player, maze, world, capsys):
+    world.set_cell((-1, 0), world.emoji["padlocks"])
+    world.set_cell((1, 0), world.emoji["keys"])
+    player.handle_command("w", maze)
+    assert maze.player_position == (0, 0)
+    assert "needed" in capsys.readouterr().out
+
+    player.handle_command("s", maze)
+    assert player.inventory[Category.KEY] == 1
+    player.handle_command("w", maze)
+    player.handle_command("w", maze)
+    assert maze.player_position == (-1, 0)
+    assert player.inventory[Category.KEY] == 0
+    assert world.cell((-1, 0)) == world.cls_empty
+
+
+def test_items_are_used_like_in_the_mazes(player, maze, world):
+    world.set_cell((-1, 0), world.emoji["hearts"])
+    world.set_cell((-2, 0), world.emoji["arrows"])
+    player.handle_command("w", maze)
+    player.handle_command("w", maze)
+    assert player.health == 1100
+    assert player.inventory[Category.ARROW] == 1
+    assert world.cell((-1, 0)) == world.cls_empty
+
+
+def test_third_gem_wins(player, maze, world):
+    player.inventory[Category.GEM] = 2
+    world.set_cell((-1, 0), world.emoji["gems"])
+    with pytest.raises(SystemExit):
+        player.handle_command("w", maze)
+    assert player.inventory[Category.GEM] == 3
+
+
+def test_enemies_are_fought(player, maze, world):
+    random.seed(0)
+    world.set_cell((-1, 0), world.emoji["skeletons"])
+    player.handle_command("w", maze)
+    assert world.cell((-1, 0)) == world.cls_empty
+    assert maze.player_position == (-1, 0)
+
+
+def test_arrow_hits_on_negative_cells(player, maze, world):
+    player.inventory[Category.ARROW] = 1
+    world.set_cell((-3, 0), world.emoji["dragons"])
+    player.handle_command("k", maze)
+    # an arrow deals more than the health of a dragon
+    assert world.cell((-3, 0)) == world.cls_empty
+    assert player.inventory[Category.ARROW] == 0
+
+
+def test_changes_survive_the_chunk_unloading(player, maze, world):
+    world.set_cell((-1, 0), world.emoji["hearts"])
+    player.handle_command("w", maze)
+    far = (1000, 1000)
+    maze.set_player_position(far)
+    assert world.chunk_of((0, 0)) not in world.loaded_chunks
+    maze.set_player_position((-1, 0))
+    assert world.cell((-1, 0)) == world.cls_empty
+
+
+def test_explore_runs_the_commands_of_the_game(world, monkeypatch, capsys):
+    player = Player.extract_player()
+    commands = iter(["d", "w", "h", "q"])
+    monkeypatch.setattr("builtins.input", lambda prompt: next(commands))
+    with pytest.raises(SystemExit):
+        explore(world, player)
+    assert world.player_position == (0, 1)
+    assert "No hint in the world." in capsys.readouterr().out